@@ -657,7 +657,9 @@ function simulateBenchmarkScan(scanJob, selectedItems) {
       // Map results back to items
       scanJob.results = results.map(r => {
         let status = "FAIL";
-        if (r.passed) {
+        if (r.status === "TIMEOUT") {
+          status = "TIMEOUT";
+        } else if (r.passed) {
           status = "PASS";
         } else if (r.type === 'manual') {
           status = "WARN";
@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+Saved audit outputs for kube-bench-python
+Keeps the raw audit / audit_config output of every check so 'rescore' can re-run only the
+test evaluation after the tests: blocks change
+"""
+
+import socket
+import threading
+import time
+from typing import Dict, List, Any, Optional
+from utils import Logger, load_json_file, save_json_file
+
+AUDITS_VERSION = 1
+
+
+class AuditStore:
+    """Raw audit outputs of one scan; recording during 'run --save-audits', read-only for 'rescore'"""
+
+    def __init__(self, data: Optional[Dict[str, Any]] = None, replay: bool = False):
+        self.replay = replay
+        self.logger = Logger(__name__)
+        self._lock = threading.Lock()
+        self.data = data or {
+            'version': AUDITS_VERSION,
+            'hostname': socket.gethostname(),
+            'captured_at': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+            'checks': {}
+        }
+
+    @classmethod
+    def load(cls, path: str) -> 'AuditStore':
+        """Open saved audit outputs for rescoring"""
+        data = load_json_file(path)
+        if data.get('version') != AUDITS_VERSION:
+            raise ValueError(f"Unsupported audit output version {data.get('version')} in {path}")
+        return cls(data, replay=True)
+
+    def save(self, path: str):
+        """Atomically write the saved outputs (compressed if the name ends in .gz or .zst)"""
+        with self._lock:
+            save_json_file(path, self.data)
+
+    @property
+    def hostname(self) -> str:
+        return self.data.get('hostname') or 'unknown'
+
+    def record(self, check_id: str, component_type: str, audit_output: str, config_output: str = ''):
+        with self._lock:
+            self.data['checks'][str(check_id)] = {
+                'component_type': component_type,
+                'audit': audit_output,
+                'audit_config': config_output
+            }
+
+    def set_status(self, check_id: str, status: str):
+        """Verdict of the scan that produced the output, compared against by 'rescore'"""
+        with self._lock:
+            entry = self.data['checks'].get(str(check_id))
+            if entry is not None:
+                entry['status'] = status
+
+    def get(self, check_id: str) -> Dict[str, Any]:
+        """Saved outputs of a check; unsaved checks replay as empty output"""
+        entry = self.data['checks'].get(str(check_id))
+        if entry is None:
+            self.logger.warning(f"No saved audit output for check {check_id}, treating as empty")
+            return {'audit': '', 'audit_config': ''}
+        return entry
+
+    def check_ids(self, component_type: Optional[str] = None) -> List[str]:
+        return [check_id for check_id, entry in self.data['checks'].items()
+                if component_type is None or entry.get('component_type') == component_type]
+
+    def component_types(self) -> List[str]:
+        return sorted({entry.get('component_type') for entry in self.data['checks'].values()})
+
+    def status(self, check_id: str) -> Optional[str]:
+        return (self.data['checks'].get(str(check_id)) or {}).get('status')
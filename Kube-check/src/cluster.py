@@ -0,0 +1,223 @@
+#!/usr/bin/env python3
+"""
+Cluster-scope audits for kube-bench-python
+Runs 'audit_api:' specs from check YAML against the API server in-process
+"""
+
+import json
+import re
+import threading
+import time
+from typing import Dict, List, Any, Optional, Callable, Iterable, Iterator, Tuple
+from utils import Logger
+from kubeapi import KubeAPIClient, ClusterUnavailable, DeadlineExceeded, split_api_path
+from rbac import RBACIndex
+from podsecurity import PodSecurityIndex
+from snapshot import RecordingAPIClient, SnapshotAPIClient
+
+# {metadata.name} placeholders in audit_api list formats
+FIELD_PATTERN = re.compile(r'\{([A-Za-z0-9_.]+)\}')
+# Agent mode has no scan boundaries: rebuild cluster indexes when they are older than this
+INDEX_MAX_AGE = 60.0
+
+
+class ClusterAuditor:
+    """Dispatch audit_api operations to an in-process API client (created lazily, shared)"""
+
+    def __init__(self, config_data: Dict[str, Any]):
+        kubernetes = (config_data or {}).get('kubernetes') or {}
+        self.kubeconfig = kubernetes.get('kubeconfig')
+        self.context = kubernetes.get('context')
+        self.enabled = kubernetes.get('api_client', True)
+        self.pool_size = int(kubernetes.get('api_pool_size') or 4)
+        self.exempt_namespaces = kubernetes.get('pod_security_exempt_namespaces') or []
+        self.logger = Logger(__name__)
+        self._client: Optional[KubeAPIClient] = None
+        self._unavailable: Optional[str] = None
+        # Snapshot being captured or replayed (see snapshot.py)
+        self.snapshot = None
+        self._lock = threading.Lock()
+        # index name -> (built at, index), shared by the checks of a scan
+        self._indexes: Dict[str, Tuple[float, Any]] = {}
+        self._index_lock = threading.Lock()
+        # audit_api operation name -> handler(spec, deadline) yielding (namespace, line) entries
+        self.operations: Dict[str, Callable[[Dict[str, Any], Optional[float]],
+                                            Iterable[Tuple[Optional[str], str]]]] = {
+            'can_i': self._can_i,
+            'list': self._list,
+            'rbac': self._rbac,
+            'pod_security': self._pod_security
+        }
+
+    @property
+    def client(self) -> KubeAPIClient:
+        """API client, created on first use; raises ClusterUnavailable if it can't be"""
+        with self._lock:
+            if self._client is None:
+                if self.snapshot is not None and self.snapshot.replay:
+                    self._client = SnapshotAPIClient(self.snapshot)
+                    return self._client
+                if not self.enabled:
+                    raise ClusterUnavailable("In-process API client disabled (kubernetes.api_client)")
+                if self._unavailable:
+                    raise ClusterUnavailable(self._unavailable)
+                try:
+                    self._client = KubeAPIClient(self.kubeconfig, self.context, pool_size=self.pool_size)
+                except (ClusterUnavailable, OSError, ValueError) as e:
+                    self._unavailable = str(e)
+                    raise ClusterUnavailable(str(e))
+                if self.snapshot is not None:
+                    self._client = RecordingAPIClient(self._client, self.snapshot)
+            return self._client
+
+    def run(self, specs: List[Dict[str, Any]], deadline: Optional[float] = None) -> str:
+        """Run audit_api operations and return output in the same key: value form as the shell audit"""
+        lines = list(self.stream(specs, deadline))
+        return '\n'.join(lines) + '\n' if lines else ''
+
+    def stream(self, specs: List[Dict[str, Any]], deadline: Optional[float] = None) -> Iterator[str]:
+        """Run audit_api operations, yielding output lines as list items arrive"""
+        for _, line in self.stream_entries(specs, deadline):
+            yield line
+
+    def stream_entries(self, specs: List[Dict[str, Any]],
+                       deadline: Optional[float] = None) -> Iterator[Tuple[Optional[str], str]]:
+        """Run audit_api operations, yielding (namespace or None, line) as list items arrive
+
+        deadline (time.monotonic) bounds every API call and index build; DeadlineExceeded once it passes.
+        """
+        for spec in specs:
+            if not isinstance(spec, dict) or len(spec) != 1:
+                raise ValueError(f"audit_api entries need exactly one operation: {spec}")
+            operation, arguments = next(iter(spec.items()))
+            handler = self.operations.get(operation)
+            if handler is None:
+                raise ValueError(f"Unknown audit_api operation: {operation}")
+            yield from handler(arguments or {}, deadline)
+
+    @staticmethod
+    def _verbs_and_groups(spec: Dict[str, Any]) -> Tuple[List[str], List[str]]:
+        verbs = spec.get('verbs') or [spec.get('verb')]
+        if isinstance(verbs, str):
+            verbs = verbs.split(',')
+        as_groups = spec.get('as_groups') or []
+        if isinstance(as_groups, str):
+            as_groups = [as_groups]
+        return [verb.strip() for verb in verbs if verb], as_groups
+
+    def _can_i(self, spec: Dict[str, Any], deadline: Optional[float] = None) -> List[Tuple[Optional[str], str]]:
+        """kubectl auth can-i: 'key: yes' if any of the verbs is allowed"""
+        verbs, as_groups = self._verbs_and_groups(spec)
+        allowed = any(
+            self.client.can_i(verb, spec['resource'], namespace=spec.get('namespace'),
+                              group=spec.get('group', ''), subresource=spec.get('subresource', ''),
+                              as_user=spec.get('as'), as_groups=as_groups, deadline=deadline)
+            for verb in verbs
+        )
+        return [(None, f"{spec['key']}: {'yes' if allowed else 'no'}")]
+
+    def _index(self, name: str, build: Callable[[Optional[float]], Any], deadline: Optional[float] = None) -> Any:
+        """Build an index once and share it until invalidate() or INDEX_MAX_AGE
+
+        The build (or the wait for another check's build) is bounded by the caller's deadline.
+        """
+        wait = -1 if deadline is None else max(0.0, deadline - time.monotonic())
+        if not self._index_lock.acquire(timeout=wait):
+            raise DeadlineExceeded(f"deadline reached waiting for the {name} index")
+        try:
+            built_at, index = self._indexes.get(name, (0.0, None))
+            if index is None or time.monotonic() - built_at > INDEX_MAX_AGE:
+                index = build(deadline)
+                self._indexes[name] = (time.monotonic(), index)
+            return index
+        finally:
+            self._index_lock.release()
+
+    def rbac_index(self, deadline: Optional[float] = None) -> RBACIndex:
+        """RBAC index shared by all 5.1.x checks of a scan, fetched once"""
+        return self._index('rbac', lambda limit: RBACIndex.fetch(self.client, limit), deadline)
+
+    def pod_security_index(self, deadline: Optional[float] = None) -> PodSecurityIndex:
+        """Pod security index shared by all 5.2.x checks of a scan, from one streamed pod list"""
+        return self._index('pod_security', lambda limit: PodSecurityIndex(
+            self.client.stream('/api/v1/pods', deadline=limit), self.exempt_namespaces), deadline)
+
+    def invalidate(self):
+        """Drop cached cluster state so the next scan sees current objects"""
+        with self._index_lock:
+            self._indexes.clear()
+
+    def _rbac(self, spec: Dict[str, Any], deadline: Optional[float] = None) -> Iterable[Tuple[Optional[str], str]]:
+        """Queries answered from the RBAC index: cluster_admin, wildcards, can_i"""
+        query = spec.get('query')
+        index = self.rbac_index(deadline)
+        if query == 'cluster_admin':
+            return index.cluster_admin_entries()
+        if query == 'wildcards':
+            return index.wildcard_entries()
+        if query == 'can_i':
+            verbs, as_groups = self._verbs_and_groups(spec)
+            allowed = any(
+                index.can_i(verb, spec['resource'], namespace=spec.get('namespace'),
+                            group=spec.get('group', ''), subresource=spec.get('subresource', ''),
+                            as_user=spec.get('as'), as_groups=as_groups)
+                for verb in verbs
+            )
+            return [(None, f"{spec['key']}: {'yes' if allowed else 'no'}")]
+        raise ValueError(f"Unknown rbac query: {query}")
+
+    def _pod_security(self, spec: Dict[str, Any],
+                      deadline: Optional[float] = None) -> Iterable[Tuple[Optional[str], str]]:
+        """Queries answered from the pod security index, with optional extra exempt_namespaces"""
+        return self.pod_security_index(deadline).run(spec.get('query'), spec.get('exempt_namespaces'))
+
+    def _list(self, spec: Dict[str, Any], deadline: Optional[float] = None) -> Iterator[Tuple[Optional[str], str]]:
+        """kubectl get -o json | jq: one formatted line per streamed list item"""
+        path = split_api_path(spec['resource'], spec.get('namespace'))
+        params = {
+            'fieldSelector': spec.get('field_selector'),
+            'labelSelector': spec.get('label_selector')
+        }
+        template = spec['format']
+        defaults = spec.get('defaults') or {}
+
+        for item in self.client.stream(path, params, deadline=deadline):
+            yield (self._lookup(item, 'metadata.namespace'), FIELD_PATTERN.sub(
+                lambda match: self._format_value(self._lookup(item, match.group(1)), defaults.get(match.group(1), '')),
+                template
+            ))
+
+    @staticmethod
+    def _lookup(item: Dict[str, Any], path: str) -> Any:
+        value: Any = item
+        for part in path.split('.'):
+            if not isinstance(value, dict):
+                return None
+            value = value.get(part)
+        return value
+
+    @staticmethod
+    def _format_value(value: Any, default: str) -> str:
+        """Render like jq -r: true/false, compact JSON for objects, default for null"""
+        if value is None:
+            return str(default)
+        if isinstance(value, bool):
+            return 'true' if value else 'false'
+        if isinstance(value, (dict, list)):
+            return json.dumps(value, separators=(',', ':'))
+        return str(value)
+
+    def use_snapshot(self, snapshot):
+        """Record API reads into a snapshot, or serve them from one being replayed"""
+        self.close()
+        self.invalidate()
+        with self._lock:
+            self.snapshot = snapshot
+            self._unavailable = None
+
+    def close(self):
+        with self._lock:
+            if self._client:
+                self._client.close()
+                self._client = None
+
@@ -3,7 +3,8 @@ Constants for Kube-check
 Centralized place for shared variables and configurations
 """
 
-# Variable substitutions for different components
+# Default variable substitutions for different components
+# (fallbacks when discovery.py finds no config.yaml candidate on the host)
 SUBSTITUTIONS = {
     'etcd': {
         '$etcdbin': 'etcd',
@@ -42,8 +43,3 @@ SUBSTITUTIONS = {
         # Policies typically use kubectl directly
     }
 }
-
-# Flattened substitutions for global use (like in main.py)
-GLOBAL_SUBSTITUTIONS = {}
-for component, subs in SUBSTITUTIONS.items():
-    GLOBAL_SUBSTITUTIONS.update(subs)
@@ -0,0 +1,253 @@
+#!/usr/bin/env python3
+"""
+Agent coordination for kube-bench-python
+Cluster-scope checks (section 5 policies) run on one agent per interval: the holder of a lease runs
+them and publishes the results, every other agent reuses what was published
+"""
+
+import base64
+import fcntl
+import gzip
+import json
+import os
+import re
+import socket
+import time
+from datetime import datetime, timezone
+from typing import Dict, List, Any, Optional, Tuple, Callable
+from utils import Logger, load_json_file, save_json_file
+from kubeapi import APIError
+
+# Targets whose checks look at the cluster rather than the node they run on
+CLUSTER_SCOPE_TARGETS = ('policies',)
+# Seconds a lease outlives its interval, so a slow leader isn't replaced mid-run
+LEASE_GRACE = 30.0
+LEASE_API = '/apis/coordination.k8s.io/v1'
+RESULTS_KEY = 'results.json.gz'
+
+
+def default_identity() -> str:
+    """Node name from the DaemonSet (spec.nodeName via NODE_NAME), else the hostname"""
+    return os.environ.get('NODE_NAME') or socket.gethostname()
+
+
+def lease_name(prefix: str, job_name: str) -> str:
+    """Lowercase DNS name for a job such as 'policies.yaml@21600s'"""
+    name = re.sub(r'[^a-z0-9-]+', '-', f"{prefix}-{job_name}".lower()).strip('-')
+    return name[:253]
+
+
+def _micro_time(timestamp: float) -> str:
+    return datetime.fromtimestamp(timestamp, timezone.utc).strftime('%Y-%m-%dT%H:%M:%S.%fZ')
+
+
+def _parse_time(value: Optional[str]) -> float:
+    if not value:
+        return 0.0
+    for fmt in ('%Y-%m-%dT%H:%M:%S.%fZ', '%Y-%m-%dT%H:%M:%SZ'):
+        try:
+            return datetime.strptime(value, fmt).replace(tzinfo=timezone.utc).timestamp()
+        except ValueError:
+            continue
+    return 0.0
+
+
+class Coordinator:
+    """Leader election and result sharing for one job at a time"""
+
+    def __init__(self, identity: Optional[str] = None, cluster_targets: Optional[List[str]] = None):
+        self.identity = identity or default_identity()
+        self.cluster_targets = tuple(cluster_targets or CLUSTER_SCOPE_TARGETS)
+        self.logger = Logger(__name__)
+
+    def coordinates(self, component_type: str) -> bool:
+        return component_type in self.cluster_targets
+
+    def acquire(self, job_name: str, duration: float) -> bool:
+        """True if this agent holds (or just took over) the job's lease for the next duration seconds"""
+        raise NotImplementedError
+
+    def publish(self, job_name: str, results: List[Dict[str, Any]]):
+        raise NotImplementedError
+
+    def fetch(self, job_name: str) -> Optional[Tuple[List[Dict[str, Any]], str, float]]:
+        """(results, publisher, published at) of the last leader run, None if nothing was published"""
+        raise NotImplementedError
+
+
+class LeaseCoordinator(Coordinator):
+    """coordination.k8s.io Lease per job, results in a ConfigMap of the same name"""
+
+    def __init__(self, get_client: Callable[[], Any], namespace: str = 'kube-system', prefix: str = 'kube-bench',
+                 identity: Optional[str] = None, cluster_targets: Optional[List[str]] = None):
+        super().__init__(identity, cluster_targets)
+        # Called on every use: an API server unreachable at startup only makes the scheduler run
+        # the job uncoordinated (ClusterUnavailable) instead of stopping the agent
+        self.get_client = get_client
+        self.namespace = namespace
+        self.prefix = prefix
+
+    def _lease_path(self, name: Optional[str] = None) -> str:
+        path = f"{LEASE_API}/namespaces/{self.namespace}/leases"
+        return f"{path}/{name}" if name else path
+
+    def _configmap_path(self, name: Optional[str] = None) -> str:
+        path = f"/api/v1/namespaces/{self.namespace}/configmaps"
+        return f"{path}/{name}" if name else path
+
+    def acquire(self, job_name: str, duration: float) -> bool:
+        name = lease_name(self.prefix, job_name)
+        now = time.time()
+        spec = {
+            'holderIdentity': self.identity,
+            'leaseDurationSeconds': int(duration),
+            'renewTime': _micro_time(now)
+        }
+        try:
+            lease = self.get_client().get(self._lease_path(name))
+        except APIError as e:
+            if e.status != 404:
+                raise
+            spec['acquireTime'] = spec['renewTime']
+            try:
+                self.get_client().request('POST', self._lease_path(), body={
+                    'apiVersion': 'coordination.k8s.io/v1',
+                    'kind': 'Lease',
+                    'metadata': {'name': name, 'namespace': self.namespace},
+                    'spec': spec
+                })
+            except APIError as e:
+                if e.status == 409:
+                    return False  # Another agent created it first
+                raise
+            self.logger.info(f"Acquired lease {name}")
+            return True
+
+        current = lease.get('spec') or {}
+        holder = current.get('holderIdentity')
+        expires = _parse_time(current.get('renewTime')) + (current.get('leaseDurationSeconds') or 0)
+        if holder != self.identity and holder and expires > now:
+            return False
+
+        spec['acquireTime'] = current.get('acquireTime') if holder == self.identity else spec['renewTime']
+        spec['leaseTransitions'] = (current.get('leaseTransitions') or 0) + (holder != self.identity)
+        lease['spec'] = spec
+        try:
+            # resourceVersion in the body makes this a compare-and-swap
+            self.get_client().request('PUT', self._lease_path(name), body=lease)
+        except APIError as e:
+            if e.status == 409:
+                return False
+            raise
+        if holder != self.identity:
+            self.logger.info(f"Took over lease {name} from {holder or 'nobody'}")
+        return True
+
+    def publish(self, job_name: str, results: List[Dict[str, Any]]):
+        name = lease_name(self.prefix, job_name)
+        payload = gzip.compress(json.dumps(results).encode('utf-8'), compresslevel=6)
+        configmap = {
+            'apiVersion': 'v1',
+            'kind': 'ConfigMap',
+            'metadata': {
+                'name': name,
+                'namespace': self.namespace,
+                'annotations': {
+                    'kube-bench/published-by': self.identity,
+                    'kube-bench/published-at': _micro_time(time.time())
+                }
+            },
+            'binaryData': {RESULTS_KEY: base64.b64encode(payload).decode('ascii')}
+        }
+        try:
+            self.get_client().request('PUT', self._configmap_path(name), body=configmap)
+        except APIError as e:
+            if e.status != 404:
+                raise
+            self.get_client().request('POST', self._configmap_path(), body=configmap)
+
+    def fetch(self, job_name: str) -> Optional[Tuple[List[Dict[str, Any]], str, float]]:
+        try:
+            configmap = self.get_client().get(self._configmap_path(lease_name(self.prefix, job_name)))
+        except APIError as e:
+            if e.status == 404:
+                return None
+            raise
+        data = (configmap.get('binaryData') or {}).get(RESULTS_KEY)
+        if not data:
+            return None
+        annotations = (configmap.get('metadata') or {}).get('annotations') or {}
+        results = json.loads(gzip.decompress(base64.b64decode(data)))
+        return (results, annotations.get('kube-bench/published-by', 'unknown'),
+                _parse_time(annotations.get('kube-bench/published-at')))
+
+
+class FileLockCoordinator(Coordinator):
+    """Local stand-in for the Lease: a lease file per job guarded by flock, results next to it"""
+
+    def __init__(self, directory: str, prefix: str = 'kube-bench', identity: Optional[str] = None,
+                 cluster_targets: Optional[List[str]] = None):
+        super().__init__(identity, cluster_targets)
+        self.directory = directory
+        self.prefix = prefix
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, job_name: str, suffix: str) -> str:
+        return os.path.join(self.directory, f"{lease_name(self.prefix, job_name)}{suffix}")
+
+    def acquire(self, job_name: str, duration: float) -> bool:
+        now = time.time()
+        with open(self._path(job_name, '.lease'), 'a+', encoding='utf-8') as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            f.seek(0)
+            try:
+                current = json.loads(f.read() or '{}')
+            except ValueError:
+                current = {}
+            holder = current.get('holder')
+            if holder and holder != self.identity and current.get('renew_time', 0) + current.get('duration', 0) > now:
+                return False
+            f.seek(0)
+            f.truncate()
+            f.write(json.dumps({'holder': self.identity, 'renew_time': now, 'duration': duration}))
+            f.flush()
+        if holder != self.identity:
+            self.logger.info(f"Took over lease {job_name} from {holder or 'nobody'}")
+        return True
+
+    def publish(self, job_name: str, results: List[Dict[str, Any]]):
+        save_json_file(self._path(job_name, '.results.json.gz'), {
+            'published_by': self.identity,
+            'published_at': time.time(),
+            'results': results
+        })
+
+    def fetch(self, job_name: str) -> Optional[Tuple[List[Dict[str, Any]], str, float]]:
+        path = self._path(job_name, '.results.json.gz')
+        if not os.path.exists(path):
+            return None
+        data = load_json_file(path)
+        return data.get('results') or [], data.get('published_by', 'unknown'), data.get('published_at', 0.0)
+
+
+def create_coordinator(kube_bench, settings: Optional[Dict[str, Any]] = None,
+                       mode: Optional[str] = None) -> Optional[Coordinator]:
+    """Coordinator for 'coordination.mode' (lease, file); None runs every check on every agent"""
+    settings = settings or {}
+    mode = mode or settings.get('mode') or 'none'
+    if mode == 'none':
+        return None
+    options = {
+        'prefix': settings.get('name_prefix', 'kube-bench'),
+        'identity': settings.get('identity'),
+        'cluster_targets': settings.get('cluster_targets')
+    }
+    if mode == 'lease':
+        kubernetes = kube_bench.parser.config.get('kubernetes') or {}
+        # POD_NAMESPACE: the DaemonSet's own namespace, from the downward API
+        namespace = settings.get('namespace') or os.environ.get('POD_NAMESPACE') or kubernetes.get('namespace') \
+            or 'kube-system'
+        return LeaseCoordinator(lambda: kube_bench.executor.cluster.client, namespace, **options)
+    if mode == 'file':
+        return FileLockCoordinator(settings.get('lock_dir') or 'reports/coordination', **options)
+    raise ValueError(f"Unknown coordination mode: {mode}")
@@ -0,0 +1,232 @@
+#!/usr/bin/env python3
+"""
+Component discovery for kube-bench-python
+Resolves $variables from the config.yaml bins/confs candidates (like kube-bench)
+"""
+
+import os
+import re
+import subprocess
+from typing import Dict, List, Any, Optional, Tuple
+from utils import Logger, DOCUMENT_CACHE, find_executable
+from constants import SUBSTITUTIONS
+
+# config.yaml candidate list -> variable suffix ($apiserver + conf)
+VARIABLE_SUFFIXES = {
+    'bins': 'bin',
+    'confs': 'conf',
+    'kubeconfig': 'kubeconfig',
+    'svc': 'svc',
+    'cafile': 'cafile',
+    'datadirs': 'datadir'
+}
+
+# Default key for each candidate list (defaultconf, defaultkubeconfig, ...)
+DEFAULT_KEYS = {
+    'confs': 'defaultconf',
+    'kubeconfig': 'defaultkubeconfig',
+    'svc': 'defaultsvc',
+    'cafile': 'defaultcafile',
+    'datadirs': 'defaultdatadir'
+}
+
+COMPONENT_TYPES = ['master', 'etcd', 'controlplane', 'node', 'policies']
+
+
+class ProcessTable:
+    """One-shot snapshot of the host process table"""
+
+    def __init__(self, proc_root: str = '/proc', processes: Optional[List[Tuple[int, List[str]]]] = None):
+        self.proc_root = proc_root
+        # processes: a previously captured table (snapshot replay) instead of reading /proc
+        self.processes = processes if processes is not None else self._read_processes()
+        self.commands = [argv for _, argv in self.processes]
+
+    def _read_processes(self) -> List[Tuple[int, List[str]]]:
+        """Read (pid, argv) of every process from /proc, falling back to ps"""
+        processes = []
+        try:
+            for entry in os.scandir(self.proc_root):
+                if not entry.name.isdigit():
+                    continue
+                try:
+                    with open(os.path.join(entry.path, 'cmdline'), 'rb') as f:
+                        raw = f.read()
+                except OSError:
+                    continue
+                argv = [arg.decode('utf-8', 'replace') for arg in raw.split(b'\0') if arg]
+                if argv:
+                    processes.append((int(entry.name), argv))
+            return processes
+        except OSError:
+            pass
+
+        try:
+            result = subprocess.run(['ps', '-eo', 'pid=,args='], capture_output=True, text=True, timeout=10)
+            for line in result.stdout.splitlines():
+                fields = line.split()
+                if len(fields) >= 2 and fields[0].isdigit():
+                    processes.append((int(fields[0]), fields[1:]))
+            return processes
+        except (subprocess.TimeoutExpired, OSError):
+            return []
+
+    def pids_for(self, candidate: str) -> List[int]:
+        """PIDs of processes matching a bins candidate (e.g. 'hyperkube apiserver')"""
+        tokens = candidate.split()
+        if not tokens:
+            return []
+        pids = []
+        for pid, argv in self.processes:
+            if os.path.basename(argv[0]) != tokens[0]:
+                continue
+            if argv[1:len(tokens)] == tokens[1:]:
+                pids.append(pid)
+        return pids
+
+    def is_running(self, candidate: str) -> bool:
+        """Check if a bins candidate is running"""
+        return bool(self.pids_for(candidate))
+
+
+class Substituter:
+    """Single-pass $variable substitution compiled into one regex"""
+
+    def __init__(self, mapping: Dict[str, str]):
+        self.mapping = dict(mapping)
+        # Longest key first so $etcdbin never matches inside a longer name
+        keys = sorted(self.mapping, key=len, reverse=True)
+        if keys:
+            alternation = '|'.join(re.escape(key) for key in keys)
+            self.pattern = re.compile(rf'(?:{alternation})(?![A-Za-z0-9_])')
+        else:
+            self.pattern = None
+
+    def substitute(self, text: str) -> str:
+        """Replace all known variables in text"""
+        if not text or self.pattern is None or '$' not in text:
+            return text
+        return self.pattern.sub(lambda match: self.mapping[match.group(0)], text)
+
+
+class ComponentDiscovery:
+    """Resolve substitution variables once per process from config.yaml candidates"""
+
+    def __init__(self, config_data: Dict[str, Any], process_table: Optional[ProcessTable] = None):
+        self.config = config_data or {}
+        self.logger = Logger(__name__)
+        self.process_table = process_table or ProcessTable()
+        self.variables: Dict[str, Dict[str, str]] = {}
+        self.substituters: Dict[str, Substituter] = {}
+        self._discover()
+
+    def _discover(self):
+        """Resolve variables for every component type and compile substituters"""
+        overrides = {f"${name}": str(value) for name, value in (self.config.get('variables') or {}).items()}
+        merged: Dict[str, str] = {}
+
+        for component_type in COMPONENT_TYPES:
+            variables = dict(SUBSTITUTIONS.get(component_type, {}))
+            for var in variables:
+                if var in overrides:
+                    variables[var] = overrides[var]
+            variables.update(self._resolve_section(component_type, variables))
+
+            self.variables[component_type] = variables
+            self.substituters[component_type] = Substituter(variables)
+            for var, value in variables.items():
+                merged.setdefault(var, value)
+
+        self.variables['global'] = merged
+        self.substituters['global'] = Substituter(merged)
+        self.logger.debug(f"Discovered variables: {merged}")
+
+    def _resolve_section(self, component_type: str, fallbacks: Dict[str, str]) -> Dict[str, str]:
+        """Resolve all variables for one config.yaml section (master, etcd, node, ...)"""
+        section = self.config.get(component_type) or {}
+        resolved = {}
+
+        for component in section.get('components', []):
+            component_config = section.get(component)
+            if not isinstance(component_config, dict):
+                continue
+
+            for list_key, suffix in VARIABLE_SUFFIXES.items():
+                candidates = component_config.get(list_key)
+                if not candidates:
+                    continue
+                if isinstance(candidates, str):
+                    candidates = [candidates]
+
+                var = f"${component}{suffix}"
+                if list_key == 'bins':
+                    value = self._find_running(candidates)
+                else:
+                    value = self._find_existing(candidates)
+
+                if value is None:
+                    value = fallbacks.get(var)
+                if value is None and list_key in DEFAULT_KEYS:
+                    value = component_config.get(DEFAULT_KEYS[list_key])
+                if value is None:
+                    value = candidates[0]
+                if list_key == 'bins':
+                    # Only the executable: 'hyperkube kubelet' runs as hyperkube (ps -fC $kubeletbin)
+                    value = str(value).split()[0]
+
+                resolved[var] = os.path.expandvars(str(value))
+
+        return resolved
+
+    def _find_running(self, candidates: List[str]) -> Optional[str]:
+        """Return first bins candidate present in the process table"""
+        for candidate in candidates:
+            if self.process_table.is_running(candidate):
+                return candidate
+        return None
+
+    def _find_existing(self, candidates: List[str]) -> Optional[str]:
+        """Return first path candidate that exists on the filesystem"""
+        paths = [os.path.expandvars(str(candidate)) for candidate in candidates]
+        found = DOCUMENT_CACHE.existing(paths)
+        return found[0] if found else None
+
+    def detect_targets(self) -> List[str]:
+        """Detect which benchmark targets apply to this node (like kube-bench)"""
+        targets = []
+        for component_type in COMPONENT_TYPES:
+            if component_type == 'policies':
+                # Cluster-scope checks only need a working kubectl
+                if find_executable('kubectl'):
+                    targets.append(component_type)
+                continue
+
+            section = self.config.get(component_type) or {}
+            for component in section.get('components', []):
+                component_config = section.get(component)
+                if not isinstance(component_config, dict) or component_config.get('optional'):
+                    continue
+                if self._is_component_present(component_config):
+                    self.logger.debug(f"Detected {component} for target {component_type}")
+                    targets.append(component_type)
+                    break
+
+        return targets
+
+    def _is_component_present(self, component_config: Dict[str, Any]) -> bool:
+        """Component is present if one of its bins runs or one of its confs exists"""
+        bins = component_config.get('bins') or []
+        confs = component_config.get('confs') or []
+        if isinstance(bins, str):
+            bins = [bins]
+        if isinstance(confs, str):
+            confs = [confs]
+        return self._find_running(bins) is not None or self._find_existing(confs) is not None
+
+    def get_substituter(self, component_type: Optional[str] = None) -> Substituter:
+        """Get compiled substituter for a component type (global if unknown)"""
+        return self.substituters.get(component_type or 'global', self.substituters['global'])
+
+    def substitute(self, text: str, component_type: Optional[str] = None) -> str:
+        """Substitute variables in text for a component type"""
+        return self.get_substituter(component_type).substitute(text)
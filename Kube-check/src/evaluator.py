@@ -0,0 +1,477 @@
+#!/usr/bin/env python3
+"""
+Audit output evaluation for kube-bench-python
+Flag extraction, test items and multi-value tallies, shared by CheckExecutor and shard workers
+"""
+
+import re
+import json
+import yaml
+from typing import Dict, Any, Tuple, Optional, Iterable
+from utils import Logger, parse_yaml_text
+from shards import LineTally
+from operators import Comparison, compile_comparison
+
+
+class AuditEvaluator:
+    """Evaluate test items against audit output; holds no discovery, shell, helper or API state"""
+    
+    def __init__(self):
+        self.logger = Logger(__name__)
+    
+    def check_flag_in_output(self, output: str, flag: str, env_var: Optional[str] = None, component_type: Optional[str] = None) -> Tuple[bool, str]:
+        """Enhanced flag checking with separate logic for policies vs other components"""
+        if not output:
+            return False, "No output from audit command"
+        
+        # Separate handling for policies (section 5) vs other components
+        if component_type == 'policies':
+            return self._check_policies_flag_output(output, flag)
+        
+        # Original logic for other components (sections 1, 2, 3, 4)
+        if "permissions=" in output or "Access:" in output:
+            return self._check_file_permissions(output, flag)
+        elif "ownership=" in output or "Uid:" in output:
+            return self._check_file_ownership(output, flag)
+        elif "error:" in output.lower() or "no such file" in output.lower():
+            return False, f"Error: {output.strip()}"
+        
+        # Special case for root:root exact match
+        if flag == 'root:root' and flag in output:
+            return True, flag
+        
+        # Special case for "File not found" message
+        if flag == 'File not found' and flag in output:
+            return True, flag
+        
+        # Standard flag checking (for ps output)
+        return self._check_standard_flag(output, flag, env_var)
+
+    def check_config_path(self, config_output: str, path: str) -> Tuple[bool, str]:
+        """Check JSON path in config output"""
+        try:
+            if not config_output.strip():
+                return False, "Empty config output"
+            
+            # Parse YAML/JSON config (parsed once per distinct output)
+            if config_output.strip().startswith('{'):
+                config_data = json.loads(config_output)
+            else:
+                config_data = parse_yaml_text(config_output)
+            
+            if not config_data:
+                return False, "Empty config data"
+            
+            # Extract value using path like "{.authentication.anonymous.enabled}"
+            path_clean = path.strip('{}').strip('.')
+            if not path_clean:
+                return False, "Empty path"
+            
+            path_parts = path_clean.split('.')
+            current = config_data
+            
+            for part in path_parts:
+                if part and isinstance(current, dict) and part in current:
+                    current = current[part]
+                else:
+                    return False, f"Path not found: {part}"
+            
+            return True, str(current)
+            
+        except json.JSONDecodeError as e:
+            self.logger.debug(f"JSON parse error: {e}")
+            return False, f"JSON parse error: {e}"
+        except yaml.YAMLError as e:
+            self.logger.debug(f"YAML parse error: {e}")
+            return False, f"YAML parse error: {e}"
+        except Exception as e:
+            self.logger.debug(f"Failed to parse config: {e}")
+            return False, f"Parse error: {e}"
+    
+    def _check_policy_output(self, output: str, flag: str) -> Tuple[bool, str]:
+        """Check policy output with ** format"""
+        lines = output.strip().split('\n')
+        for line in lines:
+            if '**' in line and flag in line:
+                # Extract value after flag
+                parts = line.split()
+                for part in parts:
+                    if flag in part and ':' in part:
+                        try:
+                            value = part.split(':', 1)[1].strip()
+                            return True, value
+                        except IndexError:
+                            continue
+        return False, "Policy value not found"
+    
+    def _check_pod_security_output(self, output: str, flag: str) -> Tuple[bool, str]:
+        """Check pod security output with *** format"""
+        lines = output.strip().split('\n')
+        for line in lines:
+            if '***' in line and flag in line:
+                parts = line.split()
+                for part in parts:
+                    if flag in part and ':' in part:
+                        try:
+                            value = part.split(':', 1)[1].strip()
+                            return True, value
+                        except IndexError:
+                            continue
+        return False, "Pod security value not found"
+    
+    def _check_boolean_output(self, output: str, flag: str) -> Tuple[bool, str]:
+        """Check boolean output from kubectl commands"""
+        lines = output.strip().split('\n')
+        for line in lines:
+            if flag in line and ':' in line:
+                try:
+                    value = line.split(':', 1)[1].strip()
+                    return True, value
+                except IndexError:
+                    continue
+        return False, "Boolean value not found"
+    
+    def _check_file_permissions(self, output: str, flag: str) -> Tuple[bool, str]:
+        """Check file permissions in stat output"""
+        # Format: Access: (0644/-rw-r--r--)
+        access_match = re.search(r'Access:\s*\((\d+)/', output)
+        if access_match:
+            return True, access_match.group(1)
+        
+        # Format: permissions=644
+        perm_match = re.search(r'permissions=(\d+)', output)
+        if perm_match:
+            return True, perm_match.group(1)
+        
+        return False, "Permissions not found"
+    
+    def _check_file_ownership(self, output: str, flag: str) -> Tuple[bool, str]:
+        """Check file ownership in stat output"""
+        # Format: ownership=root:root /path/to/file
+        if "ownership=" in output:
+            owner_match = re.search(r'ownership=([^\s]+)', output)
+            if owner_match:
+                ownership_value = owner_match.group(1)
+                
+                # If flag is 'ownership', return value
+                if flag == 'ownership':
+                    return True, ownership_value
+                # If flag is 'root:root', compare with value
+                elif flag == 'root:root':
+                    return ownership_value == 'root:root', ownership_value
+                # Otherwise, check contains
+                else:
+                    return flag in ownership_value, ownership_value
+        
+        # Check for exact match first (for output like "root:root")
+        if flag in output:
+            return True, flag
+        
+        # Format: Uid: (    0/    root)   Gid: (    0/    root)
+        uid_match = re.search(r'Uid:\s*\(\s*\d+/\s*(\w+)\)', output)
+        gid_match = re.search(r'Gid:\s*\(\s*\d+/\s*(\w+)\)', output)
+        
+        if uid_match and gid_match:
+            return True, f"{uid_match.group(1)}:{gid_match.group(1)}"
+        elif uid_match:
+            return True, uid_match.group(1)
+        
+        return False, "Ownership not found"
+        
+        return False, "Flag not found"
+
+    def _check_standard_flag(self, output: str, flag: str,
+                            env_var: Optional[str] = None) -> Tuple[bool, str]:
+        """
+        Tìm flag trong command line, trả về (tồn tại, giá trị).
+        Nếu chỉ có --flag không có value => trả 'true'.
+        """
+        for line in output.strip().splitlines():
+            if flag not in line:
+                continue
+
+            # cắt riêng từng token
+            tokens = line.strip().split()
+            for tok in tokens:
+                if tok.startswith(flag + "="):
+                    value = tok.split("=", 1)[1]
+                    return True, value
+                if tok == flag:
+                    return True, "true"
+
+            # check biến môi trường nếu có
+            if env_var:
+                for tok in tokens:
+                    if tok.startswith(env_var + "="):
+                        value = tok.split("=", 1)[1]
+                        return True, value
+
+        return False, "Flag not found"
+
+    def debug_flag_extraction(self, output: str, flag: str) -> None:
+        """Debug function to test flag extraction"""
+        print(f"=== Debug Flag Extraction ===")
+        print(f"Looking for flag: {flag}")
+        print(f"Output snippet: {output[:200]}...")
+        
+        # Test different patterns
+        patterns = [
+            rf'{re.escape(flag)}=([^\s]+)',  # --flag=value
+            rf'{re.escape(flag)}\s+([^\s-]+)',  # --flag value
+            rf'{re.escape(flag)}(?:=([^\s]+))?',  # Current pattern
+        ]
+        
+        for i, pattern in enumerate(patterns):
+            match = re.search(pattern, output)
+            print(f"Pattern {i+1}: {pattern}")
+            if match:
+                print(f"  Match found: {match.group(0)}")
+                print(f"  Value: {match.group(1) if match.group(1) else 'None'}")
+            else:
+                print(f"  No match")
+        print("=" * 30)
+
+    def evaluate_test(self, test_item: Dict[str, Any], audit_output: str) -> Dict[str, Any]:
+        """Standard test evaluation for sections 1,2,3,4"""
+        flag = test_item.get('flag', '')
+        env_var = test_item.get('env')
+        
+        flag_exists, flag_value = self.check_flag_in_output(audit_output, flag, env_var)
+        
+        result = {
+            'flag': flag,
+            'exists': flag_exists,
+            'value': flag_value,
+            'passed': False,
+            'message': ''
+        }
+        
+        # Evaluate based on test type
+        if 'set' in test_item:
+            should_exist = test_item['set']
+            if should_exist and flag_exists:
+                result['passed'] = True
+                result['message'] = f"Flag {flag} is set with value: {flag_value}"
+            elif not should_exist and not flag_exists:
+                result['passed'] = True
+                result['message'] = f"Flag {flag} is not set (as required)"
+            else:
+                result['message'] = f"Flag {flag} existence check failed"
+        
+        elif 'compare' in test_item:
+            compare = test_item['compare']
+            op = compare.get('op', 'eq')
+            expected_value = compare.get('value')
+            
+            if not flag_exists:
+                result['message'] = f"Flag {flag} not found for comparison"
+            else:
+                result['passed'] = self._comparison(test_item)(flag_value)
+                if result['passed']:
+                    result['message'] = f"Flag {flag} comparison passed: {flag_value} {op} {expected_value}"
+                else:
+                    result['message'] = f"Flag {flag} comparison failed: {flag_value} {op} {expected_value}"
+        
+        else:
+            # Default: check if flag exists
+            result['passed'] = flag_exists
+            result['message'] = f"Flag {flag} {'found' if flag_exists else 'not found'}"
+        
+        return result
+
+    def evaluate_policies_test(self, test_item: Dict[str, Any], audit_output: str) -> Dict[str, Any]:
+        """Specialized test evaluation for policies section 5 with yes/no -> true/false mapping"""
+        flag = test_item.get('flag', '')
+        env_var = test_item.get('env')
+        
+        flag_exists, flag_value = self.check_flag_in_output(audit_output, flag, env_var, 'policies')
+        
+        result = {
+            'flag': flag,
+            'exists': flag_exists,
+            'value': flag_value,
+            'passed': False,
+            'message': ''
+        }
+        
+        # Evaluate based on test type
+        if 'set' in test_item:
+            should_exist = test_item['set']
+            if should_exist and flag_exists:
+                result['passed'] = True
+                result['message'] = f"Flag {flag} is set with value: {flag_value}"
+            elif not should_exist and not flag_exists:
+                result['passed'] = True
+                result['message'] = f"Flag {flag} is not set (as required)"
+            else:
+                result['message'] = f"Flag {flag} existence check failed"
+        
+        elif 'compare' in test_item:
+            compare = test_item['compare']
+            op = compare.get('op', 'eq')
+            expected_value = compare.get('value')
+            
+            if not flag_exists:
+                result['message'] = f"Flag {flag} not found for comparison"
+            else:
+                result['passed'] = self._comparison(test_item)(flag_value, policies=True)
+                if result['passed']:
+                    result['message'] = f"Flag {flag} comparison passed: {flag_value} {op} {expected_value}"
+                else:
+                    result['message'] = f"Flag {flag} comparison failed: {flag_value} {op} {expected_value}"
+        
+        else:
+            # Default: check if flag exists
+            result['passed'] = flag_exists
+            result['message'] = f"Flag {flag} {'found' if flag_exists else 'not found'}"
+        
+        return result
+
+    def evaluate_dual_test(self, test_item: Dict[str, Any], audit_output: str, config_output: str, component_type: Optional[str] = None) -> Dict[str, Any]:
+        """Evaluate test with both process and config outputs"""
+        flag = test_item.get('flag', '')
+        path = test_item.get('path', '')
+        env_var = test_item.get('env')
+        
+        result = {
+            'flag': flag,
+            'path': path,
+            'exists': False,
+            'value': '',
+            'passed': False,
+            'message': '',
+            'source': 'none'
+        }
+        
+        # Try to find flag in process output first
+        if flag and audit_output:
+            flag_exists, flag_value = self.check_flag_in_output(audit_output, flag, env_var, component_type)
+            if flag_exists:
+                result['exists'] = True
+                result['value'] = flag_value
+                result['source'] = 'process'
+        
+        # Try to find path in config output if flag not found
+        if not result['exists'] and path and config_output:
+            config_exists, config_value = self.check_config_path(config_output, path)
+            if config_exists:
+                result['exists'] = True
+                result['value'] = config_value
+                result['source'] = 'config'
+        
+        # Evaluate based on test type
+        if 'set' in test_item:
+            should_exist = test_item['set']
+            if should_exist and result['exists']:
+                result['passed'] = True
+                result['message'] = f"Value found: {result['value']} (from {result['source']})"
+            elif not should_exist and not result['exists']:
+                result['passed'] = True
+                result['message'] = f"Value not found (as required)"
+            else:
+                result['message'] = f"Set check failed: expected {should_exist}, found {result['exists']}"
+        
+        elif 'compare' in test_item:
+            compare = test_item['compare']
+            op = compare.get('op', 'eq')
+            expected_value = compare.get('value')
+            
+            if not result['exists']:
+                result['message'] = f"Neither flag {flag} nor config path {path} found"
+            else:
+                result['passed'] = self._comparison(test_item)(result['value'], component_type == 'policies')
+                if result['passed']:
+                    result['message'] = f"Check passed: {result['value']} {op} {expected_value} (from {result['source']})"
+                else:
+                    result['message'] = f"Check failed: {result['value']} {op} {expected_value} (from {result['source']})"
+        
+        else:
+            # Default: check if value exists
+            result['passed'] = result['exists']
+            result['message'] = f"Value {'found' if result['exists'] else 'not found'} (from {result['source']})"
+        
+        return result
+    
+    def _evaluate_comparison(self, actual_value: str, op: str, expected_value: Any, component_type: Optional[str] = None) -> bool:
+        """Compare a flag value using the compiled operator (see operators.py)"""
+        return compile_comparison(op, expected_value)(actual_value, component_type == 'policies')
+    
+    @staticmethod
+    def _comparison(test_item: Dict[str, Any]) -> Comparison:
+        """Comparison compiled by the parser, or compiled now for hand-built test items"""
+        comparison = test_item.get('comparison')
+        if comparison is None:
+            compare = test_item['compare']
+            comparison = compile_comparison(compare.get('op', 'eq'), compare.get('value'))
+        return comparison
+    
+    def tally_lines(self, check: Dict[str, Any], lines: Iterable[str], component_type: str) -> LineTally:
+        """Evaluate audit lines as they arrive and fold the test results into counters"""
+        test_items = check.get('tests', {}).get('test_items', [])
+        tally = LineTally()
+        
+        for raw_line in lines:
+            line = raw_line.strip()
+            if not line:
+                continue
+            tally.line_count += 1
+            
+            for test_item in test_items:
+                # Use specialized evaluation for policies
+                if component_type == 'policies':
+                    result = self.evaluate_policies_test(test_item, line)
+                else:
+                    result = self.evaluate_test(test_item, line)
+                tally.add(result, line)
+        
+        return tally
+    
+    def _check_policies_flag_output(self, output: str, flag: str) -> Tuple[bool, str]:
+        """Dedicated method for policies flag extraction (section 5 only)"""
+        # Handle key: value format (common in kubectl output for policies)
+        lines = output.strip().split('\n')
+        for line in lines:
+            if ':' in line and flag in line:
+                # Extract value after colon
+                parts = line.split(':', 1)
+                if len(parts) == 2:
+                    key = parts[0].strip()
+                    value = parts[1].strip()
+                    if flag in key:
+                        return True, value
+        
+        # Handle comma-separated format like "key: value, key2: value2, flag: target_value"
+        for line in lines:
+            if flag in line and ':' in line:
+                # Use regex to find flag: value pattern anywhere in the line
+                import re
+                pattern = rf'{re.escape(flag)}:\s*([^,\s]+)'
+                match = re.search(pattern, line)
+                if match:
+                    return True, match.group(1)
+        
+        # Handle ** format for some policy checks - improved parsing
+        for line in lines:
+            if '**' in line and flag in line:
+                # Split by spaces but handle key: value pairs properly
+                if f'{flag}:' in line:
+                    # Find the flag: value pattern
+                    import re
+                    pattern = rf'{re.escape(flag)}:\s*(\S+)'
+                    match = re.search(pattern, line)
+                    if match:
+                        return True, match.group(1)
+        
+        # Handle *** format for pod security checks - improved parsing  
+        for line in lines:
+            if '***' in line and flag in line:
+                # Split by spaces but handle key: value pairs properly
+                if f'{flag}:' in line:
+                    # Find the flag: value pattern
+                    import re
+                    pattern = rf'{re.escape(flag)}:\s*(\S+)'
+                    match = re.search(pattern, line)
+                    if match:
+                        return True, match.group(1)
+        
+        return False, "Policy flag not found"
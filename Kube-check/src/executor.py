@@ -5,30 +5,72 @@ File-based approach supporting complex kube-bench patterns
 """
 
 import subprocess
-import re
 import os
-import json
 import time
-import yaml
-from pathlib import Path
-from typing import Dict, List, Any, Tuple, Optional, Union
-from utils import Logger, PerformanceTimer, safe_file_read
-from constants import SUBSTITUTIONS
+import signal
+import itertools
+import threading
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from typing import Dict, List, Any, Tuple, Optional, Union, Iterable, Iterator
+from utils import Logger, PerformanceTimer, DOCUMENT_CACHE, parse_duration
+from discovery import ComponentDiscovery, ProcessTable
+from cluster import ClusterAuditor
+from shards import ShardedEvaluator, LineTally
+from evaluator import AuditEvaluator
+from kubeapi import ClusterUnavailable, APIError, DeadlineExceeded
+from privhelper import PrivilegedHelper, sudo_argv
+from shellpool import ShellPool
 
-class CheckExecutor:
+# Default audit timeouts (seconds); checks can set 'timeout:' in YAML
+AUDIT_TIMEOUT = 60
+MULTILINE_AUDIT_TIMEOUT = 120
+# With duration history, allow this multiple of the average (but at least MIN_AUDIT_TIMEOUT)
+HISTORY_TIMEOUT_FACTOR = 10
+MIN_AUDIT_TIMEOUT = 10
+
+
+class AuditTimeout(Exception):
+    """Audit command cut off by its timeout or the scan deadline"""
+
+    def __init__(self, timeout: float, message: Optional[str] = None):
+        self.timeout = timeout
+        super().__init__(message or f"audit command timed out after {timeout:.1f}s")
+
+
+class CheckExecutor(AuditEvaluator):
     """Enhanced executor supporting all kube-bench patterns including dual audit and policies"""
     
-    def __init__(self, config_data: Dict[str, Any]):
+    def __init__(self, config_data: Dict[str, Any], shell_env: Optional[Dict[str, str]] = None,
+                 sharder: Optional[ShardedEvaluator] = None):
+        super().__init__()
         self.config = config_data
+        # Environment of audit shells (None: this process's); multi-cluster scans point KUBECONFIG per cluster
+        self.shell_env = shell_env
         self.logger = Logger(__name__)
         self.cache = {}
+        self.discovery = ComponentDiscovery(config_data)
+        # In-process API client for 'audit_api:' checks (falls back to the shell audit)
+        self.cluster = ClusterAuditor(config_data)
+        # Process pool for large multi-value outputs, split by namespace; a shared one is closed by its owner
+        self.sharder = sharder or ShardedEvaluator(config_data)
+        self._owns_sharder = sharder is None
+        # Substituted audit command -> Future of its output, shared within one scan
+        self._audit_memo: Optional[Dict[str, Future]] = None
+        self._audit_memo_lock = threading.Lock()
+        # Scan deadline (time.monotonic) and duration history for adaptive timeouts
+        self.deadline: Optional[float] = None
+        self.history = None
+        # Snapshot being captured or replayed; replay answers audits without subprocesses
+        self.snapshot = None
+        # Raw audit outputs saved by 'run --save-audits', or replayed by 'rescore'
+        self.audit_store = None
+        # One sudo'd helper per scan for 'sudo cat' audits, unreadable config files and sudo fixes
+        self.privileged = PrivilegedHelper(config_data)
+        # Long-lived bash workers for multi-line audits
+        self.shells = ShellPool(config_data, env=shell_env)
         
     def get_component_config_from_files(self, component_type: str) -> Dict[str, str]:
-        """Get component configuration from files"""
-        cache_key = f"file_config_{component_type}"
-        if cache_key in self.cache:
-            return self.cache[cache_key]
-        
+        """Get component configuration from files (documents cached by path, mtime and inode)"""
         try:
             with PerformanceTimer(f"read_{component_type}_config", self.logger):
                 if component_type == "etcd":
@@ -45,68 +87,77 @@ class CheckExecutor:
                     self.logger.warning(f"Unknown component type: {component_type}")
                     config_data = {}
             
-            self.cache[cache_key] = config_data
             return config_data
             
         except Exception as e:
             self.logger.error(f"Error reading {component_type} config from files: {e}")
             return {}
     
+    def _candidate_paths(self, component_type: str, component: str, defaults: List[str]) -> List[str]:
+        """Config file candidates from config.yaml confs list, followed by built-in defaults"""
+        section = self.config.get(component_type) or {}
+        component_config = section.get(component) or {}
+        confs = component_config.get('confs') or []
+        if isinstance(confs, str):
+            confs = [confs]
+        paths = [os.path.expandvars(str(path)) for path in confs]
+        return paths + [path for path in defaults if path not in paths]
+    
     def _load_config_from_paths(self, paths: List[str], component_name: str, prefix: str = "", is_manifest: bool = True) -> Dict[str, str]:
         """Generic method to load config from a list of paths"""
         config_dict = {}
-        for path in paths:
-            if Path(path).exists():
-                try:
-                    content = safe_file_read(path)
-                    if not content:
+        for path in DOCUMENT_CACHE.existing(paths):
+            try:
+                if path.endswith(('.yaml', '.yml')):
+                    data = DOCUMENT_CACHE.load_yaml(path, privileged=self.privileged)
+                    if not data:
                         continue
-                        
-                    if path.endswith(('.yaml', '.yml')):
-                        data = yaml.safe_load(content)
-                        if is_manifest:
-                            extracted = self._extract_args_from_manifest(data, component_name)
-                        else:
-                            # Flatten simple dict if needed or just use as is if structure matches
-                            # For kubelet/proxy, it's flat key-value mostly
-                            extracted = {}
-                            if isinstance(data, dict):
-                                for k, v in data.items():
-                                    extracted[k] = v
+                    if is_manifest:
+                        extracted = self._extract_args_from_manifest(data, component_name)
                     else:
-                        extracted = self._parse_config_file(content)
-                    
-                    # Apply prefix if needed
-                    for key, value in extracted.items():
-                        final_key = f"{prefix}_{key}" if prefix else key
-                        config_dict[final_key] = str(value)
-                    
-                    self.logger.info(f"Read {component_name} config from {path}")
-                    return config_dict # Return on first successful read
-                    
-                except Exception as e:
-                    self.logger.warning(f"Failed to read {path}: {e}")
-                    continue
+                        # Flatten simple dict if needed or just use as is if structure matches
+                        # For kubelet/proxy, it's flat key-value mostly
+                        extracted = {}
+                        if isinstance(data, dict):
+                            for k, v in data.items():
+                                extracted[k] = v
+                else:
+                    content = DOCUMENT_CACHE.read(path, privileged=self.privileged)
+                    if not content:
+                        continue
+                    extracted = self._parse_config_file(content)
+                
+                # Apply prefix if needed
+                for key, value in extracted.items():
+                    final_key = f"{prefix}_{key}" if prefix else key
+                    config_dict[final_key] = str(value)
+                
+                self.logger.info(f"Read {component_name} config from {path}")
+                return config_dict # Return on first successful read
+                
+            except Exception as e:
+                self.logger.warning(f"Failed to read {path}: {e}")
+                continue
         return config_dict
     
     def _get_etcd_config_from_files(self) -> Dict[str, str]:
         """Read etcd config from manifest files"""
-        etcd_paths = [
+        etcd_paths = self._candidate_paths('etcd', 'etcd', [
             '/etc/kubernetes/manifests/etcd.yaml',
             '/etc/kubernetes/manifests/etcd.yml',
             '/etc/kubernetes/manifests/etcd.manifest',
             '/var/lib/rancher/rke2/agent/pod-manifests/etcd.yaml',
             '/var/lib/rancher/k3s/server/db/etcd/config'
-        ]
+        ])
         return self._load_config_from_paths(etcd_paths, 'etcd')
     
     def _get_controlplane_config_from_files(self) -> Dict[str, str]:
         """Read API server config from manifest files"""
-        api_server_paths = [
+        api_server_paths = self._candidate_paths('controlplane', 'apiserver', [
             '/etc/kubernetes/manifests/kube-apiserver.yaml',
             '/etc/kubernetes/manifests/kube-apiserver.yml',
             '/etc/kubernetes/manifests/kube-apiserver.manifest'
-        ]
+        ])
         return self._load_config_from_paths(api_server_paths, 'kube-apiserver', prefix='apiserver')
     
     def _get_master_config_from_files(self) -> Dict[str, str]:
@@ -114,16 +165,16 @@ class CheckExecutor:
         config_dict = {}
         
         components = [
-            ('kube-apiserver', 'apiserver'),
-            ('kube-controller-manager', 'controller-manager'),
-            ('kube-scheduler', 'scheduler')
+            ('kube-apiserver', 'apiserver', 'apiserver'),
+            ('kube-controller-manager', 'controller-manager', 'controllermanager'),
+            ('kube-scheduler', 'scheduler', 'scheduler')
         ]
         
-        for component_name, prefix in components:
-            manifest_paths = [
+        for component_name, prefix, config_key in components:
+            manifest_paths = self._candidate_paths('master', config_key, [
                 f'/etc/kubernetes/manifests/{component_name}.yaml',
                 f'/etc/kubernetes/manifests/{component_name}.yml'
-            ]
+            ])
             config_dict.update(self._load_config_from_paths(manifest_paths, component_name, prefix))
         
         return config_dict
@@ -133,19 +184,19 @@ class CheckExecutor:
         config_dict = {}
         
         # Kubelet config paths
-        kubelet_config_paths = [
+        kubelet_config_paths = self._candidate_paths('node', 'kubelet', [
             '/var/lib/kubelet/config.yaml',
             '/etc/kubernetes/kubelet/kubelet-config.yaml',
             '/etc/kubernetes/kubelet.yaml'
-        ]
+        ])
         config_dict.update(self._load_config_from_paths(kubelet_config_paths, 'kubelet', prefix='kubelet', is_manifest=False))
         
         # Kube-proxy config paths
-        proxy_config_paths = [
+        proxy_config_paths = self._candidate_paths('node', 'proxy', [
             '/var/lib/kube-proxy/config.conf',
             '/etc/kubernetes/kube-proxy.yaml',
             '/var/lib/kube-proxy/kubeconfig.conf'
-        ]
+        ])
         config_dict.update(self._load_config_from_paths(proxy_config_paths, 'kube-proxy', prefix='proxy', is_manifest=False))
         
         return config_dict
@@ -199,15 +250,262 @@ class CheckExecutor:
         
         return config_dict
     
-    def execute_audit_command(self, audit_cmd: str, component_type: str = "etcd") -> str:
-        """Execute audit command with enhanced variable substitution"""
+    def attach_snapshot(self, snapshot):
+        """Capture every input of the following checks into a snapshot, or replay one"""
+        self.snapshot = snapshot
+        DOCUMENT_CACHE.clear()
+        DOCUMENT_CACHE.snapshot = snapshot
+        self.cache.clear()
+        if snapshot.replay:
+            process_table = ProcessTable(processes=snapshot.processes())
+        else:
+            process_table = ProcessTable()
+            snapshot.record_processes(process_table.processes)
+        # Rediscover so variable resolution reads through (or from) the snapshot
+        self.discovery = ComponentDiscovery(self.config, process_table)
+        self.cluster.use_snapshot(snapshot)
+    
+    def begin_scan(self):
+        """Run each distinct audit command once until end_scan()"""
+        with self._audit_memo_lock:
+            self._audit_memo = {}
+        self.cluster.invalidate()
+    
+    def end_scan(self):
+        """Stop sharing audit output (e.g. before re-verification after remediation)"""
+        with self._audit_memo_lock:
+            self._audit_memo = None
+    
+    def audit_key(self, check: Dict[str, Any], component_type: str) -> str:
+        """Substituted audit commands of a check, identical for checks sharing their audits"""
+        return '\0'.join(self._substitute_variables(check.get(key) or '', component_type)
+                          for key in ('audit', 'audit_config'))
+    
+    def set_deadline(self, seconds: Optional[float]):
+        """Set (or clear with None) the time budget for the rest of the scan"""
+        self.deadline = time.monotonic() + seconds if seconds is not None else None
+    
+    def remaining_budget(self) -> Optional[float]:
+        """Seconds left before the scan deadline, None without a deadline"""
+        if self.deadline is None:
+            return None
+        return max(0.0, self.deadline - time.monotonic())
+    
+    def check_timeout(self, check: Dict[str, Any]) -> float:
+        """Timeout for one check: YAML 'timeout:', else adapted from history, capped by the deadline"""
+        timeout = parse_duration(check.get('timeout'))
+        if timeout is None:
+            multiline = any('\n' in (check.get(key) or '') for key in ('audit', 'audit_config'))
+            timeout = MULTILINE_AUDIT_TIMEOUT if multiline else AUDIT_TIMEOUT
+            entry = self.history.durations.get(str(check.get('id'))) if self.history else None
+            if entry:
+                timeout = min(timeout, max(MIN_AUDIT_TIMEOUT, entry['avg'] * HISTORY_TIMEOUT_FACTOR))
+        
+        remaining = self.remaining_budget()
+        if remaining is not None:
+            timeout = min(timeout, remaining)
+        return timeout
+    
+    def execute_audit_command(self, audit_cmd: str, component_type: str = "etcd",
+                              timeout: Optional[float] = None) -> str:
+        """Execute audit command, sharing output with identical commands in the current scan"""
         if not audit_cmd:
             return ""
+        if timeout is None:
+            timeout = MULTILINE_AUDIT_TIMEOUT if '\n' in audit_cmd else AUDIT_TIMEOUT
+        if timeout <= 0:
+            raise AuditTimeout(0, "scan deadline reached before the audit started")
+        
+        with self._audit_memo_lock:
+            memo = self._audit_memo
+            if memo is None:
+                future = owner = None
+            else:
+                key = self._substitute_variables(audit_cmd, component_type)
+                future = memo.get(key)
+                owner = future is None
+                if owner:
+                    future = memo[key] = Future()
+        
+        if future is None:
+            return self._run_audit_command(audit_cmd, component_type, timeout)
+        if not owner:
+            try:
+                return future.result(timeout=timeout)
+            except FutureTimeoutError:
+                raise AuditTimeout(timeout, "timed out waiting for a shared audit command")
         
+        try:
+            output = self._run_audit_command(audit_cmd, component_type, timeout)
+        except AuditTimeout as e:
+            future.set_exception(e)
+            raise
+        future.set_result(output)
+        return output
+    
+    def _execute_api_audit(self, check_id: str, audit_api: Optional[List[Dict[str, Any]]],
+                           timeout: float) -> Optional[str]:
+        """Run an audit_api spec in-process within timeout; None means use the shell audit instead"""
+        if not audit_api:
+            return None
+        if timeout <= 0:
+            raise AuditTimeout(0, "scan deadline reached before the audit started")
+        try:
+            return self.cluster.run(audit_api, deadline=time.monotonic() + timeout)
+        except DeadlineExceeded as e:
+            raise AuditTimeout(timeout, f"API audit: {e}")
+        except ClusterUnavailable as e:
+            self.logger.debug(f"API client unavailable for {check_id}, using shell audit: {e}")
+        except (APIError, OSError) as e:
+            self.logger.warning(f"API audit for {check_id} failed, using shell audit: {e}")
+        return None
+    
+    def _stream_audit_entries(self, check: Dict[str, Any], component_type: str, deadline: float,
+                              use_api: bool = True) -> Iterator[Tuple[Optional[str], str]]:
+        """(namespace, line) of a multi-value audit, from the API stream if possible, else the shell"""
+        audit_api = check.get('audit_api') if use_api else None
+        if audit_api:
+            try:
+                # The API stream is read lazily: the deadline bounds every page as it is consumed
+                entries = self.cluster.stream_entries(audit_api, deadline)
+                # Pull the first entry now so connection/auth errors still fall back to the shell
+                first = next(entries, None)
+                return itertools.chain([first], entries) if first is not None else iter(())
+            except ClusterUnavailable as e:
+                self.logger.debug(f"API client unavailable for {check.get('id')}, using shell audit: {e}")
+            except (APIError, OSError) as e:
+                self.logger.warning(f"API audit for {check.get('id')} failed, using shell audit: {e}")
+        
+        audit_cmd = check.get('audit')
+        if not audit_cmd:
+            return iter(())
+        timeout = deadline - time.monotonic()
+        if timeout <= 0:
+            raise AuditTimeout(0, "scan deadline reached before the audit started")
+        substituted_cmd = self._substitute_variables(audit_cmd, component_type)
+        executable = '/bin/bash' if '\n' in audit_cmd else None
+        # Shell output carries no namespace
+        return ((None, line) for line in self._stream_shell_lines(substituted_cmd, timeout, executable))
+    
+    def _stream_shell_lines(self, command: str, timeout: float, executable: Optional[str] = None) -> Iterator[str]:
+        """Yield stdout lines while the command runs instead of buffering all output"""
+        if self.snapshot is not None:
+            # Snapshots hold whole outputs: record or replay through _run_shell
+            try:
+                result = self._run_shell(command, timeout, executable)
+            except subprocess.TimeoutExpired:
+                self.logger.error(f"Streaming audit command timed out after {timeout:.1f}s")
+                raise AuditTimeout(timeout)
+            yield from result.stdout.splitlines(keepends=True)
+            return
+        
+        process = subprocess.Popen(
+            command,
+            shell=True,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            text=True,
+            executable=executable,
+            env=self.shell_env,
+            start_new_session=True
+        )
+        timed_out = threading.Event()
+        
+        def kill_group():
+            timed_out.set()
+            try:
+                os.killpg(process.pid, signal.SIGKILL)
+            except OSError:
+                pass
+        
+        timer = threading.Timer(timeout, kill_group)
+        timer.daemon = True
+        timer.start()
+        try:
+            for line in process.stdout:
+                yield line
+            process.wait()
+        finally:
+            timer.cancel()
+            if process.poll() is None:
+                kill_group()
+                timed_out.clear()
+                process.wait()
+            process.stdout.close()
+        
+        if timed_out.is_set():
+            self.logger.error(f"Streaming audit command timed out after {timeout:.1f}s")
+            raise AuditTimeout(timeout)
+    
+    def _run_shell(self, command: str, timeout: float, executable: Optional[str] = None) -> subprocess.CompletedProcess:
+        """Run a shell command, killing its whole process group (kubectl loops included) on timeout"""
+        if self.snapshot is not None and self.snapshot.replay:
+            recorded = self.snapshot.command(command, executable)
+            return subprocess.CompletedProcess(command, recorded['returncode'], recorded['stdout'], recorded['stderr'])
+        
+        result = self._run_privileged(command, timeout) if executable is None else None
+        if result is not None:
+            if self.snapshot is not None:
+                self.snapshot.record_command(command, executable, result.returncode, result.stdout, result.stderr)
+            return result
+        
+        if executable is not None and self.shells.enabled:
+            result = self._run_in_shell_pool(command, timeout, executable)
+            if result is not None:
+                if self.snapshot is not None:
+                    self.snapshot.record_command(command, executable, result.returncode, result.stdout,
+                                                 result.stderr)
+                return result
+        
+        process = subprocess.Popen(
+            command,
+            shell=True,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            text=True,
+            executable=executable,
+            env=self.shell_env,
+            start_new_session=True
+        )
+        try:
+            stdout, stderr = process.communicate(timeout=timeout)
+        except subprocess.TimeoutExpired:
+            try:
+                os.killpg(process.pid, signal.SIGKILL)
+            except OSError:
+                pass
+            process.communicate()
+            raise
+        if self.snapshot is not None:
+            self.snapshot.record_command(command, executable, process.returncode, stdout, stderr)
+        return subprocess.CompletedProcess(command, process.returncode, stdout, stderr)
+    
+    def _run_in_shell_pool(self, command: str, timeout: float,
+                           executable: str) -> Optional[subprocess.CompletedProcess]:
+        """Multi-line script on a pooled bash worker; None starts a one-off shell instead"""
+        try:
+            return self.shells.run(command, timeout, executable)
+        except OSError as e:
+            self.logger.debug(f"Shell worker failed, using a new shell: {e}")
+            return None
+    
+    def _run_privileged(self, command: str, timeout: float) -> Optional[subprocess.CompletedProcess]:
+        """'sudo cat FILE' and other approved 'sudo' audits through the helper; None runs the shell"""
+        argv = sudo_argv(command)
+        if argv is None or not self.privileged.available():
+            return None
+        try:
+            return self.privileged.run(argv, timeout)
+        except OSError as e:
+            self.logger.debug(f"Privileged helper failed for '{command}', using sudo: {e}")
+            return None
+    
+    def _run_audit_command(self, audit_cmd: str, component_type: str, timeout: float = AUDIT_TIMEOUT) -> str:
+        """Execute audit command with enhanced variable substitution"""
         try:
             # Handle multi-line audit commands (like in policies)
             if '\n' in audit_cmd:
-                return self._execute_multiline_audit(audit_cmd, component_type)
+                return self._execute_multiline_audit(audit_cmd, component_type, timeout)
             
             # Substitute variables
             substituted_cmd = self._substitute_variables(audit_cmd, component_type)
@@ -215,13 +513,7 @@ class CheckExecutor:
             self.logger.debug(f"Executing: {substituted_cmd}")
             
             # Execute command
-            result = subprocess.run(
-                substituted_cmd,
-                shell=True,
-                capture_output=True,
-                text=True,
-                timeout=60
-            )
+            result = self._run_shell(substituted_cmd, timeout)
             
             if result.returncode != 0 and result.returncode != 1:
                 self.logger.debug(f"Command returned {result.returncode}: {result.stderr}")
@@ -229,486 +521,34 @@ class CheckExecutor:
             return result.stdout
             
         except subprocess.TimeoutExpired:
-            self.logger.error("Audit command timed out")
-            return ""
+            self.logger.error(f"Audit command timed out after {timeout:.1f}s")
+            raise AuditTimeout(timeout)
         except Exception as e:
             self.logger.error(f"Error executing audit command: {e}")
             return ""
     
-    def _execute_multiline_audit(self, audit_cmd: str, component_type: str) -> str:
+    def _execute_multiline_audit(self, audit_cmd: str, component_type: str,
+                                 timeout: float = MULTILINE_AUDIT_TIMEOUT) -> str:
         """Execute multi-line audit commands (common in policies)"""
         try:
             # Substitute variables in the entire script
             substituted_cmd = self._substitute_variables(audit_cmd, component_type)
             
             # Execute as a shell script
-            result = subprocess.run(
-                substituted_cmd,
-                shell=True,
-                capture_output=True,
-                text=True,
-                timeout=120,
-                executable='/bin/bash'
-            )
+            result = self._run_shell(substituted_cmd, timeout, executable='/bin/bash')
             
             return result.stdout
             
         except subprocess.TimeoutExpired:
-            self.logger.error("Multi-line audit command timed out")
-            return ""
+            self.logger.error(f"Multi-line audit command timed out after {timeout:.1f}s")
+            raise AuditTimeout(timeout)
         except Exception as e:
             self.logger.error(f"Error executing multi-line audit: {e}")
             return ""
     
     def _substitute_variables(self, cmd: str, component_type: str) -> str:
-        """Enhanced variable substitution using centralized constants"""
-        # Get substitutions from constants
-        component_subs = SUBSTITUTIONS.get(component_type, {})
-        
-        # Apply substitutions
-        for var, value in component_subs.items():
-            cmd = cmd.replace(var, value)
-        
-        return cmd
-    
-    def check_flag_in_output(self, output: str, flag: str, env_var: Optional[str] = None, component_type: Optional[str] = None) -> Tuple[bool, str]:
-        """Enhanced flag checking with separate logic for policies vs other components"""
-        if not output:
-            return False, "No output from audit command"
-        
-        # Separate handling for policies (section 5) vs other components
-        if component_type == 'policies':
-            return self._check_policies_flag_output(output, flag)
-        
-        # Original logic for other components (sections 1, 2, 3, 4)
-        if "permissions=" in output or "Access:" in output:
-            return self._check_file_permissions(output, flag)
-        elif "ownership=" in output or "Uid:" in output:
-            return self._check_file_ownership(output, flag)
-        elif "error:" in output.lower() or "no such file" in output.lower():
-            return False, f"Error: {output.strip()}"
-        
-        # Special case for root:root exact match
-        if flag == 'root:root' and flag in output:
-            return True, flag
-        
-        # Special case for "File not found" message
-        if flag == 'File not found' and flag in output:
-            return True, flag
-        
-        # Standard flag checking (for ps output)
-        return self._check_standard_flag(output, flag, env_var)
-
-    def check_config_path(self, config_output: str, path: str) -> Tuple[bool, str]:
-        """Check JSON path in config output"""
-        try:
-            if not config_output.strip():
-                return False, "Empty config output"
-            
-            # Parse YAML/JSON config
-            if config_output.strip().startswith('{'):
-                config_data = json.loads(config_output)
-            else:
-                config_data = yaml.safe_load(config_output)
-            
-            if not config_data:
-                return False, "Empty config data"
-            
-            # Extract value using path like "{.authentication.anonymous.enabled}"
-            path_clean = path.strip('{}').strip('.')
-            if not path_clean:
-                return False, "Empty path"
-            
-            path_parts = path_clean.split('.')
-            current = config_data
-            
-            for part in path_parts:
-                if part and isinstance(current, dict) and part in current:
-                    current = current[part]
-                else:
-                    return False, f"Path not found: {part}"
-            
-            return True, str(current)
-            
-        except json.JSONDecodeError as e:
-            self.logger.debug(f"JSON parse error: {e}")
-            return False, f"JSON parse error: {e}"
-        except yaml.YAMLError as e:
-            self.logger.debug(f"YAML parse error: {e}")
-            return False, f"YAML parse error: {e}"
-        except Exception as e:
-            self.logger.debug(f"Failed to parse config: {e}")
-            return False, f"Parse error: {e}"
-    
-    def _check_policy_output(self, output: str, flag: str) -> Tuple[bool, str]:
-        """Check policy output with ** format"""
-        lines = output.strip().split('\n')
-        for line in lines:
-            if '**' in line and flag in line:
-                # Extract value after flag
-                parts = line.split()
-                for part in parts:
-                    if flag in part and ':' in part:
-                        try:
-                            value = part.split(':', 1)[1].strip()
-                            return True, value
-                        except IndexError:
-                            continue
-        return False, "Policy value not found"
-    
-    def _check_pod_security_output(self, output: str, flag: str) -> Tuple[bool, str]:
-        """Check pod security output with *** format"""
-        lines = output.strip().split('\n')
-        for line in lines:
-            if '***' in line and flag in line:
-                parts = line.split()
-                for part in parts:
-                    if flag in part and ':' in part:
-                        try:
-                            value = part.split(':', 1)[1].strip()
-                            return True, value
-                        except IndexError:
-                            continue
-        return False, "Pod security value not found"
-    
-    def _check_boolean_output(self, output: str, flag: str) -> Tuple[bool, str]:
-        """Check boolean output from kubectl commands"""
-        lines = output.strip().split('\n')
-        for line in lines:
-            if flag in line and ':' in line:
-                try:
-                    value = line.split(':', 1)[1].strip()
-                    return True, value
-                except IndexError:
-                    continue
-        return False, "Boolean value not found"
-    
-    def _check_file_permissions(self, output: str, flag: str) -> Tuple[bool, str]:
-        """Check file permissions in stat output"""
-        # Format: Access: (0644/-rw-r--r--)
-        access_match = re.search(r'Access:\s*\((\d+)/', output)
-        if access_match:
-            return True, access_match.group(1)
-        
-        # Format: permissions=644
-        perm_match = re.search(r'permissions=(\d+)', output)
-        if perm_match:
-            return True, perm_match.group(1)
-        
-        return False, "Permissions not found"
-    
-    def _check_file_ownership(self, output: str, flag: str) -> Tuple[bool, str]:
-        """Check file ownership in stat output"""
-        # Format: ownership=root:root /path/to/file
-        if "ownership=" in output:
-            owner_match = re.search(r'ownership=([^\s]+)', output)
-            if owner_match:
-                ownership_value = owner_match.group(1)
-                
-                # If flag is 'ownership', return value
-                if flag == 'ownership':
-                    return True, ownership_value
-                # If flag is 'root:root', compare with value
-                elif flag == 'root:root':
-                    return ownership_value == 'root:root', ownership_value
-                # Otherwise, check contains
-                else:
-                    return flag in ownership_value, ownership_value
-        
-        # Check for exact match first (for output like "root:root")
-        if flag in output:
-            return True, flag
-        
-        # Format: Uid: (    0/    root)   Gid: (    0/    root)
-        uid_match = re.search(r'Uid:\s*\(\s*\d+/\s*(\w+)\)', output)
-        gid_match = re.search(r'Gid:\s*\(\s*\d+/\s*(\w+)\)', output)
-        
-        if uid_match and gid_match:
-            return True, f"{uid_match.group(1)}:{gid_match.group(1)}"
-        elif uid_match:
-            return True, uid_match.group(1)
-        
-        return False, "Ownership not found"
-        
-        return False, "Flag not found"
-
-    def _check_standard_flag(self, output: str, flag: str,
-                            env_var: Optional[str] = None) -> Tuple[bool, str]:
-        """
-        Tìm flag trong command line, trả về (tồn tại, giá trị).
-        Nếu chỉ có --flag không có value => trả 'true'.
-        """
-        for line in output.strip().splitlines():
-            if flag not in line:
-                continue
-
-            # cắt riêng từng token
-            tokens = line.strip().split()
-            for tok in tokens:
-                if tok.startswith(flag + "="):
-                    value = tok.split("=", 1)[1]
-                    return True, value
-                if tok == flag:
-                    return True, "true"
-
-            # check biến môi trường nếu có
-            if env_var:
-                for tok in tokens:
-                    if tok.startswith(env_var + "="):
-                        value = tok.split("=", 1)[1]
-                        return True, value
-
-        return False, "Flag not found"
-
-    def debug_flag_extraction(self, output: str, flag: str) -> None:
-        """Debug function to test flag extraction"""
-        print(f"=== Debug Flag Extraction ===")
-        print(f"Looking for flag: {flag}")
-        print(f"Output snippet: {output[:200]}...")
-        
-        # Test different patterns
-        patterns = [
-            rf'{re.escape(flag)}=([^\s]+)',  # --flag=value
-            rf'{re.escape(flag)}\s+([^\s-]+)',  # --flag value
-            rf'{re.escape(flag)}(?:=([^\s]+))?',  # Current pattern
-        ]
-        
-        for i, pattern in enumerate(patterns):
-            match = re.search(pattern, output)
-            print(f"Pattern {i+1}: {pattern}")
-            if match:
-                print(f"  Match found: {match.group(0)}")
-                print(f"  Value: {match.group(1) if match.group(1) else 'None'}")
-            else:
-                print(f"  No match")
-        print("=" * 30)
-
-    def evaluate_test(self, test_item: Dict[str, Any], audit_output: str) -> Dict[str, Any]:
-        """Standard test evaluation for sections 1,2,3,4"""
-        flag = test_item.get('flag', '')
-        env_var = test_item.get('env')
-        
-        flag_exists, flag_value = self.check_flag_in_output(audit_output, flag, env_var)
-        
-        result = {
-            'flag': flag,
-            'exists': flag_exists,
-            'value': flag_value,
-            'passed': False,
-            'message': ''
-        }
-        
-        # Evaluate based on test type
-        if 'set' in test_item:
-            should_exist = test_item['set']
-            if should_exist and flag_exists:
-                result['passed'] = True
-                result['message'] = f"Flag {flag} is set with value: {flag_value}"
-            elif not should_exist and not flag_exists:
-                result['passed'] = True
-                result['message'] = f"Flag {flag} is not set (as required)"
-            else:
-                result['message'] = f"Flag {flag} existence check failed"
-        
-        elif 'compare' in test_item:
-            compare = test_item['compare']
-            op = compare.get('op', 'eq')
-            expected_value = compare.get('value')
-            
-            if not flag_exists:
-                result['message'] = f"Flag {flag} not found for comparison"
-            else:
-                result['passed'] = self._evaluate_comparison(flag_value, op, expected_value)
-                if result['passed']:
-                    result['message'] = f"Flag {flag} comparison passed: {flag_value} {op} {expected_value}"
-                else:
-                    result['message'] = f"Flag {flag} comparison failed: {flag_value} {op} {expected_value}"
-        
-        else:
-            # Default: check if flag exists
-            result['passed'] = flag_exists
-            result['message'] = f"Flag {flag} {'found' if flag_exists else 'not found'}"
-        
-        return result
-
-    def evaluate_policies_test(self, test_item: Dict[str, Any], audit_output: str) -> Dict[str, Any]:
-        """Specialized test evaluation for policies section 5 with yes/no -> true/false mapping"""
-        flag = test_item.get('flag', '')
-        env_var = test_item.get('env')
-        
-        flag_exists, flag_value = self.check_flag_in_output(audit_output, flag, env_var, 'policies')
-        
-        result = {
-            'flag': flag,
-            'exists': flag_exists,
-            'value': flag_value,
-            'passed': False,
-            'message': ''
-        }
-        
-        # Evaluate based on test type
-        if 'set' in test_item:
-            should_exist = test_item['set']
-            if should_exist and flag_exists:
-                result['passed'] = True
-                result['message'] = f"Flag {flag} is set with value: {flag_value}"
-            elif not should_exist and not flag_exists:
-                result['passed'] = True
-                result['message'] = f"Flag {flag} is not set (as required)"
-            else:
-                result['message'] = f"Flag {flag} existence check failed"
-        
-        elif 'compare' in test_item:
-            compare = test_item['compare']
-            op = compare.get('op', 'eq')
-            expected_value = compare.get('value')
-            
-            if not flag_exists:
-                result['message'] = f"Flag {flag} not found for comparison"
-            else:
-                result['passed'] = self._evaluate_comparison(flag_value, op, expected_value, 'policies')
-                if result['passed']:
-                    result['message'] = f"Flag {flag} comparison passed: {flag_value} {op} {expected_value}"
-                else:
-                    result['message'] = f"Flag {flag} comparison failed: {flag_value} {op} {expected_value}"
-        
-        else:
-            # Default: check if flag exists
-            result['passed'] = flag_exists
-            result['message'] = f"Flag {flag} {'found' if flag_exists else 'not found'}"
-        
-        return result
-
-    def evaluate_dual_test(self, test_item: Dict[str, Any], audit_output: str, config_output: str, component_type: Optional[str] = None) -> Dict[str, Any]:
-        """Evaluate test with both process and config outputs"""
-        flag = test_item.get('flag', '')
-        path = test_item.get('path', '')
-        env_var = test_item.get('env')
-        
-        result = {
-            'flag': flag,
-            'path': path,
-            'exists': False,
-            'value': '',
-            'passed': False,
-            'message': '',
-            'source': 'none'
-        }
-        
-        # Try to find flag in process output first
-        if flag and audit_output:
-            flag_exists, flag_value = self.check_flag_in_output(audit_output, flag, env_var, component_type)
-            if flag_exists:
-                result['exists'] = True
-                result['value'] = flag_value
-                result['source'] = 'process'
-        
-        # Try to find path in config output if flag not found
-        if not result['exists'] and path and config_output:
-            config_exists, config_value = self.check_config_path(config_output, path)
-            if config_exists:
-                result['exists'] = True
-                result['value'] = config_value
-                result['source'] = 'config'
-        
-        # Evaluate based on test type
-        if 'set' in test_item:
-            should_exist = test_item['set']
-            if should_exist and result['exists']:
-                result['passed'] = True
-                result['message'] = f"Value found: {result['value']} (from {result['source']})"
-            elif not should_exist and not result['exists']:
-                result['passed'] = True
-                result['message'] = f"Value not found (as required)"
-            else:
-                result['message'] = f"Set check failed: expected {should_exist}, found {result['exists']}"
-        
-        elif 'compare' in test_item:
-            compare = test_item['compare']
-            op = compare.get('op', 'eq')
-            expected_value = compare.get('value')
-            
-            if not result['exists']:
-                result['message'] = f"Neither flag {flag} nor config path {path} found"
-            else:
-                result['passed'] = self._evaluate_comparison(result['value'], op, expected_value, component_type)
-                if result['passed']:
-                    result['message'] = f"Check passed: {result['value']} {op} {expected_value} (from {result['source']})"
-                else:
-                    result['message'] = f"Check failed: {result['value']} {op} {expected_value} (from {result['source']})"
-        
-        else:
-            # Default: check if value exists
-            result['passed'] = result['exists']
-            result['message'] = f"Value {'found' if result['exists'] else 'not found'} (from {result['source']})"
-        
-        return result
-    
-    def _evaluate_comparison(self, actual_value: str, op: str, expected_value: Any, component_type: Optional[str] = None) -> bool:
-        """Enhanced comparison operations with separate logic for policies"""
-        try:
-            actual_str = str(actual_value).strip()
-            expected_str = str(expected_value).strip()
-            
-            # Special handling for policies - map no/yes to false/true for boolean comparisons
-            if component_type == 'policies':
-                if actual_str.lower() == 'no':
-                    actual_str = 'false'
-                elif actual_str.lower() == 'yes':
-                    actual_str = 'true'
-                
-                # Handle boolean expected values
-                if isinstance(expected_value, bool):
-                    expected_str = 'true' if expected_value else 'false'
-            
-            if op == 'eq':
-                # Special handling for boolean values
-                if expected_str.lower() in ['true', 'false']:
-                    return actual_str.lower() == expected_str.lower()
-                return actual_str.lower() == expected_str.lower()
-            elif op == 'noteq':
-                return actual_str.lower() != expected_str.lower()
-            elif op == 'has':
-                return expected_str in actual_str
-            elif op == 'nothave':
-                return expected_str not in actual_str
-            elif op in ['gte', 'lte', 'gt', 'lt']:
-                try:
-                    actual_num = float(actual_str)
-                    expected_num = float(expected_str)
-                    
-                    if op == 'gte':
-                        return actual_num >= expected_num
-                    elif op == 'lte':
-                        return actual_num <= expected_num
-                    elif op == 'gt':
-                        return actual_num > expected_num
-                    elif op == 'lt':
-                        return actual_num < expected_num
-                except ValueError:
-                    return False
-            elif op == 'bitmask':
-                return self._check_bitmask(actual_str, expected_str)
-            elif op == 'valid_elements':
-                allowed_values = [v.strip() for v in expected_str.split(',')]
-                return actual_str in allowed_values
-            else:
-                self.logger.warning(f"Unknown comparison operator: {op}")
-                return False
-                
-        except Exception as e:
-            self.logger.error(f"Comparison error: {e}")
-            return False
-
-    
-    def _check_bitmask(self, actual_value: str, expected_value: str) -> bool:
-        """Check file permissions using bitmask"""
-        try:
-            actual_perm = int(actual_value, 8) if actual_value.isdigit() else int(actual_value)
-            expected_perm = int(expected_value, 8) if expected_value.isdigit() else int(expected_value)
-            return (actual_perm & 0o777) <= expected_perm
-        except (ValueError, TypeError):
-            return False
+        """Single-pass variable substitution using discovered component paths"""
+        return self.discovery.substitute(cmd, component_type)
     
     def execute_check(self, check: Dict[str, Any], component_type: str = "etcd") -> Dict[str, Any]:
         """Execute a single security check with dual audit support"""
@@ -761,15 +601,39 @@ class CheckExecutor:
             audit_output = ""
             config_output = ""
             
-            if audit_cmd:
-                audit_output = self.execute_audit_command(audit_cmd, component_type)
-            
-            if audit_config_cmd:
-                config_output = self.execute_audit_command(audit_config_cmd, component_type)
+            # Both audits share one per-check budget
+            check_timeout = self.check_timeout(check)
+            check_deadline = time.monotonic() + check_timeout
+            # Rescoring evaluates the saved outputs and runs nothing
+            saved = self.audit_store.get(check_id) if self.audit_store is not None and self.audit_store.replay \
+                else None
             
-            # Handle checks with multiple values
+            # Multi-value audits are consumed line by line as they are produced
             if use_multiple_values:
-                return self._execute_multiple_values_check(check, audit_output, component_type, start_time)
+                if saved is not None:
+                    entries = ((None, line) for line in saved.get('audit', '').split('\n'))
+                    tally = self._tally_entries(check, component_type, entries)
+                else:
+                    tally = self._tally_audit(check, component_type, check_deadline, check_timeout)
+                return self._execute_multiple_values_check(check, tally, component_type, start_time)
+            
+            if saved is not None:
+                audit_output = saved.get('audit', '')
+                config_output = saved.get('audit_config', '')
+            else:
+                api_output = self._execute_api_audit(check_id, check.get('audit_api'),
+                                                     check_deadline - time.monotonic())
+                if api_output is not None:
+                    audit_output = api_output
+                elif audit_cmd:
+                    audit_output = self.execute_audit_command(audit_cmd, component_type,
+                                                              timeout=check_deadline - time.monotonic())
+                
+                if audit_config_cmd:
+                    config_output = self.execute_audit_command(audit_config_cmd, component_type,
+                                                               timeout=check_deadline - time.monotonic())
+                if self.audit_store is not None:
+                    self.audit_store.record(check_id, component_type, audit_output, config_output)
             
             # Process test items with dual output support
             test_items = tests.get('test_items', [])
@@ -811,6 +675,24 @@ class CheckExecutor:
                 'type': check_type
             }
             
+        except AuditTimeout as e:
+            execution_time = time.time() - start_time
+            self.logger.warning(f"Check {check_id} timed out: {e}")
+            
+            return {
+                'id': check_id,
+                'text': check.get('text', 'No description'),
+                'passed': None,
+                'status': 'TIMEOUT',
+                'scored': scored,
+                'test_results': [],
+                'remediation': check.get('remediation'),
+                'error': str(e),
+                'timeout': round(e.timeout, 3),
+                'execution_time': round(execution_time, 3),
+                'type': check_type
+            }
+        
         except Exception as e:
             execution_time = time.time() - start_time
             self.logger.error(f"Error executing check {check_id}: {e}")
@@ -826,11 +708,62 @@ class CheckExecutor:
                 'execution_time': round(execution_time, 3)
             }
     
-    def _execute_multiple_values_check(self, check: Dict[str, Any], audit_output: str, component_type: str, start_time: float) -> Dict[str, Any]:
-        """Execute checks that handle multiple values with special logic for policies"""
+    def _tally_entries(self, check: Dict[str, Any], component_type: str,
+                       entries: Iterable[Tuple[Optional[str], str]]) -> LineTally:
+        if self.sharder.enabled:
+            return self.sharder.tally(self, check, component_type, entries)
+        return self.tally_lines(check, (line for _, line in entries), component_type)
+    
+    def _tally_audit(self, check: Dict[str, Any], component_type: str, deadline: float,
+                     timeout: float) -> LineTally:
+        """Stream and tally a multi-value audit; a stream that breaks off midway is never scored
+
+        410 Gone (an expired continue token) lists again from the start once; other API or
+        connection errors rerun the whole audit through the shell. Past the deadline: AuditTimeout.
+        """
+        check_id = str(check.get('id'))
+        use_api = True
+        relisted = False
+        while True:
+            try:
+                entries = self._stream_audit_entries(check, component_type, deadline, use_api)
+                if self.audit_store is not None:
+                    entries = self._saving_entries(check_id, component_type, entries)
+                return self._tally_entries(check, component_type, entries)
+            except DeadlineExceeded as e:
+                raise AuditTimeout(timeout, f"API audit: {e}")
+            except (APIError, OSError) as e:
+                if not use_api or not check.get('audit_api'):
+                    raise
+                if isinstance(e, APIError) and e.status == 410 and not relisted:
+                    self.logger.warning(f"API list for {check_id} expired midway, listing again: {e}")
+                    relisted = True
+                    continue
+                if not check.get('audit'):
+                    raise
+                self.logger.warning(f"API audit for {check_id} failed midway, rerunning the shell audit: {e}")
+                use_api = False
+    
+    def _saving_entries(self, check_id: str, component_type: str,
+                        entries: Iterable[Tuple[Optional[str], str]]) -> Iterator[Tuple[Optional[str], str]]:
+        """Pass audit entries through, saving the output once the stream is complete"""
+        lines = []
+        for namespace, line in entries:
+            lines.append(line)
+            yield namespace, line
+        self.audit_store.record(check_id, component_type, '\n'.join(lines))
+    
+    def _execute_multiple_values_check(self, check: Dict[str, Any],
+                                       audit_output: Union[str, Iterable[str], LineTally],
+                                       component_type: str, start_time: float) -> Dict[str, Any]:
+        """Execute checks that handle multiple values with special logic for policies
+
+        Lines are evaluated as they arrive and folded into counters, so memory does not
+        grow with the number of cluster objects; only up to MAX_RETAINED_RESULTS passing
+        and failing test results are kept for the report.
+        """
         check_id = check.get('id', 'unknown')
         tests = check.get('tests', {})
-        test_items = tests.get('test_items', [])
         bin_op = tests.get('bin_op', 'and')
         scored = check.get('scored', True)
         
@@ -845,11 +778,14 @@ class CheckExecutor:
             elif not check_type:
                 check_type = 'automated'
         
-        # Split output into lines for multiple value processing
-        lines = [line.strip() for line in audit_output.strip().split('\n') if line.strip()]
-        all_results = []
+        if isinstance(audit_output, str):
+            audit_output = audit_output.split('\n')
+        tally = audit_output if isinstance(audit_output, LineTally) else \
+            self.tally_lines(check, audit_output, component_type)
+        flag_counts = tally.flag_counts
+        results_count, passed_count, line_count = tally.results_count, tally.passed_count, tally.line_count
         
-        if not lines:
+        if not line_count:
             execution_time = time.time() - start_time
             return {
                 'id': check_id,
@@ -864,237 +800,65 @@ class CheckExecutor:
                 'type': check_type
             }
         
-        # Process each line
-        for line_idx, line in enumerate(lines):
-            line_results = []
-            for test_item in test_items:
-                # Use specialized evaluation for policies
-                if component_type == 'policies':
-                    result = self.evaluate_policies_test(test_item, line)
-                else:
-                    result = self.evaluate_test(test_item, line)
-                result['line_number'] = line_idx + 1
-                result['line_content'] = line[:100] + '...' if len(line) > 100 else line
-                line_results.append(result)
-            
-            all_results.extend(line_results)
-        
         # ← SPECIAL LOGIC CHO POLICIES CHECKS
         if check_id in ['5.1.1', '5.1.5', '5.1.6', '5.2.2', '5.2.3', '5.2.4', '5.2.5', '5.2.6', '5.2.9']:
             # Đối với policies checks: TẤT CẢ phải compliant
             # Tìm tất cả results có flag "is_compliant"
-            compliance_results = [r for r in all_results if r.get('flag') == 'is_compliant']
+            total, failed_count = flag_counts.get('is_compliant', [0, 0])
             
-            if compliance_results:
+            if total:
                 # TẤT CẢ compliance checks phải PASS
-                overall_passed = all(r.get('passed', False) for r in compliance_results)
-                
-                # Debug info
-                failed_count = sum(1 for r in compliance_results if not r.get('passed', False))
-                self.logger.info(f"Check {check_id}: {len(compliance_results)} total items, {failed_count} failed")
+                overall_passed = failed_count == 0
+                self.logger.info(f"Check {check_id}: {total} total items, {failed_count} failed")
             else:
                 overall_passed = False
         
         elif check_id == '5.1.3':
             # ← SPECIAL CASE CHO 5.1.3: Wildcard check
-            role_compliant_results = [r for r in all_results if r.get('flag') == 'role_is_compliant']
-            clusterrole_compliant_results = [r for r in all_results if r.get('flag') == 'clusterrole_is_compliant']
+            role_total, role_failed = flag_counts.get('role_is_compliant', [0, 0])
+            clusterrole_total, clusterrole_failed = flag_counts.get('clusterrole_is_compliant', [0, 0])
             
             # TẤT CẢ roles phải compliant VÀ TẤT CẢ clusterroles phải compliant
-            roles_all_compliant = all(r.get('passed', False) for r in role_compliant_results) if role_compliant_results else True
-            clusterroles_all_compliant = all(r.get('passed', False) for r in clusterrole_compliant_results) if clusterrole_compliant_results else True
-            
-            overall_passed = roles_all_compliant and clusterroles_all_compliant
+            overall_passed = role_failed == 0 and clusterrole_failed == 0
             
-            # Debug info
-            role_failed = sum(1 for r in role_compliant_results if not r.get('passed', False))
-            clusterrole_failed = sum(1 for r in clusterrole_compliant_results if not r.get('passed', False))
-            self.logger.info(f"Check 5.1.3: {len(role_compliant_results)} roles ({role_failed} failed), {len(clusterrole_compliant_results)} clusterroles ({clusterrole_failed} failed)")
+            self.logger.info(f"Check 5.1.3: {role_total} roles ({role_failed} failed), {clusterrole_total} clusterroles ({clusterrole_failed} failed)")
         
         else:
             # Logic bình thường cho các checks khác
             if bin_op == 'and':
-                overall_passed = all(r.get('passed', False) for r in all_results) if all_results else False
+                overall_passed = passed_count == results_count if results_count else False
             elif bin_op == 'or':
-                overall_passed = any(r.get('passed', False) for r in all_results) if all_results else False
+                overall_passed = passed_count > 0
             else:
                 # For multiple values: all lines must match expected value
-                matching_lines = sum(1 for r in all_results if r.get('passed', False))
-                overall_passed = (matching_lines == len(lines)) if lines else False
+                overall_passed = passed_count == line_count
         
         execution_time = time.time() - start_time
         
-        return {
+        result = {
             'id': check_id,
             'text': check.get('text', 'No description'),
             'passed': overall_passed,
             'scored': scored,
-            'test_results': all_results,
+            'test_results': tally.results,
             'remediation': check.get('remediation') if not overall_passed else None,
             'execution_time': round(execution_time, 3),
-            'lines_processed': len(lines),
+            'lines_processed': line_count,
             'multiple_values': True,
             'type': check_type
         }
+        if tally.truncated:
+            result['test_results_truncated'] = True
+            result['items_failed'] = results_count - passed_count
+        return result
     
-    def execute_auto_remediation(self, check: Dict[str, Any], dry_run: bool = False, 
-                                require_confirmation: bool = True) -> Dict[str, Any]:
-        """Execute auto remediation for a check if available"""
-        auto_remediation = check.get('auto_remediation')
-        if not auto_remediation:
-            return {
-                'success': False,
-                'error': 'No auto remediation available for this check',
-                'executed': False
-            }
-        
-        command = auto_remediation.get('command')
-        description = auto_remediation.get('description', 'Auto remediation')
-        requires_sudo = auto_remediation.get('requires_sudo', False)
-        dry_run_safe = auto_remediation.get('dry_run_safe', True)
-        
-        # Apply variable substitutions to command
-        command = self._apply_substitutions(command)
-        
-        # Check if command is safe for dry run
-        if dry_run and not dry_run_safe:
-            return {
-                'success': False,
-                'error': 'This remediation is not safe for dry run',
-                'executed': False
-            }
-        
-        # Prepare command for execution
-        if requires_sudo:
-            if dry_run:
-                cmd = ['sudo', '-n', 'echo', f'DRY RUN: {command}']
-            else:
-                cmd = ['sudo', '-n', 'sh', '-c', command]
-        else:
-            if dry_run:
-                cmd = ['sh', '-c', f'echo "DRY RUN: {command}"']
-            else:
-                cmd = ['sh', '-c', command]
-        
-        try:
-            # Execute command
-            result = subprocess.run(
-                cmd,
-                capture_output=True,
-                text=True,
-                timeout=30,  # 30 second timeout
-                check=False
-            )
-            
-            return {
-                'success': result.returncode == 0,
-                'command': command,
-                'description': description,
-                'return_code': result.returncode,
-                'stdout': result.stdout,
-                'stderr': result.stderr,
-                'executed': not dry_run,
-                'dry_run': dry_run
-            }
-            
-        except subprocess.TimeoutExpired:
-            return {
-                'success': False,
-                'error': 'Command execution timed out',
-                'command': command,
-                'description': description,
-                'executed': False,
-                'dry_run': dry_run
-            }
-        except Exception as e:
-            return {
-                'success': False,
-                'error': f'Command execution failed: {str(e)}',
-                'command': command,
-                'description': description,
-                'executed': False,
-                'dry_run': dry_run
-            }
-    
-    def _apply_substitutions(self, text: str) -> str:
-        """Apply variable substitutions to text (same as in main.py)"""
-        substitutions = {
-            '$apiserverconf': '/etc/kubernetes/manifests/kube-apiserver.yaml',
-            '$controllermanagerconf': '/etc/kubernetes/manifests/kube-controller-manager.yaml',
-            '$schedulerconf': '/etc/kubernetes/manifests/kube-scheduler.yaml',
-            '$etcdconf': '/etc/kubernetes/manifests/etcd.yaml',
-            '$apiserverbin': 'kube-apiserver',
-            '$controllermanagerbin': 'kube-controller-manager',
-            '$schedulerbin': 'kube-scheduler',
-            '$etcdbin': 'etcd',
-            '$kubeletbin': 'kubelet',
-            '$etcddatadir': '/var/lib/etcd',
-            '$schedulerkubeconfig': '/etc/kubernetes/scheduler.conf',
-            '$controllermanagerkubeconfig': '/etc/kubernetes/controller-manager.conf',
-            '$kubeletsvc': '/usr/lib/systemd/system/kubelet.service.d/10-kubeadm.conf',
-            '$kubeletkubeconfig': '/etc/kubernetes/kubelet.conf',
-            '$kubeletconf': '/var/lib/kubelet/config.yaml',
-            '$kubeletcafile': '/etc/kubernetes/pki/ca.crt',
-            '$proxybin': 'kube-proxy',
-            '$proxykubeconfig': '/var/lib/kube-proxy/kubeconfig.conf',
-            '$proxyconf': '/var/lib/kube-proxy/config.conf'
-        }
-        
-        for var, value in substitutions.items():
-            text = text.replace(var, value)
-        return text
-
     def cleanup(self):
         """Cleanup resources"""
         self.cache.clear()
+        DOCUMENT_CACHE.clear()
+        self.cluster.close()
+        if self._owns_sharder:
+            self.sharder.close()
+        self.privileged.close()
+        self.shells.close()
         self.logger.info("CheckExecutor cleanup completed")
-    
-    def _check_policies_flag_output(self, output: str, flag: str) -> Tuple[bool, str]:
-        """Dedicated method for policies flag extraction (section 5 only)"""
-        # Handle key: value format (common in kubectl output for policies)
-        lines = output.strip().split('\n')
-        for line in lines:
-            if ':' in line and flag in line:
-                # Extract value after colon
-                parts = line.split(':', 1)
-                if len(parts) == 2:
-                    key = parts[0].strip()
-                    value = parts[1].strip()
-                    if flag in key:
-                        return True, value
-        
-        # Handle comma-separated format like "key: value, key2: value2, flag: target_value"
-        for line in lines:
-            if flag in line and ':' in line:
-                # Use regex to find flag: value pattern anywhere in the line
-                import re
-                pattern = rf'{re.escape(flag)}:\s*([^,\s]+)'
-                match = re.search(pattern, line)
-                if match:
-                    return True, match.group(1)
-        
-        # Handle ** format for some policy checks - improved parsing
-        for line in lines:
-            if '**' in line and flag in line:
-                # Split by spaces but handle key: value pairs properly
-                if f'{flag}:' in line:
-                    # Find the flag: value pattern
-                    import re
-                    pattern = rf'{re.escape(flag)}:\s*(\S+)'
-                    match = re.search(pattern, line)
-                    if match:
-                        return True, match.group(1)
-        
-        # Handle *** format for pod security checks - improved parsing  
-        for line in lines:
-            if '***' in line and flag in line:
-                # Split by spaces but handle key: value pairs properly
-                if f'{flag}:' in line:
-                    # Find the flag: value pattern
-                    import re
-                    pattern = rf'{re.escape(flag)}:\s*(\S+)'
-                    match = re.search(pattern, line)
-                    if match:
-                        return True, match.group(1)
-        
-        return False, "Policy flag not found"
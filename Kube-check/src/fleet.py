@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+"""
+Fleet reports for kube-bench-python
+Results of many nodes folded into one model: static check metadata is held once per benchmark
+version, each node only adds a status, test values and a timing per check
+"""
+
+import sys
+from typing import Dict, List, Any, Optional, Callable, Iterable, Iterator, Tuple
+from transport import CheckCatalog, STATUS_CODES, STATUS_NAMES
+
+# Test values kept per node and check (multi-value checks can have thousands)
+FLEET_MAX_VALUES = 10
+SECTION_ORDER = ['master', 'etcd', 'controlplane', 'node', 'policies']
+
+
+def _intern(value: Any) -> str:
+    return sys.intern(str(value))
+
+
+class FleetCheck:
+    """One check across the fleet: static fields once, then (status, values, time) per node"""
+
+    __slots__ = ('id', 'component_type', 'group_id', 'results')
+
+    def __init__(self, check_id: str, component_type: str, group_id: str):
+        self.id = check_id
+        self.component_type = component_type
+        self.group_id = group_id
+        # node index -> (status code, test values, execution time)
+        self.results: Dict[int, Tuple[int, Tuple[str, ...], float]] = {}
+
+    def nodes_with(self, status: str) -> List[int]:
+        code = STATUS_CODES[status]
+        return [node for node, (status_code, _, _) in self.results.items() if status_code == code]
+
+    def worst_status(self) -> str:
+        """FAIL over TIMEOUT over WARN over INFO over PASS"""
+        codes = {status_code for status_code, _, _ in self.results.values()}
+        for status in ('FAIL', 'TIMEOUT', 'WARN', 'INFO', 'PASS'):
+            if STATUS_CODES[status] in codes:
+                return status
+        return 'WARN'
+
+
+class FleetReport:
+    """Checks x nodes status matrix with interned check metadata"""
+
+    def __init__(self, catalog: CheckCatalog, status_of: Callable[[Dict[str, Any]], str],
+                 remediation_of: Optional[Callable[[str], str]] = None):
+        self.catalog = catalog
+        self.status_of = status_of
+        self.remediation_of = remediation_of or (lambda text: ' '.join(text.split()))
+        self.nodes: List[Dict[str, Any]] = []
+        self.checks: Dict[str, FleetCheck] = {}
+        # Text of checks / groups missing from the local benchmark files, kept once
+        self.extra_text: Dict[str, str] = {}
+        self.group_text: Dict[str, str] = {}
+        self._remediations: Dict[str, str] = {}
+
+    def add_node(self, hostname: str, groups: Iterable[Dict[str, Any]], source: Optional[str] = None,
+                 **details: Any):
+        """Fold the result groups of one node in; only statuses, values and timings are kept"""
+        node = len(self.nodes)
+        counts = {status: 0 for status in STATUS_CODES}
+        for group in groups:
+            group_id = _intern(group.get('group_id', 'Unknown'))
+            if group_id not in self.catalog.groups and group_id not in self.group_text:
+                self.group_text[group_id] = group.get('group_text', 'Unknown Group')
+            component_type = _intern(group.get('component_type', 'unknown'))
+            for result in group.get('checks', []):
+                check_id = _intern(result.get('id', 'unknown'))
+                status = self.status_of(result)
+                counts[status] = counts.get(status, 0) + 1
+                check = self.checks.get(check_id)
+                if check is None:
+                    check = self.checks[check_id] = FleetCheck(check_id, component_type, group_id)
+                    if check_id not in self.catalog.checks:
+                        self.extra_text[check_id] = result.get('text', 'No description')
+                values = tuple(_intern(test.get('value', ''))
+                               for test in (result.get('test_results') or [])[:FLEET_MAX_VALUES])
+                check.results[node] = (STATUS_CODES.get(status, STATUS_CODES['WARN']), values,
+                                       result.get('execution_time', 0))
+        self.nodes.append(dict({'hostname': hostname, 'source': source, 'summary': counts}, **details))
+
+    def text(self, check_id: str) -> str:
+        if check_id in self.catalog.checks:
+            return self.catalog.checks[check_id]['text']
+        return self.extra_text.get(check_id, 'No description')
+
+    def remediation(self, check_id: str) -> str:
+        """Remediation with variables substituted, rendered once per check"""
+        if check_id not in self._remediations:
+            raw = self.catalog.check(check_id)['remediation']
+            self._remediations[check_id] = self.remediation_of(raw) if raw else ''
+        return self._remediations[check_id]
+
+    def ordered_checks(self) -> List[FleetCheck]:
+        def key(check: FleetCheck):
+            section = SECTION_ORDER.index(check.component_type) if check.component_type in SECTION_ORDER \
+                else len(SECTION_ORDER)
+            return section, [int(part) if part.isdigit() else 0 for part in check.id.split('.')]
+        return sorted(self.checks.values(), key=key)
+
+    def _hostnames(self, nodes: List[int]) -> str:
+        return ', '.join(self.nodes[node]['hostname'] for node in nodes)
+
+    def report_lines(self, section_headers: Dict[str, str], include_passed: bool = True,
+                     include_manual: bool = True, show_remediation: bool = True) -> Iterator[str]:
+        """Text report: worst status and per-status node counts per check, remediation grouped by check"""
+        yield f"[INFO] Fleet report: {len(self.nodes)} nodes, {len(self.checks)} checks ({self.catalog.benchmark})"
+        remediations = []
+        current_section = current_group = None
+        for check in self.ordered_checks():
+            status = check.worst_status()
+            if not include_passed and status == 'PASS':
+                continue
+            if not include_manual and status == 'WARN':
+                continue
+            if check.component_type != current_section:
+                current_section = check.component_type
+                yield f"[INFO] {section_headers.get(current_section, current_section)}"
+            if check.group_id != current_group:
+                current_group = check.group_id
+                group_text = self.catalog.groups.get(current_group) or self.group_text.get(current_group, '')
+                yield f"[INFO] {current_group} {group_text}"
+            counts = ', '.join(f"{len(nodes)} {name}" for name, nodes in
+                               ((name, check.nodes_with(name)) for name in STATUS_CODES) if nodes)
+            yield f"[{status}] {check.id} {self.text(check.id)} ({counts} of {len(check.results)} nodes)"
+            if show_remediation and status in ('FAIL', 'WARN'):
+                affected = check.nodes_with('FAIL') or check.nodes_with('WARN')
+                remediation = self.remediation(check.id)
+                if remediation:
+                    remediations.append(f"{check.id} ({status} on {len(affected)} nodes: {self._hostnames(affected)}) "
+                                        f"{remediation}")
+
+        if remediations:
+            yield "== Remediations =="
+            yield from remediations
+
+        yield "== Summary Nodes =="
+        for node in self.nodes:
+            counts = node['summary']
+            yield (f"{node['hostname']}: {counts['PASS']} PASS, {counts['FAIL']} FAIL, {counts['WARN']} WARN, "
+                   f"{counts['INFO']} INFO" + (f", {counts['TIMEOUT']} TIMEOUT" if counts['TIMEOUT'] else ''))
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Checks with their metadata once and one [status, values, execution_time] per node (null if absent)"""
+        return {
+            'benchmark': self.catalog.benchmark,
+            'nodes': self.nodes,
+            'checks': [{
+                'id': check.id,
+                'text': self.text(check.id),
+                'component_type': check.component_type,
+                'group_id': check.group_id,
+                'remediation': self.remediation(check.id),
+                'results': [
+                    [STATUS_NAMES[check.results[node][0]], list(check.results[node][1]), check.results[node][2]]
+                    if node in check.results else None
+                    for node in range(len(self.nodes))
+                ]
+            } for check in self.ordered_checks()]
+        }
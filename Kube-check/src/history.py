@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+Check duration history for kube-bench-python
+Keeps a moving average of execution_time per check to order scans longest-first
+"""
+
+import heapq
+import json
+import os
+import threading
+from typing import Dict, List, Any, Optional
+from utils import Logger
+
+DEFAULT_HISTORY_FILE = 'reports/.check-durations.json'
+DEFAULT_ALPHA = 0.3
+# Estimates for checks that never ran, by component type
+DEFAULT_ESTIMATES = {
+    'policies': 5.0,
+    'default': 0.2
+}
+
+
+class DurationHistory:
+    """Exponentially weighted moving average of check durations, persisted as JSON"""
+
+    def __init__(self, path: Optional[str] = None, alpha: float = DEFAULT_ALPHA):
+        self.path = path or DEFAULT_HISTORY_FILE
+        self.alpha = alpha
+        self.logger = Logger(__name__)
+        self.durations: Dict[str, Dict[str, float]] = {}
+        self._lock = threading.Lock()
+        self._dirty = False
+        self.load()
+
+    def load(self):
+        """Load history, starting empty if the file is missing or unreadable"""
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            self.durations = {str(k): v for k, v in data.get('checks', {}).items() if isinstance(v, dict)}
+        except FileNotFoundError:
+            self.durations = {}
+        except (OSError, ValueError) as e:
+            self.logger.warning(f"Ignoring unreadable duration history {self.path}: {e}")
+            self.durations = {}
+
+    def record(self, check_id: str, seconds: float):
+        """Fold one observed duration into the moving average"""
+        if seconds is None or seconds < 0:
+            return
+        check_id = str(check_id)
+        with self._lock:
+            entry = self.durations.get(check_id)
+            if entry is None:
+                self.durations[check_id] = {'avg': round(seconds, 4), 'runs': 1}
+            else:
+                entry['avg'] = round(self.alpha * seconds + (1 - self.alpha) * entry['avg'], 4)
+                entry['runs'] = entry.get('runs', 0) + 1
+            self._dirty = True
+
+    def record_results(self, results: List[Dict[str, Any]]):
+        """Record execution_time of executed (non-manual, not timed out) check results"""
+        for result in results:
+            if result.get('type') == 'manual' or result.get('status') == 'TIMEOUT' or 'execution_time' not in result:
+                continue
+            self.record(result.get('id'), result.get('execution_time'))
+
+    def estimate(self, check_id: str, component_type: Optional[str] = None) -> float:
+        """Average duration, or a per-component default for unseen checks"""
+        entry = self.durations.get(str(check_id))
+        if entry:
+            return entry['avg']
+        return DEFAULT_ESTIMATES.get(component_type, DEFAULT_ESTIMATES['default'])
+
+    def save(self):
+        """Atomically write history if it changed"""
+        with self._lock:
+            if not self._dirty:
+                return
+            try:
+                directory = os.path.dirname(os.path.abspath(self.path))
+                os.makedirs(directory, exist_ok=True)
+                temp_file = f"{self.path}.tmp"
+                with open(temp_file, 'w', encoding='utf-8') as f:
+                    json.dump({'alpha': self.alpha, 'checks': self.durations}, f, indent=2, sort_keys=True)
+                os.replace(temp_file, self.path)
+                self._dirty = False
+            except OSError as e:
+                self.logger.warning(f"Failed to save duration history {self.path}: {e}")
+
+
+def estimate_makespan(durations: List[float], workers: int) -> float:
+    """Wall time of running durations longest-first on a pool of workers"""
+    if not durations:
+        return 0.0
+    finish_times = [0.0] * max(1, workers)
+    for duration in sorted(durations, reverse=True):
+        earliest = heapq.heappop(finish_times)
+        heapq.heappush(finish_times, earliest + duration)
+    return max(finish_times)
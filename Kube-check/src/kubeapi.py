@@ -0,0 +1,480 @@
+#!/usr/bin/env python3
+"""
+Minimal Kubernetes API client for kube-bench-python
+Kubeconfig auth (mTLS/token) over pooled keep-alive HTTPS connections, no kubectl processes
+"""
+
+import base64
+import codecs
+import http.client
+import json
+import os
+import socket
+import ssl
+import tempfile
+import threading
+import time
+from collections import deque
+from typing import Dict, List, Any, Optional, Iterator, Tuple
+from urllib.parse import urlencode, urlsplit
+from utils import Logger, yaml_load
+
+SERVICE_ACCOUNT_DIR = '/var/run/secrets/kubernetes.io/serviceaccount'
+DEFAULT_KUBECONFIG = '~/.kube/config'
+DEFAULT_PAGE_SIZE = 500
+STREAM_CHUNK_SIZE = 64 * 1024
+
+
+class ClusterUnavailable(Exception):
+    """No usable kubeconfig / credentials (callers fall back to kubectl)"""
+
+
+class DeadlineExceeded(Exception):
+    """The caller's deadline passed before an API call (or a paged list) finished"""
+
+
+class APIError(Exception):
+    """Non-2xx response from the API server"""
+
+    def __init__(self, status: int, reason: str, body: Any = None):
+        self.status = status
+        self.reason = reason
+        self.body = body
+        message = body.get('message') if isinstance(body, dict) else None
+        super().__init__(f"{status} {reason}: {message or ''}".strip())
+
+
+class ListStreamParser:
+    """Incremental parser for {"metadata": {...}, "items": [...]} list bodies
+
+    Items are yielded one at a time as soon as they are complete; every other
+    top-level field (kind, metadata with the continue token) ends up in .fields.
+    """
+
+    def __init__(self, chunks: Iterator[bytes]):
+        self.chunks = chunks
+        self.fields: Dict[str, Any] = {}
+        self._decoder = json.JSONDecoder()
+        self._text_decoder = codecs.getincrementaldecoder('utf-8')()
+        self._buffer = ''
+        self._pos = 0
+        self._eof = False
+
+    def _fill(self) -> bool:
+        """Read the next chunk, dropping consumed text; False at end of stream"""
+        if self._eof:
+            return False
+        chunk = next(self.chunks, None)
+        if chunk is None:
+            self._eof = True
+            self._buffer = self._buffer[self._pos:] + self._text_decoder.decode(b'', final=True)
+        else:
+            self._buffer = self._buffer[self._pos:] + self._text_decoder.decode(chunk)
+        self._pos = 0
+        return True
+
+    def _peek(self) -> str:
+        """Next non-whitespace character (without consuming it)"""
+        while True:
+            while self._pos < len(self._buffer) and self._buffer[self._pos] in ' \t\r\n':
+                self._pos += 1
+            if self._pos < len(self._buffer):
+                return self._buffer[self._pos]
+            if not self._fill():
+                raise ValueError("Unexpected end of list response")
+
+    def _expect(self, char: str):
+        if self._peek() != char:
+            raise ValueError(f"Expected {char!r} in list response at {self._buffer[self._pos:self._pos + 20]!r}")
+        self._pos += 1
+
+    def _value(self) -> Any:
+        """Decode one complete JSON value, reading more input until it is complete"""
+        self._peek()
+        while True:
+            try:
+                value, end = self._decoder.raw_decode(self._buffer, self._pos)
+            except ValueError:
+                if not self._fill():
+                    raise
+                continue
+            # A number at the end of the buffer may continue in the next chunk
+            if end == len(self._buffer) and not self._eof and self._buffer[self._pos] not in '{["':
+                self._fill()
+                continue
+            self._pos = end
+            return value
+
+    def items(self) -> Iterator[Dict[str, Any]]:
+        self._expect('{')
+        if self._peek() == '}':
+            return
+        while True:
+            key = self._value()
+            self._expect(':')
+            if key == 'items' and self._peek() == '[':
+                self._pos += 1
+                if self._peek() != ']':
+                    while True:
+                        yield self._value()
+                        if self._peek() == ',':
+                            self._pos += 1
+                            continue
+                        break
+                self._expect(']')
+            else:
+                self.fields[key] = self._value()
+            if self._peek() == ',':
+                self._pos += 1
+                continue
+            self._expect('}')
+            return
+
+
+class KubeConfig:
+    """Server, TLS material and credentials resolved from a kubeconfig or the in-cluster service account"""
+
+    def __init__(self, server: str, ssl_context: ssl.SSLContext, token: Optional[str] = None,
+                 token_file: Optional[str] = None):
+        self.server = server.rstrip('/')
+        self.ssl_context = ssl_context
+        self.token = token
+        self.token_file = token_file
+
+    def bearer_token(self) -> Optional[str]:
+        """Static token, or the current content of a (rotating) token file"""
+        if self.token_file:
+            # Not through DOCUMENT_CACHE: files read there are recorded into snapshots
+            try:
+                with open(self.token_file, 'r', encoding='utf-8') as f:
+                    content = f.read().strip()
+            except OSError:
+                content = None
+            if content:
+                return content
+        return self.token
+
+    @classmethod
+    def load(cls, path: Optional[str] = None, context: Optional[str] = None) -> 'KubeConfig':
+        """Load from path / $KUBECONFIG / ~/.kube/config, else the in-cluster service account"""
+        candidates = [path] if path else (os.environ.get('KUBECONFIG', '').split(os.pathsep) + [DEFAULT_KUBECONFIG])
+        for candidate in candidates:
+            if not candidate:
+                continue
+            candidate = os.path.expanduser(candidate)
+            if os.path.isfile(candidate):
+                return cls.from_file(candidate, context)
+
+        if os.environ.get('KUBERNETES_SERVICE_HOST') and os.path.isfile(os.path.join(SERVICE_ACCOUNT_DIR, 'token')):
+            return cls.in_cluster()
+
+        raise ClusterUnavailable("No kubeconfig found and not running in a cluster")
+
+    @classmethod
+    def in_cluster(cls) -> 'KubeConfig':
+        """Service account token and CA mounted into the pod"""
+        host = os.environ['KUBERNETES_SERVICE_HOST']
+        port = os.environ.get('KUBERNETES_SERVICE_PORT', '443')
+        if ':' in host:
+            host = f"[{host}]"
+        context = ssl.create_default_context(cafile=os.path.join(SERVICE_ACCOUNT_DIR, 'ca.crt'))
+        return cls(f"https://{host}:{port}", context, token_file=os.path.join(SERVICE_ACCOUNT_DIR, 'token'))
+
+    @classmethod
+    def from_file(cls, path: str, context_name: Optional[str] = None) -> 'KubeConfig':
+        """Parse a kubeconfig file (current-context unless context_name is given)"""
+        with open(path, 'r', encoding='utf-8') as f:
+            data = yaml_load(f) or {}
+        base_dir = os.path.dirname(os.path.abspath(path))
+
+        context_name = context_name or data.get('current-context')
+        context = cls._named(data.get('contexts'), context_name, 'context')
+        cluster = cls._named(data.get('clusters'), context.get('cluster'), 'cluster')
+        user = cls._named(data.get('users'), context.get('user'), 'user') if context.get('user') else {}
+
+        server = cluster.get('server')
+        if not server:
+            raise ClusterUnavailable(f"Cluster {context.get('cluster')} has no server in {path}")
+        if user.get('exec') or user.get('auth-provider'):
+            raise ClusterUnavailable("Exec/auth-provider credentials are only supported through kubectl")
+
+        ssl_context = cls._ssl_context(cluster, user, base_dir)
+        token_file = user.get('tokenFile')
+        if token_file and not os.path.isabs(token_file):
+            token_file = os.path.join(base_dir, token_file)
+        return cls(server, ssl_context, token=user.get('token'), token_file=token_file)
+
+    @staticmethod
+    def _named(entries: Optional[List[Dict[str, Any]]], name: Optional[str], kind: str) -> Dict[str, Any]:
+        """Find a named cluster/context/user entry"""
+        for entry in entries or []:
+            if entry.get('name') == name:
+                return entry.get(kind) or {}
+        raise ClusterUnavailable(f"Kubeconfig has no {kind} named {name!r}")
+
+    @staticmethod
+    def _resolve(base_dir: str, value: Optional[str]) -> Optional[str]:
+        if value and not os.path.isabs(value):
+            return os.path.join(base_dir, value)
+        return value
+
+    @classmethod
+    def _ssl_context(cls, cluster: Dict[str, Any], user: Dict[str, Any], base_dir: str) -> ssl.SSLContext:
+        """TLS context with the cluster CA and optional client certificate (mutual TLS)"""
+        if cluster.get('insecure-skip-tls-verify'):
+            context = ssl.create_default_context()
+            context.check_hostname = False
+            context.verify_mode = ssl.CERT_NONE
+        elif cluster.get('certificate-authority-data'):
+            ca_data = base64.b64decode(cluster['certificate-authority-data']).decode('ascii')
+            context = ssl.create_default_context(cadata=ca_data)
+        elif cluster.get('certificate-authority'):
+            context = ssl.create_default_context(cafile=cls._resolve(base_dir, cluster['certificate-authority']))
+        else:
+            context = ssl.create_default_context()
+
+        cert_file = cls._resolve(base_dir, user.get('client-certificate'))
+        key_file = cls._resolve(base_dir, user.get('client-key'))
+        if user.get('client-certificate-data') and user.get('client-key-data'):
+            # ssl only loads key material from files: write a private temp file and drop it right away
+            with tempfile.NamedTemporaryFile('wb', suffix='.pem', delete=False) as pem:
+                os.chmod(pem.name, 0o600)
+                pem.write(base64.b64decode(user['client-certificate-data']) + b'\n')
+                pem.write(base64.b64decode(user['client-key-data']) + b'\n')
+            try:
+                context.load_cert_chain(pem.name)
+            finally:
+                os.unlink(pem.name)
+        elif cert_file and key_file:
+            context.load_cert_chain(cert_file, key_file)
+
+        return context
+
+
+class ConnectionPool:
+    """Keep-alive HTTPS connections to one API server, shared between threads"""
+
+    def __init__(self, host: str, port: int, ssl_context: ssl.SSLContext, timeout: float, maxsize: int = 4):
+        self.host = host
+        self.port = port
+        self.ssl_context = ssl_context
+        self.timeout = timeout
+        self.maxsize = maxsize
+        self._idle: deque = deque()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> http.client.HTTPSConnection:
+        with self._lock:
+            if self._idle:
+                return self._idle.pop()
+        return http.client.HTTPSConnection(self.host, self.port, timeout=self.timeout, context=self.ssl_context)
+
+    def release(self, connection: http.client.HTTPSConnection, reusable: bool = True):
+        with self._lock:
+            if reusable and len(self._idle) < self.maxsize:
+                self._idle.append(connection)
+                return
+        connection.close()
+
+    def close(self):
+        with self._lock:
+            while self._idle:
+                self._idle.pop().close()
+
+
+class KubeAPIClient:
+    """List, get and access-review calls straight to the API server"""
+
+    def __init__(self, kubeconfig: Optional[str] = None, context: Optional[str] = None,
+                 timeout: float = 30, config: Optional[KubeConfig] = None, pool_size: int = 4):
+        self.config = config or KubeConfig.load(kubeconfig, context)
+        self.logger = Logger(__name__)
+        parts = urlsplit(self.config.server)
+        if parts.scheme != 'https':
+            raise ClusterUnavailable(f"Unsupported API server URL: {self.config.server}")
+        self.base_path = parts.path.rstrip('/')
+        self.timeout = timeout
+        self.pool = ConnectionPool(parts.hostname, parts.port or 443, self.config.ssl_context, timeout, pool_size)
+
+    def _budget(self, deadline: Optional[float]) -> float:
+        """Socket timeout for the next request or read: the client timeout, capped by the deadline"""
+        if deadline is None:
+            return self.timeout
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            raise DeadlineExceeded("deadline reached before the API call finished")
+        return min(self.timeout, remaining)
+
+    def _raise_if_deadline(self, budget: float):
+        """After a socket timeout: the deadline, not the client timeout, cut the call off"""
+        if budget < self.timeout:
+            raise DeadlineExceeded(f"deadline reached after {budget:.1f}s waiting for the API server") from None
+
+    @staticmethod
+    def _set_timeout(connection: http.client.HTTPSConnection, timeout: float):
+        connection.timeout = timeout
+        if connection.sock is not None:
+            connection.sock.settimeout(timeout)
+
+    def _open(self, method: str, path: str, params: Optional[Dict[str, Any]] = None,
+              body: Optional[Dict[str, Any]] = None, headers: Optional[List[Tuple[str, str]]] = None,
+              deadline: Optional[float] = None) -> Tuple[http.client.HTTPSConnection, http.client.HTTPResponse]:
+        """Send a request and return the connection with its unread response (headers may repeat)"""
+        budget = self._budget(deadline)
+        url = self.base_path + path
+        if params:
+            url += '?' + urlencode({k: v for k, v in params.items() if v is not None})
+        request_headers = [('Accept', 'application/json'), ('User-Agent', 'kube-bench-python')]
+        token = self.config.bearer_token()
+        if token:
+            request_headers.append(('Authorization', f"Bearer {token}"))
+        payload = None
+        if body is not None:
+            payload = json.dumps(body).encode('utf-8')
+            request_headers.append(('Content-Type', 'application/json'))
+            request_headers.append(('Content-Length', str(len(payload))))
+        request_headers.extend(headers or [])
+
+        # A pooled connection may have been closed by the server: retry once on a fresh one
+        for attempt in range(2):
+            connection = self.pool.acquire()
+            self._set_timeout(connection, budget)
+            try:
+                connection.putrequest(method, url)
+                for name, value in request_headers:
+                    connection.putheader(name, value)
+                connection.endheaders(payload)
+                return connection, connection.getresponse()
+            except (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError):
+                self.pool.release(connection, reusable=False)
+                if attempt:
+                    raise
+            except socket.timeout:
+                self.pool.release(connection, reusable=False)
+                self._raise_if_deadline(budget)
+                raise
+            except Exception:
+                self.pool.release(connection, reusable=False)
+                raise
+
+    def _raise_for_status(self, response: http.client.HTTPResponse, data: bytes):
+        if response.status >= 300:
+            try:
+                decoded = json.loads(data) if data else {}
+            except ValueError:
+                decoded = {'message': data[:200].decode('utf-8', 'replace')}
+            raise APIError(response.status, response.reason, decoded)
+
+    def request(self, method: str, path: str, params: Optional[Dict[str, Any]] = None,
+                body: Optional[Dict[str, Any]] = None, headers: Optional[List[Tuple[str, str]]] = None,
+                deadline: Optional[float] = None) -> Any:
+        """Send one request and return the decoded JSON body (DeadlineExceeded past deadline, a monotonic time)"""
+        connection, response = self._open(method, path, params, body, headers, deadline)
+        try:
+            data = response.read()
+        except socket.timeout:
+            self.pool.release(connection, reusable=False)
+            self._raise_if_deadline(connection.timeout)
+            raise
+        except Exception:
+            self.pool.release(connection, reusable=False)
+            raise
+        self.pool.release(connection, reusable=not response.will_close)
+
+        self._raise_for_status(response, data)
+        return json.loads(data) if data else {}
+
+    def _chunks(self, connection: http.client.HTTPSConnection, response: http.client.HTTPResponse,
+                deadline: Optional[float]) -> Iterator[bytes]:
+        """Response body in chunks, each read bounded by the time left before the deadline"""
+        while True:
+            budget = self._budget(deadline)
+            self._set_timeout(connection, budget)
+            try:
+                chunk = response.read(STREAM_CHUNK_SIZE)
+            except socket.timeout:
+                self._raise_if_deadline(budget)
+                raise
+            if not chunk:
+                return
+            yield chunk
+
+    def stream(self, path: str, params: Optional[Dict[str, Any]] = None,
+               limit: int = DEFAULT_PAGE_SIZE, deadline: Optional[float] = None) -> Iterator[Dict[str, Any]]:
+        """Yield list items as they are parsed off the wire, page by page (flat memory)
+
+        With a deadline (time.monotonic) every page and read gets only the time left,
+        and DeadlineExceeded is raised once it has passed.
+        """
+        query = dict(params or {})
+        query['limit'] = limit
+        while True:
+            connection, response = self._open('GET', path, query, deadline=deadline)
+            reusable = False
+            try:
+                if response.status >= 300:
+                    data = response.read()
+                    reusable = not response.will_close
+                    self._raise_for_status(response, data)
+
+                parser = ListStreamParser(self._chunks(connection, response, deadline))
+                yield from parser.items()
+                reusable = not response.will_close
+            finally:
+                self.pool.release(connection, reusable=reusable)
+
+            token = (parser.fields.get('metadata') or {}).get('continue')
+            if not token:
+                return
+            query['continue'] = token
+
+    def get(self, path: str, params: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        return self.request('GET', path, params)
+
+    def list(self, path: str, params: Optional[Dict[str, Any]] = None,
+             limit: int = DEFAULT_PAGE_SIZE, deadline: Optional[float] = None) -> Iterator[Dict[str, Any]]:
+        """Yield every item of a (paginated) list"""
+        yield from self.stream(path, params, limit, deadline)
+
+    def can_i(self, verb: str, resource: str, namespace: Optional[str] = None, group: str = '',
+              subresource: str = '', as_user: Optional[str] = None,
+              as_groups: Optional[List[str]] = None, deadline: Optional[float] = None) -> bool:
+        """SelfSubjectAccessReview, impersonating as_user/as_groups like kubectl auth can-i --as"""
+        headers = []
+        if as_user:
+            headers.append(('Impersonate-User', as_user))
+        # One header per group: the API server reads 'a,b' as a single group named "a,b"
+        headers.extend(('Impersonate-Group', impersonated_group) for impersonated_group in as_groups or [])
+        review = {
+            'apiVersion': 'authorization.k8s.io/v1',
+            'kind': 'SelfSubjectAccessReview',
+            'spec': {
+                'resourceAttributes': {
+                    'verb': verb,
+                    'resource': resource,
+                    'group': group,
+                    'subresource': subresource,
+                    'namespace': namespace or ''
+                }
+            }
+        }
+        response = self.request('POST', '/apis/authorization.k8s.io/v1/selfsubjectaccessreviews',
+                                body=review, headers=headers, deadline=deadline)
+        return bool((response.get('status') or {}).get('allowed'))
+
+    def close(self):
+        self.pool.close()
+
+
+def split_api_path(resource: str, namespace: Optional[str] = None) -> str:
+    """Collection path for 'pods', 'rbac.authorization.k8s.io/v1/roles', ..."""
+    parts = resource.strip('/').split('/')
+    if len(parts) == 1:
+        prefix, name = '/api/v1', parts[0]
+    elif len(parts) == 2:
+        prefix, name = f"/api/{parts[0]}", parts[1]
+    else:
+        prefix, name = f"/apis/{parts[0]}/{parts[1]}", parts[2]
+    if namespace:
+        return f"{prefix}/namespaces/{namespace}/{name}"
+    return f"{prefix}/{name}"
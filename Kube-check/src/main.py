@@ -10,10 +10,13 @@ import csv
 import sys
 import time
 import signal
+import random
+import threading
 import pytz
 from pathlib import Path
-from typing import Dict, List, Any, Optional, Tuple
+from typing import Dict, List, Any, Optional, Tuple, Iterator, Iterable
 from io import StringIO
+from concurrent.futures import ThreadPoolExecutor
 
 import click
 from tabulate import tabulate
@@ -23,16 +26,23 @@ import pdfkit
 from weasyprint import HTML, CSS
 from parser import YAMLParser
 from executor import CheckExecutor
-from utils import Logger, Colors, format_duration, create_progress_bar
-from constants import GLOBAL_SUBSTITUTIONS
+from remediation import RemediationPlanner
+from scheduler import ScanScheduler
+from history import DurationHistory, estimate_makespan
+from snapshot import Snapshot
+from audits import AuditStore
+from writers import check_rows, write_csv, write_yaml, write_table, write_lines
+from transport import CheckCatalog, is_transport_file, load_results, save_results, write_results
+from fleet import FleetReport
+from coordination import create_coordinator
+from multicluster import ClusterTarget, MultiClusterScan, load_contexts_file, name_clusters
+from utils import (Logger, Colors, format_duration, create_progress_bar, parse_duration, open_text,
+                   dumps_json, load_json_file, save_json_file)
 
 class KubeBenchPython:
     """Enhanced main application class with kube-bench compatibility"""
     
     # Class-level constants để tránh duplicate
-    # Class-level constants để tránh duplicate
-    SUBSTITUTIONS = GLOBAL_SUBSTITUTIONS
-    
     SECTION_HEADERS = {
         'master': '1 Control Plane Security Configuration',
         'etcd': '2 etcd',
@@ -41,6 +51,18 @@ class KubeBenchPython:
         'policies': '5 Kubernetes Policies'
     }
     
+    # Output formats written group by group by writers.py
+    STREAMED_FORMATS = ('csv', 'yaml', 'table')
+    
+    # Check file for each target (used when targets are auto-detected)
+    TARGET_FILES = {
+        'master': 'config/master.yaml',
+        'etcd': 'config/etcd.yaml',
+        'controlplane': 'config/controlplane.yaml',
+        'node': 'config/node.yaml',
+        'policies': 'config/policies.yaml'
+    }
+    
     def __init__(self, config_path: str, log_level: str = 'INFO', no_color: bool = False, enable_file_logging: bool = False):
         self.logger = Logger(__name__, log_level, enable_file_logging)
         self.no_color = no_color
@@ -66,7 +88,22 @@ class KubeBenchPython:
         try:
             self.parser = YAMLParser(config_path)
             self.executor = CheckExecutor(self.parser.config)
+            self.remediation_planner = RemediationPlanner(self.executor.discovery, privileged=self.executor.privileged)
             self.results = []
+            # Parsed check definitions by id, kept for targeted re-verification
+            self.check_definitions: Dict[str, Tuple[Dict[str, Any], str]] = {}
+            self._results_lock = threading.Lock()
+            
+            history_config = self.parser.config.get('history') or {}
+            self.history = DurationHistory(history_config.get('file'), history_config.get('alpha', 0.3))
+            self.executor.history = self.history
+            # Check id -> Future of its result, filled by start_scan()
+            self._prefetched: Dict[str, Any] = {}
+            self._prefetch_pool: Optional[ThreadPoolExecutor] = None
+            # Snapshot being captured or replayed (run --from-snapshot)
+            self.snapshot: Optional[Snapshot] = None
+            # Static check metadata for the msgpack result format, loaded on first use
+            self._catalog: Optional[CheckCatalog] = None
             
             self.logger.success("KubeBench Python initialized successfully (file-based mode)")
             
@@ -91,75 +128,147 @@ class KubeBenchPython:
     
     def _apply_substitutions(self, text: str) -> str:
         """Apply variable substitutions to text - centralized method"""
-        for var, value in self.SUBSTITUTIONS.items():
-            text = text.replace(var, value)
+        text = self.executor.discovery.substitute(text)
         return text.replace('\n', ' ').strip()
     
-    def _format_report_lines(self, include_passed: bool = True, include_manual: bool = True, 
-                           show_remediation: bool = True) -> Tuple[List[str], List[Dict]]:
-        """Centralized report line formatting - eliminates duplicate logic"""
-        report_lines = []
-        remediation_data = []
-        
+    def _report_lines(self, include_passed: bool = True, include_manual: bool = True,
+                      show_remediation: bool = True) -> Iterator[str]:
+        """Text report lines, produced group by group; summaries come from counters kept on the way"""
         if not self.results:
             self.logger.warning("No results found. Did you run checks first?")
-            return report_lines, remediation_data
+            return
         
-        # Group by component type
-        grouped_by_component = {}
-        for group in self.results:
-            component_type = group.get('component_type', 'unknown')
-            if component_type not in grouped_by_component:
-                grouped_by_component[component_type] = []
-            grouped_by_component[component_type].append(group)
+        # Only FAIL/WARN remediations are held until the checks are done
+        remediations: List[str] = []
+        # Remediation text -> substituted text, rendered once however many checks share it
+        rendered: Dict[str, str] = {}
+        agg: Dict[str, Dict[str, int]] = {}
+        current_section = None
         
-        # Process each component in order
-        component_order = ['master', 'etcd', 'controlplane', 'node', 'policies']
-        for component_type in component_order:
-            if component_type not in grouped_by_component:
+        for group in self._ordered_groups():
+            component_type = group.get('component_type', 'unknown')
+            st = group.get('group_stats', {})
+            counts = agg.setdefault(component_type, {'pass': 0, 'fail': 0, 'warn': 0, 'info': 0, 'timeout': 0})
+            for k in counts:
+                counts[k] += st.get(k, 0)
+            
+            if component_type not in self.SECTION_HEADERS:
                 continue
-                
-            groups = grouped_by_component[component_type]
             
             # Add section header
-            if component_type in self.SECTION_HEADERS:
-                report_lines.append(f"[INFO] {self.SECTION_HEADERS[component_type]}")
+            if component_type != current_section:
+                current_section = component_type
+                yield f"[INFO] {self.SECTION_HEADERS[component_type]}"
             
-            # Process groups within component
-            for group in groups:
-                group_id = group.get('group_id', 'Unknown')
-                group_text = group.get('group_text', 'Unknown Group')
-                report_lines.append(f"[INFO] {group_id} {group_text}")
+            group_id = group.get('group_id', 'Unknown')
+            group_text = group.get('group_text', 'Unknown Group')
+            yield f"[INFO] {group_id} {group_text}"
+            
+            # Process checks within group
+            for ck in group.get('checks', []):
+                status = self._get_check_status(ck)
                 
-                # Process checks within group
-                for ck in group.get('checks', []):
-                    status = self._get_check_status(ck)
-                    
-                    # Apply filters
-                    if not include_passed and status == "PASS":
-                        continue
-                    if not include_manual and status == "WARN":
-                        continue
-                    
-                    # Add check line
-                    check_id = ck.get('id', 'unknown')
-                    check_text = ck.get('text', 'No description')
-                    report_lines.append(f"[{status}] {check_id} {check_text}")
-                    
-                    # ← SỬA: Collect remediation data cho cả FAIL VÀ WARN
-                    if status in ["FAIL", "WARN"] and ck.get("remediation") and show_remediation:
-                        remediation_text = self._apply_substitutions(ck['remediation'])
-                        remediation_data.append({
-                            'id': check_id,
-                            'text': remediation_text,
-                            'status': status  # Thêm status để phân biệt
-                        })
-        
-        return report_lines, remediation_data
+                # Apply filters
+                if not include_passed and status == "PASS":
+                    continue
+                if not include_manual and status == "WARN":
+                    continue
+                
+                check_id = ck.get('id', 'unknown')
+                yield f"[{status}] {check_id} {ck.get('text', 'No description')}"
+                
+                # Remediation for both FAIL and WARN, with the status to tell them apart
+                if status in ["FAIL", "WARN"] and ck.get("remediation") and show_remediation:
+                    remediation_text = rendered.get(ck['remediation'])
+                    if remediation_text is None:
+                        remediation_text = rendered[ck['remediation']] = self._apply_substitutions(ck['remediation'])
+                    remediations.append(f"{check_id} ({status}) {remediation_text}")
+        
+        if remediations:
+            yield "== Remediations =="
+            yield from remediations
+        
+        yield from self._generate_total_summary(agg)
     
-    def _generate_total_summary(self) -> List[str]:
+    def _ordered_groups(self) -> Iterator[Dict[str, Any]]:
+        """Result groups in report section order"""
+        component_order = ['master', 'etcd', 'controlplane', 'node', 'policies']
+        for component_type in component_order:
+            for group in self.results:
+                if group.get('component_type', 'unknown') == component_type:
+                    yield group
+        for group in self.results:
+            if group.get('component_type', 'unknown') not in component_order:
+                yield group
+    
+    def _write_streamed_report(self, output_format: str, output_file: Optional[str],
+                               include_passed: bool = True, include_manual: bool = True,
+                               show_remediation: bool = True) -> bool:
+        """csv, yaml and table reports, written group by group to the file (or stdout)"""
+        stream = open_text(output_file, 'w', newline='') if output_file else sys.stdout
+        try:
+            if output_format == 'yaml':
+                count = write_yaml(stream, self._ordered_groups())
+            else:
+                rows = check_rows(self._ordered_groups(), self._get_check_status, include_passed, include_manual,
+                                  remediation_of=self._apply_substitutions)
+                if output_format == 'csv':
+                    count = write_csv(stream, rows, show_remediation)
+                else:
+                    count = write_table(stream, rows)
+        finally:
+            if output_file:
+                stream.close()
+        if output_file:
+            unit = 'groups' if output_format == 'yaml' else 'checks'
+            self.logger.success(f"{output_format.upper()} report generated: {output_file} ({count} {unit})")
+        return True
+    
+    def check_catalog(self) -> CheckCatalog:
+        """Text and remediation of every check, referenced by id in msgpack result files"""
+        if self._catalog is None:
+            self._catalog = CheckCatalog.load(self.parser, self.TARGET_FILES.values())
+        return self._catalog
+    
+    def load_result_file(self, path: str) -> Tuple[str, List[Dict[str, Any]]]:
+        """Node name and result groups from a JSON (run/agent) or msgpack result file, compressed or not"""
+        if is_transport_file(path):
+            hostname, groups = load_results(path, self.check_catalog())
+            for group in groups:
+                group['group_stats'] = self._calculate_group_stats(group['checks'])
+            return hostname, groups
+        groups = load_json_file(path)
+        if not isinstance(groups, list):
+            raise ValueError(f"{path} is not a list of result groups")
+        # JSON results carry no hostname: name the node after the file
+        return Path(path).name.split('.')[0], groups
+    
+    def fleet_report(self) -> FleetReport:
+        """Empty fleet model sharing this benchmark's check metadata"""
+        return FleetReport(self.check_catalog(), self._get_check_status, self._apply_substitutions)
+    
+    def cluster_report_lines(self, clusters: Dict[str, Dict[str, Any]], include_passed: bool = True,
+                             include_manual: bool = True, show_remediation: bool = True) -> Iterator[str]:
+        """Text report of a multi-cluster scan: the usual report under a header per cluster"""
+        for name, entry in clusters.items():
+            yield f"== Cluster {name} =="
+            if entry.get('error'):
+                yield f"[FAIL] Cluster scan failed: {entry['error']}"
+                continue
+            self.results = entry['results']
+            yield from self._report_lines(include_passed, include_manual, show_remediation)
+    
+    def save_result_file(self, path: str, groups: List[Dict[str, Any]], compact: bool = False):
+        """Write result groups as msgpack (name ending in .msgpack[.gz|.zst]) or JSON"""
+        if is_transport_file(path):
+            save_results(path, groups, self.parser.get_benchmark_info()['cis_version'], self._get_check_status)
+        else:
+            save_json_file(path, groups, compact=compact)
+    
+    def _generate_total_summary(self, agg: Optional[Dict[str, Dict[str, int]]] = None) -> List[str]:
         """Generate total summary lines - centralized calculation"""
-        agg = self._aggregate_component_stats()
+        if agg is None:
+            agg = self._aggregate_component_stats()
         summary_lines = []
         
         if not agg:
@@ -176,13 +285,16 @@ class KubeBenchPython:
             summary_lines.append(f"{st['fail']} checks FAIL")
             summary_lines.append(f"{st['warn']} checks WARN")
             summary_lines.append(f"{st['info']} checks INFO")
+            if st['timeout']:
+                summary_lines.append(f"{st['timeout']} checks TIMEOUT")
         
         # Calculate totals
         total_pass = sum(st['pass'] for st in agg.values())
         total_fail = sum(st['fail'] for st in agg.values())
         total_warn = sum(st['warn'] for st in agg.values())
         total_info = sum(st['info'] for st in agg.values())
-        total_checks = total_pass + total_fail + total_warn + total_info
+        total_timeout = sum(st['timeout'] for st in agg.values())
+        total_checks = total_pass + total_fail + total_warn + total_info + total_timeout
         
         # Add total summary
         summary_lines.append("== Summary Total ==")
@@ -190,6 +302,9 @@ class KubeBenchPython:
         summary_lines.append(f"{total_fail} checks FAIL")
         summary_lines.append(f"{total_warn} checks WARN")
         summary_lines.append(f"{total_info} checks INFO")
+        if total_timeout:
+            # Partial scan: these checks were cut off by their timeout or the deadline
+            summary_lines.append(f"{total_timeout} checks TIMEOUT")
         
         # Add compliance metrics
         if total_checks > 0:
@@ -208,28 +323,41 @@ class KubeBenchPython:
         
         return summary_lines
     
-    def _generate_output(self, report_lines: List[str], remediation_data: List[Dict], 
-                        output_format: str, output_file: Optional[str]) -> bool:
-        """Centralized output generation - eliminates duplicate output logic"""
+    def _generate_output(self, report_lines: Iterable[str], output_format: str, output_file: Optional[str],
+                         compact: bool = False) -> bool:
+        """Centralized output generation; text and HTML consume the report lines as they are produced"""
         current_time = self._get_vietnam_timestamp()
         
         if output_format == 'json':
-            import json
+            # Compressed by the file suffix (.gz/.zst); compact uses orjson when installed
             if output_file:
-                with open(output_file, 'w', encoding='utf-8') as f:
-                    json.dump(self.results, f, indent=2)
+                save_json_file(output_file, self.results, compact=compact)
                 self.logger.success(f"JSON report generated: {output_file}")
             else:
-                print(json.dumps(self.results, indent=2))
+                print(dumps_json(self.results, compact).decode('utf-8'))
+            return True
+        
+        elif output_format == 'msgpack':
+            # Check text and remediation are left out; readers resolve them by check id
+            if output_file:
+                save_results(output_file, self.results, self.parser.get_benchmark_info()['cis_version'],
+                             self._get_check_status)
+                self.logger.success(f"msgpack results generated: {output_file}")
+            else:
+                sys.stdout.flush()
+                write_results(sys.stdout.buffer, self.results, self.parser.get_benchmark_info()['cis_version'],
+                              self._get_check_status)
+                sys.stdout.buffer.flush()
             return True
         
         elif output_format == 'text':
             if output_file:
-                with open(output_file, 'w', encoding='utf-8') as f:
-                    f.write('\n'.join(report_lines))
+                with open_text(output_file, 'w') as f:
+                    write_lines(f, report_lines)
                 self.logger.success(f"Text report generated: {output_file}")
             else:
-                print('\n'.join(report_lines))
+                write_lines(sys.stdout, report_lines)
+                print()
             return True
         
         elif output_format == 'html':
@@ -237,16 +365,14 @@ class KubeBenchPython:
                 env = Environment(loader=FileSystemLoader('templates'))
                 tpl = env.get_template('report.html.j2')
                 
-                html = tpl.render(
-                    report_lines=report_lines,
-                    remediation_data=remediation_data,
-                    timestamp=current_time
-                )
-                
                 out = output_file or "report.html"
                 Path(out).parent.mkdir(parents=True, exist_ok=True)
+                # Rendered chunk by chunk while the template walks the report lines
                 with open(out, 'w', encoding='utf-8') as f:
-                    f.write(html)
+                    f.writelines(tpl.generate(
+                        report_lines=report_lines,
+                        timestamp=current_time
+                    ))
                 self.logger.success(f"HTML report generated: {out}")
                 return True
                 
@@ -261,7 +387,6 @@ class KubeBenchPython:
                 
                 html = tpl.render(
                     report_lines=report_lines,
-                    remediation_data=remediation_data,
                     timestamp=current_time
                 )
                 
@@ -322,7 +447,8 @@ class KubeBenchPython:
         return config_checks
 
     def execute_auto_remediation_for_failed_checks(self, dry_run: bool = False, 
-                                                  require_confirmation: bool = True) -> Dict[str, Any]:
+                                                  require_confirmation: bool = True,
+                                                  max_workers: int = 4, verify: bool = True) -> Dict[str, Any]:
         """Execute auto remediation for all failed checks that have auto remediation available"""
         remediation_results = {
             'total_checks': 0,
@@ -330,7 +456,8 @@ class KubeBenchPython:
             'remediation_executed': 0,
             'remediation_successful': 0,
             'remediation_failed': 0,
-            'results': []
+            'results': [],
+            'verification': []
         }
         
         if not self.results:
@@ -338,6 +465,7 @@ class KubeBenchPython:
             return remediation_results
         
         # Find all failed checks with auto remediation
+        candidates = []
         for group in self.results:
             for check in group.get('checks', []):
                 status = self._get_check_status(check)
@@ -346,30 +474,99 @@ class KubeBenchPython:
                 if status in ['FAIL', 'WARN'] and check.get('auto_remediation'):
                     remediation_results['total_checks'] += 1
                     remediation_results['remediation_available'] += 1
-                    
-                    # Execute auto remediation
-                    result = self.executor.execute_auto_remediation(
-                        check, 
-                        dry_run=dry_run,
-                        require_confirmation=require_confirmation
-                    )
-                    
-                    remediation_results['results'].append({
-                        'check_id': check.get('id'),
-                        'check_text': check.get('text'),
-                        'status': status,
-                        'remediation_result': result
-                    })
-                    
-                    if result.get('executed', False):
-                        remediation_results['remediation_executed'] += 1
-                        if result.get('success', False):
-                            remediation_results['remediation_successful'] += 1
-                        else:
-                            remediation_results['remediation_failed'] += 1
+                    candidates.append((check, status))
+        
+        # Group fixes by target file so each file is rewritten (and restarted) once
+        statuses = {id(check): status for check, status in candidates}
+        if candidates and not dry_run:
+            # Only now may the privileged helper run sudo fix scripts
+            self.executor.privileged.enable_scripts()
+        remediable_checks = [check for check, _ in candidates]
+        groups = self.remediation_planner.plan(remediable_checks)
+        
+        verified: Dict[str, Dict[str, Any]] = {}
+        
+        def verify_group(plan_group, group_results):
+            """Re-run only the checks that read what this group just changed"""
+            if dry_run or not verify or not any(result.get('success') for result in group_results):
+                return
+            affected = self.remediation_planner.affected_checks(plan_group, self.check_definitions)
+            for entry in self.verify_checks(affected):
+                with self._results_lock:
+                    # Keep the earliest "before" if two groups touched the same check
+                    previous = verified.get(entry['check_id'])
+                    if previous:
+                        entry['before'] = previous['before']
+                    verified[entry['check_id']] = entry
+        
+        # Independent targets run concurrently; each re-verifies as soon as it finishes
+        executed = self.remediation_planner.execute_concurrently(
+            groups, dry_run=dry_run, max_workers=max_workers, on_group_done=verify_group
+        )
         
+        for plan_group, group_results in executed:
+            for (check, _), result in zip(plan_group.fixes, group_results):
+                remediation_results['results'].append({
+                    'check_id': check.get('id'),
+                    'check_text': check.get('text'),
+                    'status': statuses[id(check)],
+                    'remediation_result': result
+                })
+                
+                if result.get('executed', False):
+                    remediation_results['remediation_executed'] += 1
+                    if result.get('success', False):
+                        remediation_results['remediation_successful'] += 1
+                    else:
+                        remediation_results['remediation_failed'] += 1
+        
+        remediation_results['verification'] = sorted(
+            verified.values(), key=lambda entry: [int(part) if part.isdigit() else part for part in entry['check_id'].split('.')]
+        )
         return remediation_results
 
+    def verify_checks(self, check_ids: List[str]) -> List[Dict[str, Any]]:
+        """Re-execute only the given checks and replace their results in place"""
+        verification = []
+        for check_id in check_ids:
+            definition = self.check_definitions.get(check_id)
+            if not definition:
+                continue
+            parsed_check, component_type = definition
+            
+            try:
+                result = self.executor.execute_check(parsed_check, component_type)
+            except Exception as e:
+                self.logger.error(f"Re-verification of {check_id} failed: {e}")
+                continue
+            if parsed_check.get('auto_remediation'):
+                result['auto_remediation'] = parsed_check['auto_remediation']
+            
+            before = 'UNKNOWN'
+            with self._results_lock:
+                for group in self.results:
+                    checks = group.get('checks', [])
+                    for index, old_result in enumerate(checks):
+                        if str(old_result.get('id')) == check_id:
+                            before = self._get_check_status(old_result)
+                            checks[index] = result
+                            group['group_stats'] = self._calculate_group_stats(checks)
+                            break
+                    else:
+                        continue
+                    break
+            
+            after = self._get_check_status(result)
+            self.logger.info(f"Re-verified {check_id}: {before} -> {after}")
+            verification.append({
+                'check_id': check_id,
+                'before': before,
+                'after': after,
+                'execution_time': result.get('execution_time', 0)
+            })
+        
+        return verification
+
     def run_multiple_configs_with_report(self, check_ids: List[str], output_format: str = 'text', 
                                         output_file: Optional[str] = None, **kwargs) -> bool:
         """Simplified version using centralized methods"""
@@ -385,6 +582,10 @@ class KubeBenchPython:
         accumulated_results = []
         all_success = True
         
+        self.start_scan(list(config_checks.keys()), targets=kwargs.get('targets', None),
+                        specific_checks=[c.strip() for c in check_ids], workers=kwargs.get('workers', 1),
+                        deadline=kwargs.get('deadline'))
+        
         # Process each config file
         for config_file, specific_checks in config_checks.items():
             if not Path(config_file).exists():
@@ -420,28 +621,162 @@ class KubeBenchPython:
         
         # Set final results
         self.results = accumulated_results
+        self.finish_scan()
+        
+        if output_format in self.STREAMED_FORMATS:
+            return self._write_streamed_report(output_format, output_file,
+                                               include_passed=kwargs.get('include_passed', True),
+                                               include_manual=kwargs.get('include_manual', True),
+                                               show_remediation=kwargs.get('show_remediation', True))
         
-        # Generate report using centralized methods
-        report_lines, remediation_data = self._format_report_lines(
+        # Report lines are produced while the output is written
+        report_lines = self._report_lines(
             include_passed=kwargs.get('include_passed', True),
             include_manual=kwargs.get('include_manual', True),
             show_remediation=kwargs.get('show_remediation', True)
         )
+        return self._generate_output(report_lines, output_format, output_file,
+                                     compact=kwargs.get('compact', False))
+    
+    def build_plan(self, check_files: List[str], targets: Optional[List[str]] = None,
+                   specific_checks: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+        """Deduplicated execution plan, longest estimated checks first"""
+        plan = []
+        seen = set()
+        audit_owners: Dict[str, str] = {}
+        
+        for check_file in check_files:
+            try:
+                checks_data = self.parser.load_checks(check_file)
+            except Exception as e:
+                self.logger.warning(f"Failed to load checks from {check_file}: {e}")
+                continue
+            if not checks_data:
+                continue
+            
+            component_type = checks_data.get('type', 'etcd')
+            if targets and component_type not in targets:
+                continue
+            
+            for group in checks_data.get('groups', []):
+                for check in group.get('checks', []):
+                    check_id = str(check.get('id', 'unknown')).strip()
+                    if check_id in seen or (specific_checks and check_id not in specific_checks):
+                        continue
+                    seen.add(check_id)
+                    
+                    parsed_check = self.parser.parse_check(check)
+                    if not parsed_check.get('audit') and not parsed_check.get('audit_config'):
+                        continue
+                    
+                    # Checks with identical substituted audits share one execution
+                    audit_key = self.executor.audit_key(parsed_check, component_type)
+                    owner = audit_owners.setdefault(audit_key, check_id)
+                    history_entry = self.history.durations.get(check_id)
+                    plan.append({
+                        'id': check_id,
+                        'check': parsed_check,
+                        'component_type': component_type,
+                        'check_file': check_file,
+                        'estimate': self.history.estimate(check_id, component_type),
+                        'runs': history_entry.get('runs', 0) if history_entry else 0,
+                        'shares_audit_with': owner if owner != check_id else None
+                    })
         
-        # ← SỬA: Add remediation section với status indicator
-        if remediation_data:
-            report_lines.append("== Remediations ==")
-            for rem in remediation_data:
-                # Thêm status indicator để phân biệt FAIL vs WARN
-                status_indicator = f" ({rem.get('status', 'UNKNOWN')})" if rem.get('status') else ""
-                report_lines.append(f"{rem['id']}{status_indicator} {rem['text']}")
+        plan.sort(key=lambda entry: entry['estimate'], reverse=True)
+        return plan
+    
+    def estimate_wall_time(self, plan: List[Dict[str, Any]], workers: int) -> float:
+        """Estimated wall time of a plan; shared audits are only paid once"""
+        durations = [0.0 if entry['shares_audit_with'] else entry['estimate'] for entry in plan]
+        return estimate_makespan(durations, workers)
+    
+    def start_scan(self, check_files: List[str], targets: Optional[List[str]] = None,
+                   specific_checks: Optional[List[str]] = None, workers: int = 1,
+                   deadline: Optional[float] = None):
+        """Share audit output for this scan and start checks longest-first on a pool"""
+        self.executor.begin_scan()
+        self.executor.set_deadline(deadline)
+        if deadline is not None:
+            self.logger.info(f"Scan deadline: {format_duration(deadline)}")
+        if workers <= 1:
+            return
         
-        # Add summary
-        summary_lines = self._generate_total_summary()
-        report_lines.extend(summary_lines)
+        plan = self.build_plan(check_files, targets, specific_checks)
+        self.logger.info(f"Executing {len(plan)} checks on {workers} workers, "
+                         f"estimated {format_duration(self.estimate_wall_time(plan, workers))}")
+        self._prefetch_pool = ThreadPoolExecutor(max_workers=workers)
+        for entry in plan:
+            self._prefetched[entry['id']] = self._prefetch_pool.submit(
+                self.executor.execute_check, entry['check'], entry['component_type']
+            )
+    
+    def finish_scan(self):
+        """Stop the scan pool, stop sharing audit output and record check durations"""
+        if self._prefetch_pool:
+            self._prefetch_pool.shutdown(wait=True, cancel_futures=True)
+            self._prefetch_pool = None
+        self._prefetched = {}
+        self.executor.end_scan()
+        self.executor.set_deadline(None)
+        
+        # Replayed durations say nothing about the live node
+        if self.snapshot is None or not self.snapshot.replay:
+            for group in self.results:
+                self.history.record_results(group.get('checks', []))
+            self.history.save()
+    
+    def attach_snapshot(self, snapshot: Snapshot):
+        """Capture the inputs of following scans into a snapshot, or evaluate against one"""
+        self.snapshot = snapshot
+        self.executor.attach_snapshot(snapshot)
+        self.remediation_planner = RemediationPlanner(self.executor.discovery, privileged=self.executor.privileged)
+        if snapshot.replay:
+            info = snapshot.summary()
+            self.logger.info(f"Replaying snapshot of {info['hostname']} captured {info['captured_at']}")
+    
+    def detect_targets(self) -> List[str]:
+        """Detect which targets run on this node (process table + config files)"""
+        if self.snapshot is not None and self.snapshot.replay:
+            return self.snapshot.targets
+        targets = self.executor.discovery.detect_targets()
+        if targets:
+            self.logger.info(f"Detected targets on this node: {', '.join(targets)}")
+        else:
+            self.logger.warning("No Kubernetes components detected on this node")
+        return targets
+    
+    def save_audits(self, store: AuditStore, path: str):
+        """Write the audit outputs recorded by this scan, with the verdict each check got"""
+        for group in self.results:
+            for result in group.get('checks', []):
+                store.set_status(result.get('id'), self._get_check_status(result))
+        store.save(path)
+        self.logger.info(f"Saved audit outputs of {len(store.check_ids())} checks to {path}")
+    
+    def rescore(self, store: AuditStore, specific_checks: Optional[List[str]] = None) -> List[Tuple[str, str, str]]:
+        """Re-evaluate the current tests: blocks against saved audit outputs; returns changed verdicts"""
+        self.results = []
+        self.check_definitions = {}
+        self.executor.audit_store = store
+        for component_type in store.component_types():
+            check_file = self.TARGET_FILES.get(component_type)
+            if not check_file or not Path(check_file).exists():
+                self.logger.warning(f"No check file for saved {component_type} outputs, skipping")
+                continue
+            check_ids = [check_id for check_id in store.check_ids(component_type)
+                         if not specific_checks or check_id in specific_checks]
+            if check_ids:
+                self.run_checks(check_file, progress=False, specific_checks=check_ids)
         
-        # Generate output
-        return self._generate_output(report_lines, remediation_data, output_format, output_file)
+        changes = []
+        for group in self.results:
+            for result in group.get('checks', []):
+                before = store.status(result.get('id'))
+                after = self._get_check_status(result)
+                if before and before != after:
+                    changes.append((str(result.get('id')), before, after))
+        return changes
     
     def _signal_handler(self, signum, frame):
         """Handle interrupt signals gracefully"""
@@ -584,14 +919,19 @@ class KubeBenchPython:
                         # Parse check
                         try:
                             parsed_check = self.parser.parse_check(check)
+                            self.check_definitions[str(parsed_check.get('id'))] = (parsed_check, component_type)
                         except KeyError as e:
                             raise ValueError(f"Missing required field in check definition: {e}")
                         except Exception as e:
                             raise ValueError(f"Failed to parse check definition: {e}")
                         
-                        # Execute check
+                        # Execute check (or collect it from the scan pool)
                         try:
-                            result = self.executor.execute_check(parsed_check, component_type)
+                            future = self._prefetched.pop(str(check_id).strip(), None)
+                            if future is not None:
+                                result = future.result()
+                            else:
+                                result = self.executor.execute_check(parsed_check, component_type)
                             
                             # Add auto_remediation info to result
                             if parsed_check.get('auto_remediation'):
@@ -632,7 +972,7 @@ class KubeBenchPython:
                     except Exception as e:
                         self.logger.warning(f"Failed to calculate group statistics: {e}")
                         group_results['group_execution_time'] = 0
-                        group_results['group_stats'] = {'total': 0, 'pass': 0, 'fail': 0, 'warn': 0, 'info': 0}
+                        group_results['group_stats'] = {'total': 0, 'pass': 0, 'fail': 0, 'warn': 0, 'info': 0, 'timeout': 0}
                     
                     self.results.append(group_results)
                     
@@ -654,32 +994,24 @@ class KubeBenchPython:
 
     def generate_report(self, output_format: str = 'text', output_file: Optional[str] = None,
                        include_passed: bool = True, include_manual: bool = True,
-                       show_remediation: bool = True, kube_bench_style: bool = True) -> bool:
+                       show_remediation: bool = True, kube_bench_style: bool = True, compact: bool = False) -> bool:
         """Simplified version using centralized methods"""
         self.logger.info(f"Generating report in {output_format} format")
         
         try:
-            # Generate report using centralized method
-            report_lines, remediation_data = self._format_report_lines(
+            if output_format in self.STREAMED_FORMATS:
+                return self._write_streamed_report(output_format, output_file, include_passed=include_passed,
+                                                   include_manual=include_manual,
+                                                   show_remediation=show_remediation)
+            
+            # Report lines are produced while the output is written
+            report_lines = self._report_lines(
                 include_passed=include_passed,
                 include_manual=include_manual,
                 show_remediation=show_remediation
             )
-            
-            # ← SỬA: Add remediation section với status indicator
-            if show_remediation and remediation_data:
-                report_lines.append("== Remediations ==")
-                for rem in remediation_data:
-                    # Thêm status indicator để phân biệt FAIL vs WARN
-                    status_indicator = f" ({rem.get('status', 'UNKNOWN')})" if rem.get('status') else ""
-                    report_lines.append(f"{rem['id']}{status_indicator} {rem['text']}")
-            
-            # Add summary
-            summary_lines = self._generate_total_summary()
-            report_lines.extend(summary_lines)
-            
-            # Generate output using centralized method
-            return self._generate_output(report_lines, remediation_data, output_format, output_file)
+            return self._generate_output(report_lines, output_format, output_file,
+                                         compact=compact)
             
         except Exception as e:
             self.logger.error(f"Failed to generate report: {e}")
@@ -726,6 +1058,10 @@ class KubeBenchPython:
         passed = result.get('passed')
         check_type = result.get('type', 'automated')
         
+        # Cut off by its timeout or the scan deadline: not scored either way
+        if result.get('status') == 'TIMEOUT':
+            return "TIMEOUT"
+        
         # Manual checks always WARN
         if check_type == 'manual':
             return "WARN"
@@ -760,6 +1096,7 @@ class KubeBenchPython:
             'PASS': Colors.PASS,
             'FAIL': Colors.FAIL,
             'WARN': Colors.MANUAL,
+            'TIMEOUT': Colors.ERROR,
             'INFO': Colors.INFO
         }
         return color_map.get(status, Colors.RESET)
@@ -771,7 +1108,8 @@ class KubeBenchPython:
             'pass': 0,
             'fail': 0,
             'warn': 0,
-            'info': 0
+            'info': 0,
+            'timeout': 0
         }
         
         for check in checks:
@@ -784,6 +1122,8 @@ class KubeBenchPython:
                 stats['warn'] += 1
             elif status == 'INFO':
                 stats['info'] += 1
+            elif status == 'TIMEOUT':
+                stats['timeout'] += 1
         
         return stats
     
@@ -805,6 +1145,7 @@ class KubeBenchPython:
         failed_checks = 0
         warn_checks = 0
         info_checks = 0
+        timeout_checks = 0
         
         for group in self.results:
             stats = group.get('group_stats', {})
@@ -813,13 +1154,15 @@ class KubeBenchPython:
             failed_checks += stats.get('fail', 0)
             warn_checks += stats.get('warn', 0)
             info_checks += stats.get('info', 0)
+            timeout_checks += stats.get('timeout', 0)
         
         return {
             'total_checks': total_checks,
             'passed_checks': passed_checks,
             'failed_checks': failed_checks,
             'warn_checks': warn_checks,
-            'info_checks': info_checks
+            'info_checks': info_checks,
+            'timeout_checks': timeout_checks
         }
 
     def _aggregate_component_stats(self) -> Dict[str, Dict[str, int]]:
@@ -829,7 +1172,7 @@ class KubeBenchPython:
             comp = g.get('component_type', 'unknown')
             st = g.get('group_stats', {})
             if comp not in agg:
-                agg[comp] = {'pass': 0, 'fail': 0, 'warn': 0, 'info': 0}
+                agg[comp] = {'pass': 0, 'fail': 0, 'warn': 0, 'info': 0, 'timeout': 0}
             for k in agg[comp]:
                 agg[comp][k] += st.get(k, 0)
         return agg
@@ -886,11 +1229,12 @@ def cli(ctx, config, config_dir, log_level, no_color, enable_file_logging):
     ctx.obj['enable_file_logging'] = enable_file_logging
 
 @cli.command()
-@click.option('--targets', multiple=True, help='Targets to run (like kube-bench --targets)')
+@click.option('--targets', multiple=True, help='Targets to run (like kube-bench --targets), overrides auto-detection')
+@click.option('--no-detect', is_flag=True, help='Disable automatic node-role detection of targets')
 @click.option('--benchmark', help='Benchmark version to use')
 @click.option('--check', help='Specific checks to run (comma-separated, e.g., 1.2.9,3.1.2,5.1.2)')
 @click.option('--group', multiple=True, help='Specific groups to run')
-@click.option('--output-format', type=click.Choice(['json', 'yaml', 'text', 'csv', 'table', 'html', 'pdf']),
+@click.option('--output-format', type=click.Choice(['json', 'msgpack', 'yaml', 'text', 'csv', 'table', 'html', 'pdf']),
               default='text', help='Output format')
 @click.option('--output-file', help='Output file path')
 @click.option('--no-passed', is_flag=True, help='Exclude passed checks from output')
@@ -901,10 +1245,27 @@ def cli(ctx, config, config_dir, log_level, no_color, enable_file_logging):
 @click.option('--auto-remediate', is_flag=True, help='Automatically execute remediation for failed checks')
 @click.option('--dry-run', is_flag=True, help='Show what would be executed without actually running commands (for auto-remediation)')
 @click.option('--yes', is_flag=True, help='Skip confirmation prompts (for auto-remediation)')
+@click.option('--workers', type=click.IntRange(1, 64), default=4, help='Checks executed concurrently, longest first')
+@click.option('--deadline', help='Time budget for the whole scan (e.g. 300, 90s, 10m); late checks are reported as TIMEOUT')
+@click.option('--remediation-workers', type=click.IntRange(1, 32), default=4, help='Independent remediation targets applied concurrently')
+@click.option('--no-verify', is_flag=True, help='Do not re-run affected checks after auto-remediation')
+@click.option('--from-snapshot', type=click.Path(exists=True, dir_okay=False),
+              help="Evaluate against a 'snapshot' archive instead of this node (no commands are run)")
+@click.option('--save-audits', type=click.Path(dir_okay=False),
+              help="Save every check's raw audit output to this file (.gz/.zst to compress) for 'rescore'")
+@click.option('--compact', is_flag=True, help='Write JSON without indentation (orjson when installed)')
+@click.option('--kubeconfig', 'kubeconfigs', multiple=True, metavar='[NAME=]PATH',
+              help='Scan the cluster-scope checks of this cluster (repeat for several clusters)')
+@click.option('--contexts-file', type=click.Path(exists=True, dir_okay=False),
+              help="YAML list of clusters ('clusters: [{name, kubeconfig, context}]') to scan")
+@click.option('--cluster-workers', type=click.IntRange(1, 64), default=4,
+              help='Clusters scanned concurrently (--workers checks each)')
 @click.argument('check_files', nargs=-1)
 @click.pass_context
-def run(ctx, targets, benchmark, check, group, output_format, output_file, 
-        no_passed, no_manual, no_remediation, no_progress, auto_config, auto_remediate, dry_run, yes, check_files):
+def run(ctx, targets, no_detect, benchmark, check, group, output_format, output_file, 
+        no_passed, no_manual, no_remediation, no_progress, auto_config, auto_remediate, dry_run, yes,
+        workers, deadline, remediation_workers, no_verify, from_snapshot, save_audits, compact,
+        kubeconfigs, contexts_file, cluster_workers, check_files):
     """Run security checks (kube-bench compatible with auto-config mapping)"""
     
     # Parse check IDs từ comma-separated string
@@ -913,6 +1274,18 @@ def run(ctx, targets, benchmark, check, group, output_format, output_file,
         check_ids = [check_id.strip() for check_id in check.split(',') if check_id.strip()]
         click.echo(f"Running specific checks: {', '.join(check_ids)}")
     
+    deadline_seconds = parse_duration(deadline)
+    if deadline and (deadline_seconds is None or deadline_seconds <= 0):
+        raise click.BadParameter(f"invalid duration: {deadline}", param_hint='--deadline')
+    if from_snapshot and auto_remediate:
+        raise click.UsageError("--auto-remediate cannot be used with --from-snapshot")
+    multi_cluster = bool(kubeconfigs or contexts_file)
+    if multi_cluster and (from_snapshot or auto_remediate or save_audits or check_files):
+        raise click.UsageError("--kubeconfig/--contexts-file cannot be used with --from-snapshot, "
+                               "--auto-remediate, --save-audits or check files (use --targets/--check)")
+    if multi_cluster and output_format not in ('json', 'text'):
+        raise click.UsageError("Multi-cluster reports are written as json or text")
+    
     try:
         # Initialize KubeBench
         kube_bench = KubeBenchPython(
@@ -921,6 +1294,44 @@ def run(ctx, targets, benchmark, check, group, output_format, output_file,
             ctx.obj['no_color'],
             ctx.obj['enable_file_logging']
         )
+        if multi_cluster:
+            clusters = [ClusterTarget.from_argument(value) for value in kubeconfigs]
+            if contexts_file:
+                clusters.extend(load_contexts_file(contexts_file))
+            name_clusters(clusters)
+            scan = MultiClusterScan(kube_bench, clusters, cluster_workers=cluster_workers, check_workers=workers,
+                                    targets=list(targets) or None, specific_checks=check_ids or None,
+                                    deadline=deadline_seconds)
+            results = scan.run()
+            if output_format == 'json':
+                report = {'benchmark': kube_bench.parser.get_benchmark_info()['cis_version'], 'clusters': results}
+                if output_file:
+                    save_json_file(output_file, report, compact=compact)
+                    kube_bench.logger.success(f"JSON report generated: {output_file}")
+                else:
+                    click.echo(dumps_json(report, compact).decode('utf-8'))
+            else:
+                kube_bench._generate_output(
+                    kube_bench.cluster_report_lines(results, not no_passed, not no_manual, not no_remediation),
+                    'text', output_file)
+            # Any failed check or cluster fails the run, as for a single cluster
+            if any(entry['error'] or entry['summary']['FAIL'] or entry['summary']['TIMEOUT']
+                   for entry in results.values()):
+                sys.exit(1)
+            return
+        
+        if from_snapshot:
+            kube_bench.attach_snapshot(Snapshot.load(from_snapshot))
+        audit_store = None
+        if save_audits:
+            audit_store = AuditStore()
+            kube_bench.executor.audit_store = audit_store
+        
+        # Explicit --targets wins, otherwise detect which components run on this node
+        # unless specific --check IDs were asked for, which run whatever the node role
+        selected_targets = list(targets) if targets else None
+        if not selected_targets and not no_detect and not check_ids:
+            selected_targets = kube_bench.detect_targets() or None
         
         # If specific checks are provided, use auto-mapping
         if check_ids:
@@ -931,11 +1342,16 @@ def run(ctx, targets, benchmark, check, group, output_format, output_file,
                 output_format=output_format,
                 output_file=output_file,
                 progress=not no_progress,
-                targets=list(targets) if targets else None,
+                targets=selected_targets,
+                workers=workers,
+                deadline=deadline_seconds,
                 include_passed=not no_passed,
                 include_manual=not no_manual,
-                show_remediation=not no_remediation
+                show_remediation=not no_remediation,
+                compact=compact
             )
+            if audit_store is not None:
+                kube_bench.save_audits(audit_store, save_audits)
             
             if not success:
                 click.echo("Failed to complete auto-mapped checks", err=True)
@@ -945,9 +1361,15 @@ def run(ctx, targets, benchmark, check, group, output_format, output_file,
         else:
             # Original behavior: use provided check files or defaults
             if not check_files:
-                check_files = ['config/etcd.yaml', 'config/controlplane.yaml']
+                if selected_targets:
+                    check_files = [f for t, f in KubeBenchPython.TARGET_FILES.items() if t in selected_targets]
+                else:
+                    check_files = ['config/etcd.yaml', 'config/controlplane.yaml']
             
-            # Run checks for each file
+            # Run checks for each file (executed longest-first on the scan pool)
+            kube_bench.start_scan(list(check_files), targets=selected_targets,
+                                  specific_checks=check_ids if check_ids else None, workers=workers,
+                                  deadline=deadline_seconds)
             for check_file in check_files:
                 if not Path(check_file).exists():
                     click.echo(f"Check file not found: {check_file}", err=True)
@@ -957,12 +1379,15 @@ def run(ctx, targets, benchmark, check, group, output_format, output_file,
                     check_file, 
                     component_filter=None, 
                     progress=not no_progress,
-                    targets=list(targets) if targets else None,
+                    targets=selected_targets,
                     specific_checks=check_ids if check_ids else None
                 )
                 
                 if not success:
                     click.echo(f"Failed to complete checks for {check_file}", err=True)
+            kube_bench.finish_scan()
+            if audit_store is not None:
+                kube_bench.save_audits(audit_store, save_audits)
         
         # Generate report
         report_success = kube_bench.generate_report(
@@ -971,7 +1396,8 @@ def run(ctx, targets, benchmark, check, group, output_format, output_file,
             include_passed=not no_passed,
             include_manual=not no_manual,
             show_remediation=not no_remediation,
-            kube_bench_style=True
+            kube_bench_style=True,
+            compact=compact
         )
         
         if not report_success:
@@ -983,7 +1409,9 @@ def run(ctx, targets, benchmark, check, group, output_format, output_file,
             click.echo("\n=== Auto Remediation ===")
             remediation_results = kube_bench.execute_auto_remediation_for_failed_checks(
                 dry_run=dry_run,
-                require_confirmation=not yes
+                require_confirmation=not yes,
+                max_workers=remediation_workers,
+                verify=not no_verify
             )
             
             # Display remediation summary
@@ -1000,10 +1428,14 @@ def run(ctx, targets, benchmark, check, group, output_format, output_file,
                 if not remediation_result.get('success'):
                     click.echo(f"  Error: {remediation_result.get('error', 'Unknown error')}")
                 click.echo(f"  Command: {remediation_result.get('command', 'N/A')}")
+            
+            # Show re-verified checks (before -> after)
+            for entry in remediation_results['verification']:
+                click.echo(f"Verified {entry['check_id']}: {entry['before']} -> {entry['after']}")
         
         # Check for failures and exit accordingly (like kube-bench)
         summary = kube_bench._generate_summary()
-        if summary.get('failed_checks', 0) > 0:
+        if summary.get('failed_checks', 0) > 0 or summary.get('timeout_checks', 0) > 0:
             sys.exit(1)
             
     except KeyboardInterrupt:
@@ -1020,8 +1452,10 @@ def run(ctx, targets, benchmark, check, group, output_format, output_file,
 @click.option('--output-format', type=click.Choice(['text', 'json', 'yaml']), 
               default='text', help='Output format for remediation results')
 @click.option('--output-file', help='Output file path for remediation results')
+@click.option('--workers', type=click.IntRange(1, 32), default=4, help='Independent remediation targets applied concurrently')
+@click.option('--no-verify', is_flag=True, help='Do not re-run affected checks after remediation')
 @click.pass_context
-def remediate(ctx, dry_run, yes, check, output_format, output_file):
+def remediate(ctx, dry_run, yes, check, output_format, output_file, workers, no_verify):
     """Execute auto remediation for failed checks"""
     
     try:
@@ -1060,7 +1494,9 @@ def remediate(ctx, dry_run, yes, check, output_format, output_file):
         click.echo(f"\nExecuting auto remediation (dry_run={dry_run})...")
         remediation_results = kube_bench.execute_auto_remediation_for_failed_checks(
             dry_run=dry_run,
-            require_confirmation=not yes
+            require_confirmation=not yes,
+            max_workers=workers,
+            verify=not no_verify
         )
         
         # Display results
@@ -1092,6 +1528,12 @@ def remediate(ctx, dry_run, yes, check, output_format, output_file):
                 output_lines.append(f"Command: {remediation_result.get('command', 'N/A')}")
                 output_lines.append("")
             
+            if remediation_results['verification']:
+                output_lines.append("=== Re-verification ===")
+                for entry in remediation_results['verification']:
+                    output_lines.append(f"{entry['check_id']}: {entry['before']} -> {entry['after']}")
+                output_lines.append("")
+            
             output = '\n'.join(output_lines)
         
         if output_file:
@@ -1112,6 +1554,275 @@ def remediate(ctx, dry_run, yes, check, output_format, output_file):
         click.echo(f"Fatal error: {e}", err=True)
         sys.exit(1)
 
+@cli.command()
+@click.option('--targets', multiple=True, help='Targets to plan, overrides auto-detection')
+@click.option('--check', help='Specific checks to plan (comma-separated)')
+@click.option('--workers', type=click.IntRange(1, 64), default=4, help='Checks executed concurrently')
+@click.pass_context
+def plan(ctx, targets, check, workers):
+    """Print the deduplicated execution plan and estimated wall time without running anything"""
+    
+    try:
+        kube_bench = KubeBenchPython(
+            ctx.obj['config'], 
+            ctx.obj['log_level'], 
+            ctx.obj['no_color'],
+            ctx.obj['enable_file_logging']
+        )
+        
+        selected_targets = list(targets) or kube_bench.detect_targets() or None
+        check_ids = [c.strip() for c in check.split(',')] if check else None
+        if check_ids:
+            check_files = list(kube_bench.map_checks_to_configs(check_ids).keys())
+        elif selected_targets:
+            check_files = [f for t, f in KubeBenchPython.TARGET_FILES.items() if t in selected_targets]
+        else:
+            check_files = ['config/etcd.yaml', 'config/controlplane.yaml']
+        
+        entries = kube_bench.build_plan(check_files, targets=selected_targets, specific_checks=check_ids)
+        rows = []
+        for index, entry in enumerate(entries, 1):
+            if entry['shares_audit_with']:
+                source = f"shares audit with {entry['shares_audit_with']}"
+            elif entry['runs']:
+                source = f"history ({entry['runs']} runs)"
+            else:
+                source = 'default'
+            rows.append([index, entry['id'], entry['component_type'], format_duration(entry['estimate']), source])
+        
+        click.echo(tabulate(rows, headers=['#', 'Check', 'Target', 'Estimate', 'Source'], tablefmt='simple'))
+        serial = sum(0.0 if entry['shares_audit_with'] else entry['estimate'] for entry in entries)
+        shared = sum(1 for entry in entries if entry['shares_audit_with'])
+        click.echo(f"\nChecks: {len(entries)} ({shared} reuse another check's audit output)")
+        click.echo(f"Estimated serial time: {format_duration(serial)}")
+        click.echo(f"Estimated wall time with {workers} workers: "
+                   f"{format_duration(kube_bench.estimate_wall_time(entries, workers))}")
+        
+    except Exception as e:
+        click.echo(f"Fatal error: {e}", err=True)
+        sys.exit(1)
+
+@cli.command()
+@click.option('--targets', multiple=True, help='Targets to schedule, overrides auto-detection')
+@click.option('--output-file', default='reports/agent-results.json', help='File holding the latest result of every check (.msgpack for the binary format)')
+@click.option('--once', is_flag=True, help='Run every scheduled job once and exit')
+@click.option('--seed', type=int, help='Jitter seed (defaults to random)')
+@click.option('--coordination', type=click.Choice(['none', 'lease', 'file']),
+              help='Run cluster-scope checks on one agent per interval (default: config.yaml coordination.mode)')
+@click.pass_context
+def agent(ctx, targets, output_file, once, seed, coordination):
+    """Run as a node agent: each check on its own interval (config.yaml 'schedule')"""
+    
+    try:
+        kube_bench = KubeBenchPython(
+            ctx.obj['config'], 
+            ctx.obj['log_level'], 
+            ctx.obj['no_color'],
+            ctx.obj['enable_file_logging']
+        )
+        
+        selected_targets = list(targets) or kube_bench.detect_targets()
+        rng = random.Random(seed) if seed is not None else None
+        coordinator = create_coordinator(kube_bench, kube_bench.parser.config.get('coordination'), coordination)
+        if coordinator is not None:
+            click.echo(f"Cluster-scope targets ({', '.join(coordinator.cluster_targets)}) coordinated "
+                       f"as {coordinator.identity}")
+        scheduler = ScanScheduler(kube_bench, kube_bench.parser.config.get('schedule'), output_file, rng=rng,
+                                  coordinator=coordinator)
+        
+        for target, check_file in KubeBenchPython.TARGET_FILES.items():
+            if selected_targets and target not in selected_targets:
+                continue
+            if not Path(check_file).exists():
+                click.echo(f"Check file not found: {check_file}", err=True)
+                continue
+            scheduled = scheduler.add_check_file(check_file, targets=selected_targets)
+            click.echo(f"Scheduled {scheduled} checks from {check_file}")
+        
+        if once:
+            scheduler.run_once()
+            return
+        
+        # Stop dispatching on SIGINT/SIGTERM and let running jobs finish
+        signal.signal(signal.SIGINT, lambda signum, frame: scheduler.stop())
+        signal.signal(signal.SIGTERM, lambda signum, frame: scheduler.stop())
+        scheduler.run_forever()
+        
+    except Exception as e:
+        click.echo(f"Fatal error: {e}", err=True)
+        sys.exit(1)
+
+@cli.command()
+@click.option('--targets', multiple=True, help='Targets to capture, overrides auto-detection')
+@click.option('--output-file', help='Snapshot archive (default: reports/snapshot-<host>-<time>.json.gz)')
+@click.option('--workers', type=click.IntRange(1, 64), default=4, help='Checks executed concurrently')
+@click.pass_context
+def snapshot(ctx, targets, output_file, workers):
+    """Capture every input the checks read into one archive for 'run --from-snapshot'"""
+    
+    try:
+        kube_bench = KubeBenchPython(
+            ctx.obj['config'], 
+            ctx.obj['log_level'], 
+            ctx.obj['no_color'],
+            ctx.obj['enable_file_logging']
+        )
+        
+        capture = Snapshot()
+        kube_bench.attach_snapshot(capture)
+        selected_targets = list(targets) or kube_bench.detect_targets()
+        capture.targets = selected_targets
+        check_files = [f for t, f in KubeBenchPython.TARGET_FILES.items()
+                       if (not selected_targets or t in selected_targets) and Path(f).exists()]
+        
+        # Run the audits once so exactly what the checks read is recorded
+        kube_bench.start_scan(check_files, targets=selected_targets, workers=workers)
+        for check_file in check_files:
+            kube_bench.run_checks(check_file, progress=False, targets=selected_targets)
+        kube_bench.finish_scan()
+        
+        if not output_file:
+            stamp = datetime.now().strftime('%Y%m%d-%H%M%S')
+            output_file = f"reports/snapshot-{capture.summary()['hostname']}-{stamp}.json.gz"
+        capture.save(output_file)
+        
+        info = capture.summary()
+        click.echo(f"Snapshot written to {output_file}")
+        click.echo(f"Targets: {', '.join(info['targets']) or 'none'}")
+        click.echo(f"Captured {info['processes']} processes, {info['files']} files, {info['commands']} audit commands, "
+                   f"{info['api_objects']} cluster objects in {info['api_lists']} lists")
+        
+    except Exception as e:
+        click.echo(f"Fatal error: {e}", err=True)
+        sys.exit(1)
+
+@cli.command()
+@click.option('--check', help='Only rescore these checks (comma-separated)')
+@click.option('--output-format', type=click.Choice(['json', 'msgpack', 'yaml', 'text', 'csv', 'table', 'html', 'pdf']),
+              default='text', help='Report format for a single saved file (several files are summarised, JSON to --output-file)')
+@click.option('--output-file', help='Output file path (.gz/.zst to compress)')
+@click.option('--compact', is_flag=True, help='Write JSON without indentation (orjson when installed)')
+@click.argument('saved_files', nargs=-1, required=True, type=click.Path(exists=True, dir_okay=False))
+@click.pass_context
+def rescore(ctx, check, output_format, output_file, compact, saved_files):
+    """Re-evaluate checks against outputs saved by 'run --save-audits', without running audits"""
+    check_ids = [check_id.strip() for check_id in check.split(',') if check_id.strip()] if check else None
+    
+    try:
+        kube_bench = KubeBenchPython(
+            ctx.obj['config'], 
+            ctx.obj['log_level'], 
+            ctx.obj['no_color'],
+            ctx.obj['enable_file_logging']
+        )
+        
+        # One node: the usual report, plus the verdicts that changed
+        if len(saved_files) == 1:
+            store = AuditStore.load(saved_files[0])
+            changes = kube_bench.rescore(store, check_ids)
+            if not kube_bench.generate_report(output_format=output_format, output_file=output_file, compact=compact):
+                click.echo("Failed to generate report", err=True)
+                sys.exit(1)
+            for check_id, before, after in changes:
+                click.echo(f"Changed {check_id}: {before} -> {after}")
+            click.echo(f"{len(changes)} verdicts changed")
+            return
+        
+        # Several nodes: a summary line per saved file, results folded into one fleet model
+        fleet = kube_bench.fleet_report()
+        for saved_file in saved_files:
+            store = AuditStore.load(saved_file)
+            changes = kube_bench.rescore(store, check_ids)
+            summary = kube_bench._generate_summary()
+            fleet.add_node(store.hostname, kube_bench.results, saved_file,
+                           changes=[{'id': check_id, 'before': before, 'after': after}
+                                    for check_id, before, after in changes])
+            click.echo(f"{store.hostname} ({saved_file}): {summary['passed_checks']} pass, "
+                       f"{summary['failed_checks']} fail, {summary['warn_checks']} warn, "
+                       f"{len(changes)} changed")
+            for check_id, before, after in changes:
+                click.echo(f"  Changed {check_id}: {before} -> {after}")
+        
+        if output_file:
+            save_json_file(output_file, fleet.to_dict(), compact=compact)
+            click.echo(f"Rescored results written to {output_file}")
+        
+    except Exception as e:
+        click.echo(f"Fatal error: {e}", err=True)
+        sys.exit(1)
+
+@cli.command()
+@click.option('--output-format', type=click.Choice(['json', 'msgpack', 'yaml', 'text', 'csv', 'table', 'html', 'pdf']),
+              default='text', help='Output format')
+@click.option('--output-file', help='Output file path (.gz/.zst to compress)')
+@click.option('--no-passed', is_flag=True, help='Exclude passed checks from output')
+@click.option('--no-manual', is_flag=True, help='Exclude manual checks from output')
+@click.option('--no-remediation', is_flag=True, help='Exclude remediation from output')
+@click.option('--compact', is_flag=True, help='Write JSON without indentation (orjson when installed)')
+@click.option('--fleet', is_flag=True, help='One file per node: report each check once with per-node statuses (text, json)')
+@click.argument('result_files', nargs=-1, required=True, type=click.Path(exists=True, dir_okay=False))
+@click.pass_context
+def report(ctx, output_format, output_file, no_passed, no_manual, no_remediation, compact, fleet, result_files):
+    """Re-render results from 'run --output-format json|msgpack' or 'agent' (.gz/.zst are read directly)"""
+    
+    try:
+        kube_bench = KubeBenchPython(
+            ctx.obj['config'], 
+            ctx.obj['log_level'], 
+            ctx.obj['no_color'],
+            ctx.obj['enable_file_logging']
+        )
+        
+        if fleet:
+            if output_format not in ('text', 'json'):
+                raise click.UsageError("--fleet supports --output-format text or json")
+            fleet_report = kube_bench.fleet_report()
+            for result_file in result_files:
+                try:
+                    hostname, groups = kube_bench.load_result_file(result_file)
+                except ValueError as e:
+                    raise click.BadParameter(str(e), param_hint='RESULT_FILES')
+                fleet_report.add_node(hostname, groups, result_file)
+            
+            if output_format == 'json':
+                if output_file:
+                    save_json_file(output_file, fleet_report.to_dict(), compact=compact)
+                else:
+                    click.echo(dumps_json(fleet_report.to_dict(), compact).decode('utf-8'))
+            else:
+                lines = fleet_report.report_lines(KubeBenchPython.SECTION_HEADERS, include_passed=not no_passed,
+                                                  include_manual=not no_manual,
+                                                  show_remediation=not no_remediation)
+                if output_file:
+                    with open_text(output_file, 'w') as f:
+                        write_lines(f, lines)
+                        f.write('\n')
+                else:
+                    write_lines(sys.stdout, lines)
+                    click.echo()
+            if output_file:
+                click.echo(f"Fleet report of {len(fleet_report.nodes)} nodes written to {output_file}")
+            return
+        
+        # Several files are merged into one report
+        for result_file in result_files:
+            try:
+                kube_bench.results.extend(kube_bench.load_result_file(result_file)[1])
+            except ValueError as e:
+                raise click.BadParameter(str(e), param_hint='RESULT_FILES')
+        
+        if not kube_bench.generate_report(output_format=output_format, output_file=output_file,
+                                          include_passed=not no_passed, include_manual=not no_manual,
+                                          show_remediation=not no_remediation, compact=compact):
+            click.echo("Failed to generate report", err=True)
+            sys.exit(1)
+        
+    except click.ClickException:
+        raise
+    except Exception as e:
+        click.echo(f"Fatal error: {e}", err=True)
+        sys.exit(1)
+
 @cli.command()
 @click.pass_context
 def version(ctx):
@@ -0,0 +1,237 @@
+#!/usr/bin/env python3
+"""
+Multi-cluster scans for kube-bench-python
+Cluster-scope checks for several kubeconfigs/contexts from one process: one executor (API client,
+connection pool, audit memo, shell workers) per cluster, clusters scanned concurrently
+"""
+
+import copy
+import os
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Any, Optional, Tuple
+import yaml
+from utils import Logger
+from executor import CheckExecutor
+from shards import ShardedEvaluator
+from coordination import CLUSTER_SCOPE_TARGETS
+
+
+class ClusterTarget:
+    """One cluster to scan: a kubeconfig and optionally a context in it (name None: see name_clusters)"""
+
+    def __init__(self, name: Optional[str], kubeconfig: Optional[str] = None, context: Optional[str] = None):
+        self.name = name
+        self.kubeconfig = os.path.expanduser(kubeconfig) if kubeconfig else None
+        self.context = context
+
+    @classmethod
+    def from_argument(cls, value: str) -> 'ClusterTarget':
+        """--kubeconfig value: PATH, or NAME=PATH to name the cluster"""
+        name, separator, path = value.partition('=')
+        if separator and name and path and '/' not in name:
+            return cls(name, path)
+        return cls(None, value)
+
+    def default_name(self) -> str:
+        """The context, else the kubeconfig file name: prod.eu.yaml -> prod.eu"""
+        if self.context:
+            return self.context
+        return os.path.splitext(os.path.basename(self.kubeconfig))[0] if self.kubeconfig else 'default'
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {'kubeconfig': self.kubeconfig, 'context': self.context}
+
+
+def name_clusters(clusters: List[ClusterTarget]) -> List[ClusterTarget]:
+    """Name unnamed clusters uniquely; derived names that collide are prefixed with their kubeconfig
+    directory (a/prod, b/prod), then its full path. Raises ValueError for duplicate explicit names."""
+    explicit = [cluster.name for cluster in clusters if cluster.name]
+    duplicates = sorted({name for name in explicit if explicit.count(name) > 1})
+    if duplicates:
+        raise ValueError(f"Duplicate cluster names: {', '.join(duplicates)}")
+
+    unnamed = [cluster for cluster in clusters if not cluster.name]
+    derived = {id(cluster): cluster.default_name() for cluster in unnamed}
+
+    def qualified(cluster: ClusterTarget, level: int) -> str:
+        name = derived[id(cluster)]
+        if level == 0 or not cluster.kubeconfig:
+            return name
+        if level == 1:
+            return f"{os.path.basename(os.path.dirname(os.path.abspath(cluster.kubeconfig)))}/{name}"
+        return f"{os.path.abspath(cluster.kubeconfig)}:{name}"
+
+    levels = {id(cluster): 0 for cluster in unnamed}
+    for _ in range(3):
+        names = [qualified(cluster, levels[id(cluster)]) for cluster in unnamed] + explicit
+        clashing = [cluster for cluster in unnamed if names.count(qualified(cluster, levels[id(cluster)])) > 1]
+        if not clashing:
+            break
+        for cluster in clashing:
+            levels[id(cluster)] = min(levels[id(cluster)] + 1, 2)
+    for cluster in unnamed:
+        cluster.name = qualified(cluster, levels[id(cluster)])
+
+    names = [cluster.name for cluster in clusters]
+    duplicates = sorted({name for name in names if names.count(name) > 1})
+    if duplicates:
+        raise ValueError(f"Clusters listed twice: {', '.join(duplicates)}")
+    return clusters
+
+
+def load_contexts_file(path: str) -> List[ClusterTarget]:
+    """clusters: [{name, kubeconfig, context}] (unnamed entries are named by name_clusters)"""
+    with open(path, 'r', encoding='utf-8') as f:
+        data = yaml.safe_load(f) or {}
+    entries = data.get('clusters') if isinstance(data, dict) else data
+    if not isinstance(entries, list):
+        raise ValueError(f"{path}: expected a 'clusters' list")
+
+    clusters = []
+    for entry in entries:
+        if not isinstance(entry, dict) or not (entry.get('kubeconfig') or entry.get('context')):
+            raise ValueError(f"{path}: every cluster needs a kubeconfig or a context")
+        name = entry.get('name')
+        clusters.append(ClusterTarget(str(name) if name else None, entry.get('kubeconfig'), entry.get('context')))
+    return clusters
+
+
+class MultiClusterScan:
+    """Cluster-scope checks of every cluster; failures stay with the cluster that had them"""
+
+    def __init__(self, kube_bench, clusters: List[ClusterTarget], cluster_workers: int = 4,
+                 check_workers: int = 2, targets: Optional[List[str]] = None,
+                 specific_checks: Optional[List[str]] = None, deadline: Optional[float] = None):
+        self.kube_bench = kube_bench
+        self.clusters = clusters
+        self.cluster_workers = max(1, cluster_workers)
+        self.check_workers = max(1, check_workers)
+        self.targets = [target for target in (targets or CLUSTER_SCOPE_TARGETS) if target in CLUSTER_SCOPE_TARGETS]
+        self.specific_checks = specific_checks
+        # Seconds for the whole multi-cluster run (--deadline); clusters started later get what is left
+        self.deadline = deadline
+        self._deadline_at: Optional[float] = None
+        # One shard pool for all clusters instead of one per CPU for each concurrently scanned cluster
+        self.sharder = ShardedEvaluator(kube_bench.parser.config)
+        self.logger = Logger(__name__)
+
+    def check_files(self) -> List[Tuple[str, Dict[str, Any]]]:
+        """(component type, parsed check file) of the cluster-scope targets, loaded once for all clusters"""
+        loaded = []
+        for target in self.targets:
+            check_file = self.kube_bench.TARGET_FILES.get(target)
+            if not check_file or not os.path.exists(check_file):
+                self.logger.warning(f"Check file for {target} not found")
+                continue
+            checks_data = self.kube_bench.parser.load_checks(check_file)
+            if checks_data:
+                loaded.append((checks_data.get('type', target), checks_data))
+        return loaded
+
+    def _config_for(self, cluster: ClusterTarget) -> Dict[str, Any]:
+        config = copy.deepcopy(self.kube_bench.parser.config)
+        kubernetes = config.setdefault('kubernetes', {})
+        if cluster.kubeconfig:
+            kubernetes['kubeconfig'] = cluster.kubeconfig
+        if cluster.context:
+            kubernetes['context'] = cluster.context
+        # Each cluster gets its own pool of API connections, sized to its check workers
+        kubernetes['api_pool_size'] = self.check_workers
+        return config
+
+    def _shell_env(self, cluster: ClusterTarget, context_file: Optional[str]) -> Dict[str, str]:
+        """kubectl fallbacks see only this cluster: KUBECONFIG, with a context override file first"""
+        configured = (self.kube_bench.parser.config.get('kubernetes') or {}).get('kubeconfig')
+        kubeconfig = cluster.kubeconfig or os.path.expanduser(configured or os.environ.get('KUBECONFIG') or '~/.kube/config')
+        paths = [context_file] if context_file else []
+        return dict(os.environ, KUBECONFIG=os.pathsep.join(paths + [kubeconfig]))
+
+    def scan_cluster(self, cluster: ClusterTarget, check_files: List[Tuple[str, Dict[str, Any]]]) -> Dict[str, Any]:
+        start_time = time.time()
+        context_file = None
+        executor = None
+        entry: Dict[str, Any] = dict(cluster.to_dict(), results=[], error=None)
+        try:
+            if cluster.context:
+                # kubectl takes current-context from the first KUBECONFIG file that sets it
+                fd, context_file = tempfile.mkstemp(prefix='kube-bench-context-', suffix='.yaml')
+                with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                    yaml.safe_dump({'apiVersion': 'v1', 'kind': 'Config', 'current-context': cluster.context}, f)
+            executor = CheckExecutor(self._config_for(cluster), shell_env=self._shell_env(cluster, context_file),
+                                     sharder=self.sharder)
+            if self._deadline_at is not None:
+                executor.set_deadline(max(0.0, self._deadline_at - time.monotonic()))
+            executor.begin_scan()
+            with ThreadPoolExecutor(max_workers=self.check_workers) as pool:
+                for component_type, checks_data in check_files:
+                    for group in checks_data.get('groups', []):
+                        group_result = self._scan_group(executor, pool, cluster, component_type, group)
+                        if group_result['checks']:
+                            entry['results'].append(group_result)
+            executor.end_scan()
+        except Exception as e:
+            self.logger.error(f"Cluster {cluster.name} failed: {e}")
+            entry['error'] = str(e)
+        finally:
+            if executor is not None:
+                executor.cleanup()
+            if context_file:
+                os.unlink(context_file)
+        entry['execution_time'] = time.time() - start_time
+        entry['summary'] = self._summary(entry['results'])
+        return entry
+
+    def _scan_group(self, executor: CheckExecutor, pool: ThreadPoolExecutor, cluster: ClusterTarget,
+                    component_type: str, group: Dict[str, Any]) -> Dict[str, Any]:
+        group_start = time.time()
+        checks = [self.kube_bench.parser.parse_check(check) for check in group.get('checks', [])
+                  if not self.specific_checks or str(check.get('id')).strip() in self.specific_checks]
+
+        def run(parsed_check: Dict[str, Any]) -> Dict[str, Any]:
+            try:
+                return executor.execute_check(parsed_check, component_type)
+            except Exception as e:
+                self.logger.error(f"Check {parsed_check.get('id')} failed on {cluster.name}: {e}")
+                return {
+                    'id': parsed_check.get('id'),
+                    'text': parsed_check.get('text', 'No description'),
+                    'passed': False,
+                    'scored': parsed_check.get('scored', True),
+                    'type': parsed_check.get('type', 'automated'),
+                    'error': str(e),
+                    'test_results': [],
+                    'remediation': parsed_check.get('remediation')
+                }
+
+        results = list(pool.map(run, checks))
+        return {
+            'group_id': group.get('id'),
+            'group_text': group.get('text', 'Unknown Group'),
+            'checks': results,
+            'component_type': component_type,
+            'group_execution_time': time.time() - group_start,
+            'group_stats': self.kube_bench._calculate_group_stats(results)
+        }
+
+    def _summary(self, groups: List[Dict[str, Any]]) -> Dict[str, int]:
+        counts = {'PASS': 0, 'FAIL': 0, 'WARN': 0, 'INFO': 0, 'TIMEOUT': 0}
+        for group in groups:
+            for result in group['checks']:
+                status = self.kube_bench._get_check_status(result)
+                counts[status] = counts.get(status, 0) + 1
+        return counts
+
+    def run(self) -> Dict[str, Dict[str, Any]]:
+        """Results keyed by cluster name, in the order the clusters were given"""
+        check_files = self.check_files()
+        self.logger.info(f"Scanning {len(self.clusters)} clusters, {self.cluster_workers} at a time "
+                         f"({self.check_workers} checks per cluster)")
+        self._deadline_at = time.monotonic() + self.deadline if self.deadline is not None else None
+        try:
+            with ThreadPoolExecutor(max_workers=self.cluster_workers) as pool:
+                entries = list(pool.map(lambda cluster: self.scan_cluster(cluster, check_files), self.clusters))
+        finally:
+            self.sharder.close()
+        return {cluster.name: entry for cluster, entry in zip(self.clusters, entries)}
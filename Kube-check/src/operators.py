@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+Compiled test operators for kube-bench-python
+Each compare: block is turned once into a predicate with a pre-typed expected value
+"""
+
+import re
+import threading
+from typing import Dict, Any, Callable, Optional, Tuple
+from utils import Logger
+
+logger = Logger(__name__)
+
+# (op, value type, value) -> Comparison, shared by identical compare: blocks
+_COMPILED: Dict[Tuple[str, str, str], 'Comparison'] = {}
+_COMPILED_LOCK = threading.Lock()
+
+
+def _permission(value: str) -> int:
+    """Octal digits as in stat -c %a, otherwise a plain integer"""
+    return int(value, 8) if value.isdigit() else int(value)
+
+
+def _number(actual: str, expected: Optional[float], test: Callable[[float, float], bool]) -> bool:
+    if expected is None:
+        return False
+    try:
+        return test(float(actual), expected)
+    except ValueError:
+        return False
+
+
+def _bitmask(actual: str, expected: Optional[int]) -> bool:
+    if expected is None:
+        return False
+    try:
+        return (_permission(actual) & 0o777) <= expected
+    except ValueError:
+        return False
+
+
+# op -> (convert the expected text once, test(actual, converted expected))
+OPERATORS: Dict[str, Tuple[Callable[[str], Any], Callable[[str, Any], bool]]] = {
+    'eq': (str.lower, lambda actual, expected: actual.lower() == expected),
+    'noteq': (str.lower, lambda actual, expected: actual.lower() != expected),
+    'has': (str, lambda actual, expected: expected in actual),
+    'nothave': (str, lambda actual, expected: expected not in actual),
+    'gte': (float, lambda actual, expected: _number(actual, expected, float.__ge__)),
+    'lte': (float, lambda actual, expected: _number(actual, expected, float.__le__)),
+    'gt': (float, lambda actual, expected: _number(actual, expected, float.__gt__)),
+    'lt': (float, lambda actual, expected: _number(actual, expected, float.__lt__)),
+    'bitmask': (_permission, _bitmask),
+    'valid_elements': (lambda text: frozenset(part.strip() for part in text.split(',')),
+                       lambda actual, expected: actual in expected),
+    'regex': (re.compile, lambda actual, expected: expected is not None and expected.search(actual) is not None)
+}
+
+
+class Comparison:
+    """Predicate of one compare: block; call it with the flag value found in the audit output"""
+
+    __slots__ = ('op', 'value', 'expected', 'policies_expected', '_test')
+
+    def __init__(self, op: str, value: Any):
+        self.op = op
+        self.value = value
+        convert, self._test = OPERATORS.get(op, (str, None))
+        if self._test is None:
+            logger.warning(f"Unknown comparison operator: {op}")
+        text = str(value).strip()
+        self.expected = self._convert(convert, text)
+        # Policies compare booleans as true/false (YAML true would otherwise read as 'True')
+        self.policies_expected = self._convert(convert, ('true' if value else 'false')) \
+            if isinstance(value, bool) else self.expected
+
+    def _convert(self, convert: Callable[[str], Any], text: str) -> Any:
+        try:
+            return convert(text)
+        except (ValueError, re.error) as e:
+            logger.warning(f"Invalid value for comparison operator {self.op}: {text!r} ({e})")
+            return None
+
+    def __call__(self, actual: Any, policies: bool = False) -> bool:
+        if self._test is None:
+            return False
+        actual = str(actual).strip()
+        if policies:
+            # kubectl auth can-i answers yes/no
+            lowered = actual.lower()
+            if lowered == 'no':
+                actual = 'false'
+            elif lowered == 'yes':
+                actual = 'true'
+            return self._test(actual, self.policies_expected)
+        return self._test(actual, self.expected)
+
+    def __reduce__(self):
+        # Rebuilt from op/value so checks stay picklable for the shard workers
+        return compile_comparison, (self.op, self.value)
+
+
+def compile_comparison(op: str, value: Any) -> Comparison:
+    """Compiled predicate of a compare: block, shared by identical blocks"""
+    key = (op, type(value).__name__, str(value))
+    comparison = _COMPILED.get(key)
+    if comparison is None:
+        with _COMPILED_LOCK:
+            comparison = _COMPILED.get(key)
+            if comparison is None:
+                comparison = _COMPILED[key] = Comparison(op, value)
+    return comparison
@@ -9,7 +9,8 @@ import os
 import re
 from pathlib import Path
 from typing import Dict, List, Any, Optional, Tuple
-from utils import Logger, validate_yaml_structure
+from utils import Logger, validate_yaml_structure, yaml_load
+from operators import OPERATORS, compile_comparison
 
 class YAMLParser:
     """Enhanced YAML parser supporting full kube-bench structure"""
@@ -28,7 +29,7 @@ class YAMLParser:
         
         try:
             with open(self.config_path, 'r', encoding='utf-8') as file:
-                config = yaml.safe_load(file)
+                config = yaml_load(file)
                 
             if not config:
                 self.logger.warning(f"Empty configuration file: {self.config_path}")
@@ -85,7 +86,7 @@ class YAMLParser:
         
         try:
             with open(check_path, 'r', encoding='utf-8') as file:
-                checks = yaml.safe_load(file)
+                checks = yaml_load(file)
             
             if not checks:
                 self.logger.warning(f"Empty checks file: {check_path}")
@@ -237,8 +238,7 @@ class YAMLParser:
                 return False, f"Compare in test item {item_idx} of check {check_id} must have 'op' and 'value'"
             
             # Validate comparison operator
-            valid_ops = ['eq', 'noteq', 'has', 'nothave', 'gte', 'lte', 'gt', 'lt', 'bitmask', 'regex', 'valid_elements']
-            if compare['op'] not in valid_ops:
+            if compare['op'] not in OPERATORS:
                 return False, f"Invalid comparison operator in check {check_id}: {compare['op']}"
         
         return True, "Valid test item"
@@ -279,12 +279,15 @@ class YAMLParser:
             'audit': check.get('audit'),
             'audit_config': check.get('audit_config'),  # Support for config file checks
             'audit_env': check.get('audit_env'),        # Support for environment variable checks
+            'audit_api': check.get('audit_api'),        # In-process API audit (shell audit is the fallback)
             'tests': check.get('tests', {}),
             'remediation': check.get('remediation', 'No remediation provided'),
             'auto_remediation': check.get('auto_remediation'),  # Support for auto remediation
             'scored': check.get('scored', True),
             'type': check.get('type', 'automated'),
-            'use_multiple_values': check.get('use_multiple_values', False)
+            'use_multiple_values': check.get('use_multiple_values', False),
+            'interval': check.get('interval'),                 # Agent mode scan interval override
+            'timeout': check.get('timeout')                    # Audit timeout override (seconds or 30s/2m)
         }
         
         # Normalize tests structure
@@ -331,6 +334,11 @@ class YAMLParser:
                 # Remove None values
                 normalized_item = {k: v for k, v in normalized_item.items() if v is not None}
                 
+                # Compile the comparison once instead of on every evaluated line
+                compare = normalized_item.get('compare')
+                if isinstance(compare, dict):
+                    normalized_item['comparison'] = compile_comparison(compare.get('op', 'eq'), compare.get('value'))
+                
                 # Ensure at least one check type is present
                 if any(k in normalized_item for k in ['flag', 'path', 'env']):
                     normalized_items.append(normalized_item)
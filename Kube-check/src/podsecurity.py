@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""
+Pod security index for kube-bench-python
+Answers the 5.2.x Pod Security checks in-process from a single pass over the pod list
+"""
+
+import json
+from typing import Dict, List, Any, Iterable, Iterator, Callable, Tuple
+from utils import Logger
+
+
+class PodRecord:
+    """Security attributes of one pod"""
+
+    __slots__ = ('namespace', 'name', 'host_pid', 'host_ipc', 'host_network', 'containers')
+
+    def __init__(self, namespace: str, name: str, spec: Dict[str, Any]):
+        self.namespace = namespace
+        self.name = name
+        self.host_pid = spec.get('hostPID')
+        self.host_ipc = spec.get('hostIPC')
+        self.host_network = spec.get('hostNetwork')
+        self.containers = [ContainerRecord(container) for container in spec.get('containers') or []]
+
+
+class ContainerRecord:
+    """Security attributes of one container (spec.containers only, like the shell audits)"""
+
+    __slots__ = ('name', 'privileged', 'allow_privilege_escalation', 'capabilities_add')
+
+    def __init__(self, container: Dict[str, Any]):
+        context = container.get('securityContext') or {}
+        self.name = container.get('name')
+        self.privileged = context.get('privileged')
+        self.allow_privilege_escalation = context.get('allowPrivilegeEscalation')
+        self.capabilities_add = (context.get('capabilities') or {}).get('add')
+
+
+def _render(value: Any) -> str:
+    """Like jq -r with null mapped to notset"""
+    if value is None:
+        return 'notset'
+    if isinstance(value, bool):
+        return 'true' if value else 'false'
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, separators=(',', ':'))
+    return str(value)
+
+
+def _compliant(passed: bool) -> str:
+    return 'true' if passed else 'false'
+
+
+class PodSecurityIndex:
+    """Per-pod and per-container security records; each 5.2.x check is a filter over them"""
+
+    def __init__(self, pods: Iterable[Dict[str, Any]], exempt_namespaces: Iterable[str] = ()):
+        self.logger = Logger(__name__)
+        self.exempt_namespaces = set(exempt_namespaces or [])
+        self.pods: List[PodRecord] = []
+        for pod in pods:
+            metadata = pod.get('metadata') or {}
+            self.pods.append(PodRecord(metadata.get('namespace'), metadata.get('name'), pod.get('spec') or {}))
+        # query -> (namespace, line) generator taking the pods to report on
+        self.queries: Dict[str, Callable[[List[PodRecord]], Iterator[Tuple[str, str]]]] = {
+            'privileged': self._privileged,
+            'host_pid': lambda pods: self._pod_flag(pods, 'host_pid', 'is_pod_hostpid'),
+            'host_ipc': lambda pods: self._pod_flag(pods, 'host_ipc', 'is_pod_hostipc'),
+            'host_network': lambda pods: self._pod_flag(pods, 'host_network', 'is_pod_hostnetwork'),
+            'allow_privilege_escalation': self._allow_privilege_escalation,
+            'capabilities_added': self._capabilities_added
+        }
+        self.logger.debug(f"Pod security index: {len(self.pods)} pods")
+
+    def run(self, query: str, exempt_namespaces: Iterable[str] = ()) -> Iterator[Tuple[str, str]]:
+        """(namespace, line) output of one 5.2.x query, skipping pods in exempt namespaces"""
+        handler = self.queries.get(query)
+        if handler is None:
+            raise ValueError(f"Unknown pod_security query: {query}")
+        exempt = self.exempt_namespaces.union(exempt_namespaces or [])
+        pods = [pod for pod in self.pods if pod.namespace not in exempt] if exempt else self.pods
+        return handler(pods)
+
+    @staticmethod
+    def _containers(pods: List[PodRecord]) -> Iterator[Tuple[PodRecord, ContainerRecord]]:
+        for pod in pods:
+            for container in pod.containers:
+                yield pod, container
+
+    @staticmethod
+    def _container_line(pod: PodRecord, container: ContainerRecord, key: str, value: str,
+                        passed: bool) -> Tuple[str, str]:
+        line = (f"***pod_name: {pod.name} container_name: {container.name} pod_namespace: {pod.namespace} "
+                f"{key}: {value} is_compliant: {_compliant(passed)}")
+        return pod.namespace, line
+
+    def _privileged(self, pods: List[PodRecord]) -> Iterator[Tuple[str, str]]:
+        """5.2.2: privileged containers"""
+        for pod, container in self._containers(pods):
+            yield self._container_line(pod, container, 'is_container_privileged', _render(container.privileged),
+                                       container.privileged is not True)
+
+    def _pod_flag(self, pods: List[PodRecord], attribute: str, key: str) -> Iterator[Tuple[str, str]]:
+        """5.2.3-5.2.5: hostPID / hostIPC / hostNetwork; unset counts as false"""
+        for pod in pods:
+            value = getattr(pod, attribute)
+            yield pod.namespace, (f"***pod_name: {pod.name} pod_namespace: {pod.namespace} "
+                                  f"{key}: {_render(bool(value))} is_compliant: {_compliant(value is not True)}")
+
+    def _allow_privilege_escalation(self, pods: List[PodRecord]) -> Iterator[Tuple[str, str]]:
+        """5.2.6: allowPrivilegeEscalation explicitly true"""
+        for pod, container in self._containers(pods):
+            value = container.allow_privilege_escalation
+            yield self._container_line(pod, container, 'is_container_allowprivesc', _render(value),
+                                       value is not True)
+
+    def _capabilities_added(self, pods: List[PodRecord]) -> Iterator[Tuple[str, str]]:
+        """5.2.9: containers with any added capability"""
+        for pod, container in self._containers(pods):
+            added = container.capabilities_add
+            if added:
+                yield self._container_line(pod, container, 'container_caps_add', ','.join(map(str, added)), False)
+            else:
+                yield self._container_line(pod, container, 'container_caps_add', _render(added), True)
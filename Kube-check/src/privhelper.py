@@ -0,0 +1,328 @@
+#!/usr/bin/env python3
+"""
+Privileged helper for kube-bench-python
+One 'sudo -n' per scan: the helper reads files, stats paths and runs approved commands for the
+unprivileged scanner over a pipe, instead of a sudo process for every 'sudo cat' audit or fix
+"""
+
+import argparse
+import grp
+import json
+import os
+import pwd
+import re
+import select
+import shlex
+import signal
+import stat
+import subprocess
+import sys
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from typing import Dict, List, Any, Optional, Tuple
+from utils import Logger
+
+HELPER_PROTOCOL = 1
+# Seconds to wait for the helper's ready line (sudo -n fails at once when a password is needed)
+READY_TIMEOUT = 10
+# Requests handled at the same time by the helper (remediation groups run concurrently)
+HELPER_THREADS = 8
+# Executables run for 'sudo <command>' audits when the config does not list its own
+# (no find: 'find -exec' / '-delete' would make any command approved)
+DEFAULT_ALLOW = ('cat', 'stat', 'ls', 'test', 'grep')
+# 'sudo' audits with shell syntax keep going through the shell
+_SHELL_SYNTAX = re.compile(r'[|&;<>()$`\\\n*?~{}\[\]]')
+
+
+def sudo_argv(command: str) -> Optional[List[str]]:
+    """Arguments after 'sudo [-n]' of a simple command, None for anything else"""
+    if not command.lstrip().startswith('sudo') or _SHELL_SYNTAX.search(command):
+        return None
+    try:
+        parts = shlex.split(command)
+    except ValueError:
+        return None
+    if not parts or parts[0] != 'sudo':
+        return None
+    parts = parts[1:]
+    while parts and parts[0].startswith('-'):
+        if parts[0] not in ('-n', '--non-interactive'):
+            return None  # -u, -E, ...: leave to sudo itself
+        parts = parts[1:]
+    return parts or None
+
+
+def _run(argv: List[str], timeout: float) -> Dict[str, Any]:
+    process = subprocess.Popen(argv, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True,
+                               start_new_session=True)
+    try:
+        stdout, stderr = process.communicate(timeout=timeout)
+    except subprocess.TimeoutExpired:
+        try:
+            os.killpg(process.pid, signal.SIGKILL)
+        except OSError:
+            pass
+        process.communicate()
+        return {'ok': False, 'timeout': True}
+    return {'ok': True, 'returncode': process.returncode, 'stdout': stdout, 'stderr': stderr}
+
+
+def _stat(path: str) -> Dict[str, Any]:
+    st = os.stat(path)
+    try:
+        user = pwd.getpwuid(st.st_uid).pw_name
+    except KeyError:
+        user = str(st.st_uid)
+    try:
+        group = grp.getgrgid(st.st_gid).gr_name
+    except KeyError:
+        group = str(st.st_gid)
+    # mode as in stat -c %a
+    return {'ok': True, 'mode': format(stat.S_IMODE(st.st_mode), 'o'), 'uid': st.st_uid, 'gid': st.st_gid,
+            'user': user, 'group': group, 'size': st.st_size}
+
+
+def handle(request: Dict[str, Any], allow: Tuple[str, ...], scripts: bool) -> Dict[str, Any]:
+    """Answer one request; shared by the helper process and the in-process (root) path"""
+    op = request.get('op')
+    try:
+        if op == 'read':
+            with open(request['path'], 'r', encoding='utf-8', errors='replace') as f:
+                return {'ok': True, 'content': f.read()}
+        if op == 'stat':
+            return _stat(request['path'])
+        if op == 'run':
+            argv = request.get('argv') or []
+            if not argv or os.path.basename(argv[0]) not in allow:
+                return {'ok': False, 'error': f"command not approved: {argv[0] if argv else ''}"}
+            return _run(argv, request.get('timeout', 60))
+        if op == 'script':
+            if not scripts:
+                return {'ok': False, 'error': 'scripts are not approved'}
+            return _run(['sh', '-c', request.get('script', '')], request.get('timeout', 60))
+        return {'ok': False, 'error': f"unknown request: {op}"}
+    except OSError as e:
+        return {'ok': False, 'errno': e.errno, 'error': e.strerror or str(e)}
+
+
+def serve(allow: Tuple[str, ...], scripts: bool) -> int:
+    """Helper side: JSON requests on stdin, JSON answers (matched by id) on stdout"""
+    out = sys.stdout
+    write_lock = threading.Lock()
+
+    def answer(request: Dict[str, Any]):
+        response = handle(request, allow, scripts)
+        response['id'] = request.get('id')
+        with write_lock:
+            out.write(json.dumps(response) + '\n')
+            out.flush()
+
+    out.write(json.dumps({'ready': True, 'protocol': HELPER_PROTOCOL, 'pid': os.getpid()}) + '\n')
+    out.flush()
+    with ThreadPoolExecutor(max_workers=HELPER_THREADS) as pool:
+        for line in sys.stdin:
+            try:
+                request = json.loads(line)
+            except ValueError:
+                continue
+            pool.submit(answer, request)
+    return 0
+
+
+class PrivilegedHelper:
+    """Scanner side: starts the helper on first use and sends it requests until close()"""
+
+    def __init__(self, config_data: Optional[Dict[str, Any]] = None):
+        settings = (config_data or {}).get('privileged_helper') or {}
+        self.enabled = settings.get('enabled', True)
+        self.allow = tuple(settings.get('allow') or DEFAULT_ALLOW)
+        # Fix scripts need 'remediation: true' and are only accepted after enable_scripts()
+        self.remediation = bool(settings.get('remediation', False))
+        self.scripts = False
+        self.logger = Logger(__name__)
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._process: Optional[subprocess.Popen] = None
+        self._failed = False
+        self._next_id = 0
+        self._pending: Dict[int, Future] = {}
+
+    @property
+    def in_process(self) -> bool:
+        """Already root: answer requests here, without a helper process"""
+        return os.geteuid() == 0
+
+    def available(self) -> bool:
+        """Start the helper if needed; False when disabled or sudo refused it"""
+        if not self.enabled:
+            return False
+        if self.in_process:
+            return True
+        with self._lock:
+            if self._process is not None and self._process.poll() is None:
+                return True
+            if self._failed:
+                return False
+            return self._start()
+
+    def enable_scripts(self) -> bool:
+        """Accept fix scripts from now on, for fixes that will really run (not scans or dry runs)
+
+        A helper already started for the scan has no --scripts and is restarted on the next request.
+        False when 'remediation' is off.
+        """
+        if not self.remediation:
+            return False
+        if not self.scripts:
+            self.close()
+            self.scripts = True
+        return True
+
+    def _start(self) -> bool:
+        argv = ['sudo', '-n', sys.executable, os.path.abspath(__file__), '--serve', '--allow', ','.join(self.allow)]
+        if self.scripts:
+            argv.append('--scripts')
+        try:
+            process = subprocess.Popen(argv, stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                                       stderr=subprocess.DEVNULL, text=True, bufsize=1)
+        except OSError as e:
+            self.logger.warning(f"Privileged helper not started, using sudo per command: {e}")
+            self._failed = True
+            return False
+
+        ready, _, _ = select.select([process.stdout], [], [], READY_TIMEOUT)
+        header = {}
+        if ready:
+            try:
+                header = json.loads(process.stdout.readline() or '{}')
+            except ValueError:
+                pass
+        if not header.get('ready') or header.get('protocol') != HELPER_PROTOCOL:
+            self.logger.warning("Privileged helper not started (sudo -n refused?), using sudo per command")
+            process.kill()
+            process.wait()
+            self._failed = True
+            return False
+
+        self._process = process
+        threading.Thread(target=self._read_answers, args=(process,), daemon=True).start()
+        self.logger.debug(f"Privileged helper started (pid {header.get('pid')})")
+        return True
+
+    def _read_answers(self, process: subprocess.Popen):
+        for line in process.stdout:
+            try:
+                response = json.loads(line)
+            except ValueError:
+                continue
+            with self._write_lock:
+                future = self._pending.pop(response.get('id'), None)
+            if future is not None:
+                future.set_result(response)
+        # Helper gone: fail whatever is still waiting
+        with self._write_lock:
+            pending, self._pending = self._pending, {}
+        for future in pending.values():
+            future.set_exception(OSError("privileged helper exited"))
+
+    def _request(self, request: Dict[str, Any], timeout: float) -> Dict[str, Any]:
+        if self.in_process:
+            return handle(request, self.allow, self.scripts)
+        if not self.available():
+            raise OSError("privileged helper is not available")
+        future: Future = Future()
+        with self._write_lock:
+            self._next_id += 1
+            request['id'] = self._next_id
+            self._pending[request['id']] = future
+            try:
+                self._process.stdin.write(json.dumps(request) + '\n')
+                self._process.stdin.flush()
+            except (OSError, ValueError) as e:
+                self._pending.pop(request['id'], None)
+                raise OSError(f"privileged helper is not available: {e}")
+        try:
+            return future.result(timeout=timeout)
+        except FutureTimeoutError:
+            with self._write_lock:
+                self._pending.pop(request['id'], None)
+            raise OSError("privileged helper did not answer")
+
+    @staticmethod
+    def _raise_for(response: Dict[str, Any], path: str):
+        if not response.get('ok'):
+            raise OSError(response.get('errno') or 0, response.get('error', 'privileged helper error'), path)
+
+    def read_file(self, path: str) -> str:
+        response = self._request({'op': 'read', 'path': path}, READY_TIMEOUT)
+        self._raise_for(response, path)
+        return response['content']
+
+    def stat(self, path: str) -> Dict[str, Any]:
+        """mode (as stat -c %a), uid, gid, user, group and size of a path"""
+        response = self._request({'op': 'stat', 'path': path}, READY_TIMEOUT)
+        self._raise_for(response, path)
+        return response
+
+    def _completed(self, args: Any, response: Dict[str, Any], timeout: float) -> subprocess.CompletedProcess:
+        if response.get('timeout'):
+            raise subprocess.TimeoutExpired(args, timeout)
+        if not response.get('ok'):
+            raise OSError(response.get('error', 'privileged helper error'))
+        return subprocess.CompletedProcess(args, response['returncode'], response['stdout'], response['stderr'])
+
+    def run(self, argv: List[str], timeout: float) -> Optional[subprocess.CompletedProcess]:
+        """Run an approved command; 'cat FILE...' is answered with file reads. None if not approved"""
+        if os.path.basename(argv[0]) == 'cat' and len(argv) > 1 and not any(arg.startswith('-') for arg in argv[1:]):
+            return self._cat(argv, timeout)
+        if os.path.basename(argv[0]) not in self.allow:
+            return None
+        response = self._request({'op': 'run', 'argv': argv, 'timeout': timeout}, timeout + READY_TIMEOUT)
+        return self._completed(argv, response, timeout)
+
+    def _cat(self, argv: List[str], timeout: float) -> subprocess.CompletedProcess:
+        stdout, stderr, returncode = [], [], 0
+        for path in argv[1:]:
+            response = self._request({'op': 'read', 'path': path}, timeout + READY_TIMEOUT)
+            if response.get('ok'):
+                stdout.append(response['content'])
+            else:
+                stderr.append(f"cat: {path}: {response.get('error')}\n")
+                returncode = 1
+        return subprocess.CompletedProcess(argv, returncode, ''.join(stdout), ''.join(stderr))
+
+    def run_script(self, script: str, timeout: float) -> subprocess.CompletedProcess:
+        """Run a remediation script as root (needs 'remediation: true' and enable_scripts())"""
+        response = self._request({'op': 'script', 'script': script, 'timeout': timeout}, timeout + READY_TIMEOUT)
+        return self._completed(['sh', '-c', script], response, timeout)
+
+    def close(self):
+        """Stop the helper; the next request starts a new one"""
+        with self._lock:
+            process, self._process = self._process, None
+            self._failed = False
+        if process is None:
+            return
+        try:
+            process.stdin.close()
+            process.wait(timeout=5)
+        except (OSError, subprocess.TimeoutExpired):
+            process.kill()
+            process.wait()
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description='kube-bench-python privileged helper (started by the scanner)')
+    parser.add_argument('--serve', action='store_true', help='Answer requests on stdin/stdout')
+    parser.add_argument('--allow', default=','.join(DEFAULT_ALLOW), help='Comma-separated executables to run')
+    parser.add_argument('--scripts', action='store_true', help='Also run remediation shell scripts')
+    args = parser.parse_args()
+    if not args.serve:
+        parser.print_help()
+        return 2
+    allow = tuple(name.strip() for name in args.allow.split(',') if name.strip())
+    return serve(allow, args.scripts)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
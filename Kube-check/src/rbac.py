@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+"""
+RBAC index for kube-bench-python
+Answers the 5.1.x RBAC questions in-process from a single fetch of roles and bindings
+"""
+
+import json
+from typing import Dict, List, Any, Optional, Tuple, Iterable, Iterator
+from utils import Logger
+
+RBAC_API = 'rbac.authorization.k8s.io/v1'
+RBAC_RESOURCES = ('roles', 'clusterroles', 'rolebindings', 'clusterrolebindings')
+ANONYMOUS_USER = 'system:anonymous'
+SERVICE_ACCOUNT_PREFIX = 'system:serviceaccount:'
+
+
+class RBACIndex:
+    """Subjects -> bindings -> rules, built once from the four RBAC lists"""
+
+    def __init__(self, roles: Iterable[Dict[str, Any]], cluster_roles: Iterable[Dict[str, Any]],
+                 role_bindings: Iterable[Dict[str, Any]], cluster_role_bindings: Iterable[Dict[str, Any]]):
+        self.logger = Logger(__name__)
+        self.roles: Dict[Tuple[str, str], Dict[str, Any]] = {}
+        self.cluster_roles: Dict[str, Dict[str, Any]] = {}
+        self.cluster_role_bindings: List[Dict[str, Any]] = []
+        # ('User' | 'Group', name) -> [(namespace or None for cluster-wide, binding)]
+        self.grants: Dict[Tuple[str, str], List[Tuple[Optional[str], Dict[str, Any]]]] = {}
+
+        for role in roles:
+            metadata = role.get('metadata') or {}
+            self.roles[(metadata.get('namespace'), metadata.get('name'))] = role
+        for cluster_role in cluster_roles:
+            self.cluster_roles[(cluster_role.get('metadata') or {}).get('name')] = cluster_role
+
+        for binding in role_bindings:
+            self._add_binding(binding, (binding.get('metadata') or {}).get('namespace'))
+        for binding in cluster_role_bindings:
+            self.cluster_role_bindings.append(binding)
+            self._add_binding(binding, None)
+
+        self.logger.debug(f"RBAC index: {len(self.roles)} roles, {len(self.cluster_roles)} clusterroles, "
+                          f"{len(self.grants)} subjects")
+
+    @classmethod
+    def fetch(cls, client, deadline: Optional[float] = None) -> 'RBACIndex':
+        """One paged list per RBAC resource across all namespaces"""
+        lists = [client.list(f"/apis/{RBAC_API}/{resource}", deadline=deadline) for resource in RBAC_RESOURCES]
+        return cls(*lists)
+
+    def _add_binding(self, binding: Dict[str, Any], namespace: Optional[str]):
+        for subject in binding.get('subjects') or []:
+            kind = subject.get('kind')
+            name = subject.get('name')
+            if kind == 'ServiceAccount':
+                # Service accounts authenticate as system:serviceaccount:<namespace>:<name>
+                kind = 'User'
+                name = f"{SERVICE_ACCOUNT_PREFIX}{subject.get('namespace') or namespace}:{name}"
+            if kind in ('User', 'Group'):
+                self.grants.setdefault((kind, name), []).append((namespace, binding))
+
+    def _role_rules(self, binding: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """Rules of the role a binding refers to (empty if the role doesn't exist)"""
+        role_ref = binding.get('roleRef') or {}
+        if role_ref.get('kind') == 'ClusterRole':
+            role = self.cluster_roles.get(role_ref.get('name'))
+        else:
+            role = self.roles.get(((binding.get('metadata') or {}).get('namespace'), role_ref.get('name')))
+        return (role or {}).get('rules') or []
+
+    @staticmethod
+    def subject_groups(user: Optional[str], groups: Iterable[str] = ()) -> List[str]:
+        """Groups the API server adds for a user, as with kubectl --as"""
+        groups = list(groups)
+        if user and user != ANONYMOUS_USER and 'system:authenticated' not in groups:
+            groups.append('system:authenticated')
+        if user and user.startswith(SERVICE_ACCOUNT_PREFIX):
+            namespace = user[len(SERVICE_ACCOUNT_PREFIX):].split(':', 1)[0]
+            groups.extend(['system:serviceaccounts', f"system:serviceaccounts:{namespace}"])
+        return groups
+
+    def rules_for(self, user: Optional[str], groups: Iterable[str] = (),
+                  namespace: Optional[str] = None) -> Iterator[Dict[str, Any]]:
+        """Rules that apply to a subject in a namespace (None: all namespaces, cluster-wide grants only)"""
+        subjects = [('Group', group) for group in self.subject_groups(user, groups)]
+        if user:
+            subjects.insert(0, ('User', user))
+        for subject in subjects:
+            for scope, binding in self.grants.get(subject, []):
+                if scope is None or scope == namespace:
+                    yield from self._role_rules(binding)
+
+    @staticmethod
+    def rule_allows(rule: Dict[str, Any], verb: str, resource: str, group: str = '', subresource: str = '') -> bool:
+        """Match one PolicyRule against a request without a resource name, expanding wildcards"""
+        if rule.get('resourceNames'):
+            return False
+        verbs = rule.get('verbs') or []
+        if '*' not in verbs and verb not in verbs:
+            return False
+        api_groups = rule.get('apiGroups') or []
+        if '*' not in api_groups and group not in api_groups:
+            return False
+        resources = rule.get('resources') or []
+        if subresource:
+            return (f"{resource}/{subresource}" in resources or f"*/{subresource}" in resources
+                    or '*' in resources)
+        return resource in resources or '*' in resources
+
+    def can_i(self, verb: str, resource: str, namespace: Optional[str] = None, group: str = '',
+              subresource: str = '', as_user: Optional[str] = None, as_groups: Iterable[str] = ()) -> bool:
+        """kubectl auth can-i evaluated against the RBAC objects only"""
+        return any(self.rule_allows(rule, verb, resource, group, subresource)
+                   for rule in self.rules_for(as_user, as_groups, namespace))
+
+    def cluster_admin_entries(self) -> Iterator[Tuple[Optional[str], str]]:
+        """5.1.1: (None, line) per clusterrolebinding, non-compliant if it grants cluster-admin"""
+        for binding in self.cluster_role_bindings:
+            name = (binding.get('metadata') or {}).get('name')
+            role_name = (binding.get('roleRef') or {}).get('name')
+            subjects = ','.join(subject.get('name', '') for subject in binding.get('subjects') or []) or '<none>'
+            is_compliant = 'false' if name != 'cluster-admin' and role_name == 'cluster-admin' else 'true'
+            yield None, f"**role_name: {name} role_binding: {role_name} subject: {subjects} is_compliant: {is_compliant}"
+
+    @staticmethod
+    def has_wildcard(rules: List[Dict[str, Any]]) -> bool:
+        """Same condition as the shell audit: some rule field is exactly ["*"]"""
+        return any(value == ['*'] for rule in rules for value in rule.values())
+
+    def wildcard_entries(self) -> Iterator[Tuple[Optional[str], str]]:
+        """5.1.3: (namespace, line) per role and clusterrole with its rules and wildcard compliance"""
+        for (namespace, name), role in self.roles.items():
+            rules = role.get('rules')
+            is_compliant = 'false' if self.has_wildcard(rules or []) else 'true'
+            yield namespace, (f"**role_name: {name} role_namespace: {namespace} role_rules: {self._compact(rules)} "
+                              f"role_is_compliant: {is_compliant}")
+        for name, cluster_role in self.cluster_roles.items():
+            rules = cluster_role.get('rules')
+            is_compliant = 'false' if self.has_wildcard(rules or []) else 'true'
+            yield None, (f"**clusterrole_name: {name} clusterrole_rules: {self._compact(rules)} "
+                         f"clusterrole_is_compliant: {is_compliant}")
+
+    @staticmethod
+    def _compact(rules: Optional[List[Dict[str, Any]]]) -> str:
+        """Like jq -c '.rules'"""
+        return json.dumps(rules, separators=(',', ':'))
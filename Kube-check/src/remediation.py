@@ -0,0 +1,358 @@
+#!/usr/bin/env python3
+"""
+Remediation planner for kube-bench-python
+Groups auto remediations by target file so each file is changed once
+"""
+
+import os
+import re
+import shlex
+import subprocess
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Any, Optional, Tuple, Callable
+from utils import Logger
+from discovery import ComponentDiscovery, ProcessTable, VARIABLE_SUFFIXES
+
+# Service restarts are deferred and run once per group
+RESTART_PATTERN = re.compile(r'^\s*(systemctl\s+(?:daemon-reload|restart\s+\S+))\s*$')
+
+# Absolute host paths used literally in remediation commands
+LITERAL_PATH_PATTERN = re.compile(r'(?<![\w$])(/(?:etc|var|usr|lib)/[^\s"\';|&)]+)')
+
+VARIABLE_PATTERN = re.compile(r'\$([a-z]+)')
+
+# Kubelet restarts static pods when a manifest in these directories changes
+STATIC_POD_DIRS = ('manifests', 'pod-manifests')
+
+RESULT_MARKER = '__KC_RESULT__'
+STAGE_FAILED_MARKER = '__KC_STAGE_FAILED__'
+
+
+def replace_path(command: str, path: str, replacement: str) -> str:
+    """Replace whole occurrences of a path (not /etc/x.conf.bak or /etc/x.conf/y for /etc/x.conf)"""
+    pattern = re.compile(rf'(?<![\w./-]){re.escape(path)}(?![\w./-])')
+    return pattern.sub(lambda _: replacement, command)
+
+
+class RemediationGroup:
+    """Auto remediations that touch the same target file or resource"""
+
+    def __init__(self, target: str, component: Optional[str] = None):
+        self.target = target
+        self.component = component
+        self.fixes: List[Tuple[Dict[str, Any], str]] = []
+        self.post_commands: List[str] = []
+        self.requires_sudo = False
+
+    @property
+    def staged(self) -> bool:
+        """Regular files are edited on a staging copy and renamed into place"""
+        return os.path.isfile(self.target)
+
+    @property
+    def stage_path(self) -> str:
+        # Hidden name so the kubelet never picks the staging copy up as a static pod
+        directory, name = os.path.split(self.target)
+        return os.path.join(directory, f".{name}.kube-check")
+
+    @property
+    def restarts_static_pod(self) -> bool:
+        return os.path.basename(os.path.dirname(self.target)) in STATIC_POD_DIRS
+
+
+class RemediationPlanner:
+    """Plan and apply auto remediations grouped by target file or resource"""
+
+    def __init__(self, discovery: ComponentDiscovery, fix_timeout: int = 30, health_timeout: int = 120,
+                 privileged=None):
+        self.discovery = discovery
+        # Privileged helper (privhelper.py) running sudo fixes without a sudo process per group
+        self.privileged = privileged
+        self.logger = Logger(__name__)
+        self.fix_timeout = fix_timeout
+        self.health_timeout = health_timeout
+
+    def plan(self, checks: List[Dict[str, Any]]) -> List[RemediationGroup]:
+        """Group checks with auto remediation by the file or resource they change"""
+        groups: Dict[str, RemediationGroup] = {}
+
+        for check in checks:
+            auto_remediation = check.get('auto_remediation') or {}
+            raw_command = auto_remediation.get('command')
+            if not raw_command:
+                continue
+
+            command = self.discovery.substitute(raw_command)
+            target, component = self._find_target(raw_command, command)
+            key = target or f"check:{check.get('id')}"
+
+            group = groups.get(key)
+            if group is None:
+                group = groups[key] = RemediationGroup(target or key, component)
+
+            command, restarts = self._split_restarts(command)
+            for restart in restarts:
+                if restart not in group.post_commands:
+                    group.post_commands.append(restart)
+
+            group.fixes.append((check, command))
+            group.requires_sudo = group.requires_sudo or auto_remediation.get('requires_sudo', False)
+
+        return list(groups.values())
+
+    def _find_target(self, raw_command: str, command: str) -> Tuple[Optional[str], Optional[str]]:
+        """Find the file a remediation edits: first path variable, else first literal path"""
+        variables = self.discovery.variables.get('global', {})
+        for name in VARIABLE_PATTERN.findall(raw_command):
+            value = variables.get(f"${name}")
+            if value and value.startswith('/'):
+                return value.rstrip('/') or value, self._component_for_variable(name)
+
+        match = LITERAL_PATH_PATTERN.search(command)
+        if match:
+            path = match.group(1).rstrip('/') or match.group(1)
+            for var, value in variables.items():
+                if value == path:
+                    return path, self._component_for_variable(var.lstrip('$'))
+            return path, None
+
+        return None, None
+
+    def _component_for_variable(self, name: str) -> Optional[str]:
+        """$apiserverconf -> apiserver"""
+        for suffix in sorted(VARIABLE_SUFFIXES.values(), key=len, reverse=True):
+            if name.endswith(suffix) and len(name) > len(suffix):
+                return name[:-len(suffix)]
+        return None
+
+    def _split_restarts(self, command: str) -> Tuple[str, List[str]]:
+        """Replace service restarts with no-ops and return them for a single deferred run"""
+        restarts = []
+        lines = []
+        for line in command.split('\n'):
+            match = RESTART_PATTERN.match(line)
+            if match:
+                restarts.append(match.group(1))
+                # Keep a no-op so if/then blocks stay syntactically valid
+                lines.append(line[:len(line) - len(line.lstrip())] + ':')
+            else:
+                lines.append(line)
+        return '\n'.join(lines), restarts
+
+    def build_script(self, group: RemediationGroup) -> str:
+        """Build one shell script applying every fix of a group with a single commit"""
+        target = shlex.quote(group.target)
+        stage = shlex.quote(group.stage_path)
+        staged = group.staged
+
+        lines = ['KC_APPLIED=0']
+        if staged:
+            lines.append(f"cp -p {target} {stage} || {{ echo '{STAGE_FAILED_MARKER}'; exit 97; }}")
+
+        for check, command in group.fixes:
+            body = replace_path(command, group.target, group.stage_path) if staged else command
+            if staged:
+                lines.append(f"cp -p {stage} {stage}.prev")
+            lines.extend(['(', body, ')', 'KC_RC=$?'])
+            if staged:
+                # Failed fixes are rolled back so they never reach the live file
+                lines.append(f'if [ "$KC_RC" -eq 0 ]; then KC_APPLIED=1; else cp -p {stage}.prev {stage}; fi')
+            else:
+                lines.append('if [ "$KC_RC" -eq 0 ]; then KC_APPLIED=1; fi')
+            lines.append(f'echo "{RESULT_MARKER} {check.get("id")} $KC_RC"')
+
+        if staged:
+            lines.append(f"rm -f {stage}.prev")
+            lines.append(f'if [ "$KC_APPLIED" -eq 1 ]; then mv -f {stage} {target}; else rm -f {stage}; fi')
+
+        if group.post_commands:
+            lines.append('if [ "$KC_APPLIED" -eq 1 ]; then')
+            lines.extend(f"  {restart}" for restart in group.post_commands)
+            lines.append('fi')
+
+        return '\n'.join(lines) + '\n'
+
+    def lanes(self, groups: List[RemediationGroup]) -> List[List[RemediationGroup]]:
+        """Split groups into independent lanes; groups restarting the same component share a lane"""
+        lanes: Dict[str, List[RemediationGroup]] = {}
+        for group in groups:
+            key = group.component or group.target
+            if group.post_commands:
+                # daemon-reload and service restarts are host-wide, keep them serialized
+                key = 'systemd'
+            lanes.setdefault(key, []).append(group)
+        return list(lanes.values())
+
+    def execute_concurrently(self, groups: List[RemediationGroup], dry_run: bool = False, max_workers: int = 4,
+                             on_group_done: Optional[Callable[[RemediationGroup, List[Dict[str, Any]]], None]] = None
+                             ) -> List[Tuple[RemediationGroup, List[Dict[str, Any]]]]:
+        """Execute independent lanes on a bounded pool; returns results in plan order"""
+        def run_lane(lane: List[RemediationGroup]) -> List[Tuple[RemediationGroup, List[Dict[str, Any]]]]:
+            lane_results = []
+            for group in lane:
+                self.logger.info(f"Remediating {group.target}: {len(group.fixes)} fix(es)")
+                group_results = self.execute_group(group, dry_run)
+                if on_group_done:
+                    on_group_done(group, group_results)
+                lane_results.append((group, group_results))
+            return lane_results
+
+        lanes = self.lanes(groups)
+        completed: Dict[int, List[Dict[str, Any]]] = {}
+        with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(lanes) or 1))) as pool:
+            for lane_results in pool.map(run_lane, lanes):
+                for group, group_results in lane_results:
+                    completed[id(group)] = group_results
+
+        return [(group, completed[id(group)]) for group in groups]
+
+    def affected_checks(self, group: RemediationGroup, definitions: Dict[str, Tuple[Dict[str, Any], str]]) -> List[str]:
+        """IDs of checks whose audits read the remediated file or component"""
+        fixed_ids = {str(check.get('id')) for check, _ in group.fixes}
+        affected = []
+        for check_id, (check, component_type) in definitions.items():
+            if check_id in fixed_ids:
+                affected.append(check_id)
+                continue
+
+            audit_text = '\n'.join(str(check.get(key) or '') for key in ('audit', 'audit_config'))
+            if not audit_text.strip():
+                continue
+            if group.component and any(self._component_for_variable(name) == group.component
+                                       for name in VARIABLE_PATTERN.findall(audit_text)):
+                affected.append(check_id)
+            elif group.target.startswith('/') and group.target in self.discovery.substitute(audit_text, component_type):
+                affected.append(check_id)
+        return affected
+
+    def execute_group(self, group: RemediationGroup, dry_run: bool = False) -> List[Dict[str, Any]]:
+        """Run all fixes of a group in one process, then wait once for the component"""
+        if dry_run:
+            return self._dry_run_group(group)
+
+        script = self.build_script(group)
+        cmd = ['sh', '-c', script]
+        use_helper = group.requires_sudo and os.geteuid() != 0 and self.privileged is not None \
+            and self.privileged.scripts and self.privileged.available()
+        if group.requires_sudo and os.geteuid() != 0 and not use_helper:
+            cmd = ['sudo', '-n'] + cmd
+
+        bin_name = self._component_bin(group)
+        old_pids = set(ProcessTable().pids_for(bin_name)) if bin_name else set()
+
+        try:
+            if use_helper:
+                result = self.privileged.run_script(script, timeout=self.fix_timeout * len(group.fixes))
+            else:
+                result = subprocess.run(
+                    cmd,
+                    capture_output=True,
+                    text=True,
+                    timeout=self.fix_timeout * len(group.fixes),
+                    check=False
+                )
+        except subprocess.TimeoutExpired:
+            return [self._fix_result(group, check, command, error='Command execution timed out')
+                    for check, command in group.fixes]
+        except Exception as e:
+            return [self._fix_result(group, check, command, error=f'Command execution failed: {str(e)}')
+                    for check, command in group.fixes]
+
+        return_codes, stdout = self._parse_output(result.stdout)
+        if STAGE_FAILED_MARKER in result.stdout:
+            return [self._fix_result(group, check, command, error=f'Failed to stage {group.target}',
+                                     stderr=result.stderr, return_code=result.returncode)
+                    for check, command in group.fixes]
+
+        applied = any(rc == 0 for rc in return_codes.values())
+        healthy = None
+        if applied and bin_name and (group.restarts_static_pod or group.post_commands):
+            healthy = self._wait_for_component(bin_name, old_pids)
+
+        results = []
+        for check, command in group.fixes:
+            return_code = return_codes.get(str(check.get('id')), result.returncode or 1)
+            results.append(self._fix_result(
+                group, check, command,
+                return_code=return_code,
+                stdout=stdout,
+                stderr=result.stderr,
+                healthy=healthy
+            ))
+        return results
+
+    def _dry_run_group(self, group: RemediationGroup) -> List[Dict[str, Any]]:
+        """Report the planned script without executing anything"""
+        script = self.build_script(group)
+        results = []
+        for check, command in group.fixes:
+            if not (check.get('auto_remediation') or {}).get('dry_run_safe', True):
+                results.append({
+                    'success': False,
+                    'error': 'This remediation is not safe for dry run',
+                    'executed': False
+                })
+                continue
+            results.append(self._fix_result(group, check, command, return_code=0,
+                                            stdout=f"DRY RUN: {script}", dry_run=True))
+        return results
+
+    def _parse_output(self, output: str) -> Tuple[Dict[str, int], str]:
+        """Split result markers from regular script output"""
+        return_codes = {}
+        lines = []
+        for line in output.splitlines():
+            if line.startswith(RESULT_MARKER):
+                parts = line.split()
+                if len(parts) == 3 and parts[2].lstrip('-').isdigit():
+                    return_codes[parts[1]] = int(parts[2])
+                continue
+            lines.append(line)
+        return return_codes, '\n'.join(lines)
+
+    def _component_bin(self, group: RemediationGroup) -> Optional[str]:
+        """Binary to watch after the change (kubelet for service restarts)"""
+        variables = self.discovery.variables.get('global', {})
+        if group.post_commands and not group.restarts_static_pod:
+            return variables.get('$kubeletbin', 'kubelet')
+        if group.component:
+            return variables.get(f"${group.component}bin")
+        return None
+
+    def _wait_for_component(self, bin_name: str, old_pids: set) -> bool:
+        """Wait until the component runs again under a new PID"""
+        deadline = time.time() + self.health_timeout
+        while time.time() < deadline:
+            pids = set(ProcessTable().pids_for(bin_name))
+            if pids and not pids <= old_pids:
+                self.logger.info(f"{bin_name} is running again")
+                return True
+            time.sleep(2)
+        self.logger.warning(f"{bin_name} did not come back within {self.health_timeout}s")
+        return False
+
+    def _fix_result(self, group: RemediationGroup, check: Dict[str, Any], command: str,
+                    return_code: Optional[int] = None, stdout: str = '', stderr: str = '',
+                    error: Optional[str] = None, healthy: Optional[bool] = None,
+                    dry_run: bool = False) -> Dict[str, Any]:
+        """Per-check result: success, command, return code and output, plus the group it ran in"""
+        auto_remediation = check.get('auto_remediation') or {}
+        result = {
+            'success': error is None and return_code == 0,
+            'command': command,
+            'description': auto_remediation.get('description', 'Auto remediation'),
+            'return_code': return_code,
+            'stdout': stdout,
+            'stderr': stderr,
+            'executed': error is None and not dry_run,
+            'dry_run': dry_run,
+            'target': group.target,
+            'group_size': len(group.fixes),
+            'healthy': healthy
+        }
+        if error:
+            result['error'] = error
+        elif not result['success'] and not dry_run:
+            result['error'] = stderr.strip() or f"Command exited with code {return_code}"
+        return result
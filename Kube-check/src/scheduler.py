@@ -0,0 +1,264 @@
+#!/usr/bin/env python3
+"""
+Scan scheduler for kube-bench-python agent mode
+Runs each check (or section) on its own interval with jitter and no overlapping runs
+"""
+
+import heapq
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Any, Optional, Tuple
+from utils import Logger, parse_duration
+from coordination import LEASE_GRACE
+
+DEFAULT_INTERVAL = 3600.0
+DEFAULT_JITTER = 0.1
+DEFAULT_SPLAY = 60.0
+MIN_INTERVAL = 10.0
+
+
+class ScheduledJob:
+    """Checks from one file that share the same interval"""
+
+    def __init__(self, name: str, component_type: str, interval: float):
+        self.name = name
+        self.component_type = component_type
+        self.interval = interval
+        # (parsed_check, group_id, group_text)
+        self.checks: List[Tuple[Dict[str, Any], str, str]] = []
+        self.next_run = 0.0
+        self.in_flight = False
+        self.runs = 0
+        self.skipped = 0
+        self.last_duration: Optional[float] = None
+
+
+class ScanScheduler:
+    """Run scheduled jobs on a bounded pool, skipping runs that would overlap"""
+
+    def __init__(self, kube_bench, schedule_config: Optional[Dict[str, Any]] = None,
+                 output_file: Optional[str] = None, rng: Optional[random.Random] = None,
+                 coordinator=None):
+        self.kube_bench = kube_bench
+        # Elects one agent per interval for cluster-scope jobs (coordination.py); None runs everything here
+        self.coordinator = coordinator
+        self.config = schedule_config or {}
+        self.output_file = output_file
+        self.logger = Logger(__name__)
+        self.rng = rng or random.Random()
+        self.default_interval = parse_duration(self.config.get('default_interval'), DEFAULT_INTERVAL)
+        self.jitter = float(self.config.get('jitter', DEFAULT_JITTER))
+        self.splay = parse_duration(self.config.get('splay'), DEFAULT_SPLAY)
+        self.max_concurrent = int(self.config.get('max_concurrent', 2))
+        self.jobs: List[ScheduledJob] = []
+        self.latest: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+
+    def resolve_interval(self, check: Dict[str, Any], component_type: str) -> float:
+        """Most specific interval wins: check YAML > checks > sections > targets > default"""
+        check_id = str(check.get('id'))
+        candidates = [check.get('interval'), (self.config.get('checks') or {}).get(check_id)]
+
+        # Longest section prefix first: 5.1 before 5
+        sections = self.config.get('sections') or {}
+        parts = check_id.split('.')
+        for length in range(len(parts) - 1, 0, -1):
+            candidates.append(sections.get('.'.join(parts[:length])))
+
+        candidates.append((self.config.get('targets') or {}).get(component_type))
+
+        for candidate in candidates:
+            interval = parse_duration(candidate)
+            if interval is not None:
+                return max(interval, MIN_INTERVAL)
+        return max(self.default_interval, MIN_INTERVAL)
+
+    def add_check_file(self, check_file: str, targets: Optional[List[str]] = None) -> int:
+        """Create jobs for a check file; returns the number of scheduled checks"""
+        checks_data = self.kube_bench.parser.load_checks(check_file)
+        if not checks_data:
+            return 0
+
+        component_type = checks_data.get('type', 'etcd')
+        if targets and component_type not in targets:
+            self.logger.info(f"Skipping {component_type} checks due to targets filter: {targets}")
+            return 0
+
+        jobs: Dict[float, ScheduledJob] = {}
+        count = 0
+        for group in checks_data.get('groups', []):
+            for check in group.get('checks', []):
+                parsed_check = self.kube_bench.parser.parse_check(check)
+                if parsed_check.get('type') == 'manual':
+                    continue
+                interval = self.resolve_interval(parsed_check, component_type)
+                if interval not in jobs:
+                    name = f"{os.path.basename(check_file)}@{int(interval)}s"
+                    jobs[interval] = ScheduledJob(name, component_type, interval)
+                jobs[interval].checks.append((parsed_check, group.get('id'), group.get('text')))
+                count += 1
+
+        self.jobs.extend(jobs.values())
+        return count
+
+    def _initial_delay(self, job: ScheduledJob) -> float:
+        """Random delay so nodes started together don't hit the API server at once"""
+        return self.rng.uniform(0, min(self.splay, job.interval))
+
+    def _next_delay(self, job: ScheduledJob) -> float:
+        """Interval with +/- jitter"""
+        spread = job.interval * self.jitter
+        return max(MIN_INTERVAL, job.interval + self.rng.uniform(-spread, spread))
+
+    def lease_duration(self, job: ScheduledJob) -> float:
+        """Longest gap between two runs of the leader, plus grace"""
+        return job.interval * (1 + self.jitter) + LEASE_GRACE
+
+    def _follow(self, job: ScheduledJob) -> Optional[List[Dict[str, Any]]]:
+        """Published results of a cluster-scope job when another agent holds its lease, else None"""
+        if self.coordinator is None or not self.coordinator.coordinates(job.component_type):
+            return None
+        try:
+            if self.coordinator.acquire(job.name, self.lease_duration(job)):
+                return None
+            published = self.coordinator.fetch(job.name)
+        except Exception as e:
+            self.logger.warning(f"Coordination failed for {job.name}, running it here: {e}")
+            return None
+        if published is None:
+            self.logger.info(f"Job {job.name}: leader has not published results yet")
+            return []
+        results, publisher, published_at = published
+        self.logger.info(f"Job {job.name}: using {len(results)} results published by {publisher}")
+        for result in results:
+            result['published_by'] = publisher
+            result['checked_at'] = result.get('checked_at', published_at)
+        return results
+
+    def run_job(self, job: ScheduledJob) -> List[Dict[str, Any]]:
+        """Execute every check of a job and record the latest results"""
+        start_time = time.time()
+        results = []
+        try:
+            followed = self._follow(job)
+            if followed is not None:
+                results = followed
+                with self._lock:
+                    for result in results:
+                        self.latest[str(result.get('id'))] = result
+                    self._write_results()
+                return results
+            
+            for parsed_check, group_id, group_text in job.checks:
+                if self._stop.is_set():
+                    break
+                try:
+                    result = self.kube_bench.executor.execute_check(parsed_check, job.component_type)
+                except Exception as e:
+                    self.logger.error(f"Check {parsed_check.get('id')} failed in {job.name}: {e}")
+                    continue
+                result['group_id'] = group_id
+                result['group_text'] = group_text
+                result['component_type'] = job.component_type
+                result['checked_at'] = time.time()
+                results.append(result)
+
+            with self._lock:
+                for result in results:
+                    self.latest[str(result.get('id'))] = result
+                self._write_results()
+            if self.coordinator is not None and self.coordinator.coordinates(job.component_type) \
+                    and not self._stop.is_set():
+                try:
+                    self.coordinator.publish(job.name, results)
+                except Exception as e:
+                    self.logger.warning(f"Could not publish results of {job.name}: {e}")
+            self.kube_bench.history.record_results(results)
+            self.kube_bench.history.save()
+        finally:
+            job.last_duration = time.time() - start_time
+            job.runs += 1
+            job.in_flight = False
+            self.logger.info(f"Job {job.name}: {len(results)} checks in {job.last_duration:.1f}s")
+        return results
+
+    def _write_results(self):
+        """Atomically write the latest result of every check, grouped like 'run' output"""
+        if not self.output_file:
+            return
+
+        groups: Dict[str, Dict[str, Any]] = {}
+        for result in self.latest.values():
+            group_id = result.get('group_id')
+            if group_id not in groups:
+                groups[group_id] = {
+                    'group_id': group_id,
+                    'group_text': result.get('group_text'),
+                    'component_type': result.get('component_type'),
+                    'checks': []
+                }
+            groups[group_id]['checks'].append(result)
+
+        report = []
+        for group in groups.values():
+            group['checks'].sort(key=lambda r: [int(p) if p.isdigit() else p for p in str(r.get('id')).split('.')])
+            group['group_stats'] = self.kube_bench._calculate_group_stats(group['checks'])
+            report.append(group)
+
+        # JSON indented as before, or msgpack for .msgpack; compressed if the name ends in .gz or .zst
+        self.kube_bench.save_result_file(self.output_file, report)
+
+    def estimate(self, job: ScheduledJob) -> float:
+        """Estimated duration of a job from check duration history"""
+        return sum(self.kube_bench.history.estimate(check.get('id'), job.component_type)
+                   for check, _, _ in job.checks)
+
+    def run_once(self):
+        """Run every job once, longest first, respecting max_concurrent"""
+        jobs = sorted(self.jobs, key=self.estimate, reverse=True)
+        with ThreadPoolExecutor(max_workers=max(1, self.max_concurrent)) as pool:
+            for job in jobs:
+                job.in_flight = True
+            list(pool.map(self.run_job, jobs))
+
+    def run_forever(self):
+        """Main agent loop: dispatch due jobs until stop() is called"""
+        if not self.jobs:
+            self.logger.warning("No checks scheduled")
+            return
+
+        now = time.monotonic()
+        queue = []
+        for index, job in enumerate(self.jobs):
+            job.next_run = now + self._initial_delay(job)
+            heapq.heappush(queue, (job.next_run, index))
+            self.logger.info(f"Scheduled {job.name}: {len(job.checks)} checks every {int(job.interval)}s")
+
+        with ThreadPoolExecutor(max_workers=max(1, self.max_concurrent)) as pool:
+            while not self._stop.is_set():
+                due_at, index = queue[0]
+                wait = due_at - time.monotonic()
+                if wait > 0:
+                    self._stop.wait(wait)
+                    continue
+
+                heapq.heappop(queue)
+                job = self.jobs[index]
+                if job.in_flight:
+                    # Previous run is still going (or still queued): skip rather than pile up
+                    job.skipped += 1
+                    self.logger.warning(f"Skipping {job.name}: previous run still in flight")
+                else:
+                    job.in_flight = True
+                    pool.submit(self.run_job, job)
+
+                job.next_run = max(due_at, time.monotonic()) + self._next_delay(job)
+                heapq.heappush(queue, (job.next_run, index))
+
+    def stop(self):
+        """Stop dispatching; running checks finish their current command"""
+        self._stop.set()
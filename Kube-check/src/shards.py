@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+"""
+Namespace-sharded evaluation for kube-bench-python
+Folds multi-value audit output into counters, splitting large cluster outputs across processes
+"""
+
+import multiprocessing
+import os
+import threading
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Any, Optional, Iterable, Iterator, Tuple
+from utils import Logger
+
+# Multi-value checks keep at most this many passing (and failing) test results
+MAX_RETAINED_RESULTS = 1000
+DEFAULT_SHARD_SIZE = 5000
+# A single namespace is split once its shard grows past this many times shard_size
+MAX_SHARD_FACTOR = 4
+
+
+class LineTally:
+    """Per-flag counters and retained test results of a multi-value audit"""
+
+    def __init__(self):
+        # flag -> [total, failed]
+        self.flag_counts: Dict[str, List[int]] = {}
+        self.results_count = 0
+        self.passed_count = 0
+        self.line_count = 0
+        self.results: List[Dict[str, Any]] = []
+        self.retained_passed = 0
+        self.retained_failed = 0
+        self.truncated = False
+
+    def add(self, result: Dict[str, Any], line: str):
+        """Count one test result of the current line"""
+        passed = bool(result.get('passed', False))
+        self.results_count += 1
+        self.passed_count += passed
+        counts = self.flag_counts.setdefault(result.get('flag'), [0, 0])
+        counts[0] += 1
+        counts[1] += not passed
+        if self._retain(result, passed, self.line_count):
+            result['line_content'] = line[:100] + '...' if len(line) > 100 else line
+
+    def _retain(self, result: Dict[str, Any], passed: bool, line_number: int) -> bool:
+        if passed and self.retained_passed < MAX_RETAINED_RESULTS:
+            self.retained_passed += 1
+        elif not passed and self.retained_failed < MAX_RETAINED_RESULTS:
+            self.retained_failed += 1
+        else:
+            self.truncated = True
+            return False
+        result['line_number'] = line_number
+        self.results.append(result)
+        return True
+
+    def merge(self, other: 'LineTally'):
+        """Append a later shard; line numbers continue from this tally"""
+        offset = self.line_count
+        for flag, (total, failed) in other.flag_counts.items():
+            counts = self.flag_counts.setdefault(flag, [0, 0])
+            counts[0] += total
+            counts[1] += failed
+        self.results_count += other.results_count
+        self.passed_count += other.passed_count
+        self.line_count += other.line_count
+        self.truncated = self.truncated or other.truncated
+        for result in other.results:
+            self._retain(result, bool(result.get('passed', False)), result['line_number'] + offset)
+
+
+# Evaluator of a pool worker process, created once by the initializer
+_worker_evaluator = None
+
+
+def _init_worker():
+    global _worker_evaluator
+    from evaluator import AuditEvaluator
+    _worker_evaluator = AuditEvaluator()
+
+
+def _tally_shard(check: Dict[str, Any], component_type: str, lines: List[str]) -> LineTally:
+    return _worker_evaluator.tally_lines(check, lines, component_type)
+
+
+def _pool_context():
+    """forkserver (else spawn) workers: the pool is started from scan threads, and a fork
+    there could copy locks held by other threads"""
+    methods = multiprocessing.get_all_start_methods()
+    return multiprocessing.get_context('forkserver' if 'forkserver' in methods else 'spawn')
+
+
+class ShardedEvaluator:
+    """Evaluate (namespace, line) audit entries in namespace shards on a process pool"""
+
+    def __init__(self, config_data: Dict[str, Any]):
+        kubernetes = (config_data or {}).get('kubernetes') or {}
+        self.workers = int(kubernetes.get('shard_workers') or os.cpu_count() or 1)
+        self.shard_size = max(1, int(kubernetes.get('shard_size') or DEFAULT_SHARD_SIZE))
+        self.logger = Logger(__name__)
+        # Chosen once, before any scan thread runs; workers are started lazily
+        self._context = _pool_context() if self.enabled else None
+        self._pool: Optional[ProcessPoolExecutor] = None
+        # Multi-cluster scans share one evaluator (and pool) between their cluster threads
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.workers > 1
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(max_workers=self.workers, mp_context=self._context,
+                                                 initializer=_init_worker)
+            return self._pool
+
+    def shards(self, entries: Iterable[Tuple[Optional[str], str]]) -> Iterator[List[str]]:
+        """Consecutive lines cut at namespace boundaries once a shard reaches shard_size
+
+        Cluster lists arrive ordered by namespace, so each namespace lands in one shard
+        unless it alone exceeds MAX_SHARD_FACTOR * shard_size.
+        """
+        shard: List[str] = []
+        current = None
+        for namespace, line in entries:
+            if shard and ((namespace != current and len(shard) >= self.shard_size)
+                          or len(shard) >= self.shard_size * MAX_SHARD_FACTOR):
+                yield shard
+                shard = []
+            current = namespace
+            shard.append(line)
+        if shard:
+            yield shard
+
+    def tally(self, executor, check: Dict[str, Any], component_type: str,
+              entries: Iterable[Tuple[Optional[str], str]]) -> LineTally:
+        """Tally audit entries; outputs of a single shard are evaluated in-process"""
+        shards = self.shards(entries)
+        first = next(shards, None)
+        second = next(shards, None)
+        if second is None:
+            return executor.tally_lines(check, first or [], component_type)
+
+        pool = self._get_pool()
+        total = LineTally()
+        pending = deque()
+        count = 0
+        try:
+            for shard in (first, second):
+                pending.append(pool.submit(_tally_shard, check, component_type, shard))
+            for shard in shards:
+                # Bound in-flight shards so memory stays flat while the stream is read
+                while len(pending) >= self.workers * 2:
+                    total.merge(pending.popleft().result())
+                    count += 1
+                pending.append(pool.submit(_tally_shard, check, component_type, shard))
+            while pending:
+                total.merge(pending.popleft().result())
+                count += 1
+        finally:
+            for future in pending:
+                future.cancel()
+
+        self.logger.debug(f"Check {check.get('id')}: {total.line_count} lines evaluated in {count} shards")
+        return total
+
+    def close(self):
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(cancel_futures=True)
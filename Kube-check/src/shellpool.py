@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+"""
+Persistent bash workers for kube-bench-python
+Multi-line audits are sent to long-lived bash coprocesses between unique delimiters, so fork/exec
+and shell start-up are paid once per worker instead of once per check
+"""
+
+import os
+import queue
+import select
+import signal
+import subprocess
+import tempfile
+import threading
+import time
+import uuid
+from typing import Dict, List, Any, Optional
+from utils import Logger
+
+DEFAULT_SHELL_WORKERS = 4
+# Scripts run by one worker before it is replaced with a fresh shell
+DEFAULT_MAX_SCRIPTS = 200
+
+# Read one script up to its delimiter line, run it in a subshell (exit/cd/variables stay inside),
+# then print the delimiter with the exit code after the output
+_WORKER_LOOP = r'''
+while IFS= read -r token; do
+  script=
+  while IFS= read -r line && [ "$line" != "$token" ]; do
+    script+="$line"$'\n'
+  done
+  ( eval "$script" ) </dev/null 2>"$KB_STDERR"
+  printf '\n%s %d\n' "$token" "$?"
+done
+'''
+
+
+class ShellWorker:
+    """One bash coprocess running scripts one at a time"""
+
+    def __init__(self, executable: str = '/bin/bash', env: Optional[Dict[str, str]] = None):
+        fd, self.stderr_path = tempfile.mkstemp(prefix='kube-bench-shell-', suffix='.err')
+        os.close(fd)
+        env = dict(env if env is not None else os.environ, KB_STDERR=self.stderr_path)
+        self.process = subprocess.Popen([executable, '-c', _WORKER_LOOP], stdin=subprocess.PIPE,
+                                        stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, env=env,
+                                        start_new_session=True)
+        self.scripts = 0
+
+    @property
+    def alive(self) -> bool:
+        return self.process.poll() is None
+
+    def run(self, script: str, timeout: float) -> subprocess.CompletedProcess:
+        """Output and exit code of one script; the worker is killed on timeout or broken pipes"""
+        token = f"__KUBE_BENCH_{uuid.uuid4().hex}__"
+        marker = f"\n{token} ".encode()
+        self.scripts += 1
+        try:
+            self.process.stdin.write(f"{token}\n{script}\n{token}\n".encode())
+            self.process.stdin.flush()
+        except OSError:
+            self.kill()
+            raise
+
+        fd = self.process.stdout.fileno()
+        deadline = time.monotonic() + timeout
+        buffer = bytearray()
+        while True:
+            end = buffer.find(marker)
+            if end >= 0 and buffer.find(b'\n', end + len(marker)) >= 0:
+                break
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                self.kill()
+                raise subprocess.TimeoutExpired(script, timeout)
+            ready, _, _ = select.select([fd], [], [], remaining)
+            if not ready:
+                continue
+            chunk = os.read(fd, 65536)
+            if not chunk:
+                self.kill()
+                raise OSError("shell worker exited")
+            buffer.extend(chunk)
+
+        status = buffer[end + len(marker):buffer.index(b'\n', end + len(marker))]
+        stdout = buffer[:end].decode('utf-8', errors='replace')
+        with open(self.stderr_path, 'r', encoding='utf-8', errors='replace') as f:
+            stderr = f.read()
+        return subprocess.CompletedProcess(script, int(status), stdout, stderr)
+
+    def kill(self):
+        """Kill the shell and anything its scripts left running"""
+        try:
+            os.killpg(self.process.pid, signal.SIGKILL)
+        except OSError:
+            pass
+        self.process.wait()
+        for stream in (self.process.stdin, self.process.stdout):
+            try:
+                stream.close()
+            except OSError:
+                pass
+        try:
+            os.unlink(self.stderr_path)
+        except OSError:
+            pass
+
+
+class ShellPool:
+    """Up to 'workers' bash coprocesses shared by the audit threads; broken workers are replaced"""
+
+    def __init__(self, config_data: Optional[Dict[str, Any]] = None, env: Optional[Dict[str, str]] = None):
+        settings = (config_data or {}).get('shell_pool') or {}
+        # Environment the workers start with (None: this process's)
+        self.env = env
+        self.enabled = settings.get('enabled', True)
+        self.size = max(1, int(settings.get('workers') or DEFAULT_SHELL_WORKERS))
+        self.max_scripts = max(1, int(settings.get('max_scripts') or DEFAULT_MAX_SCRIPTS))
+        self.logger = Logger(__name__)
+        self._idle: 'queue.LifoQueue[ShellWorker]' = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(self.size)
+        self._lock = threading.Lock()
+        self._workers: List[ShellWorker] = []
+
+    def run(self, script: str, timeout: float, executable: str = '/bin/bash') -> subprocess.CompletedProcess:
+        """Run a script on an idle worker (started on demand); raises subprocess.TimeoutExpired"""
+        if not self._slots.acquire(timeout=timeout):
+            raise subprocess.TimeoutExpired(script, timeout)
+        worker = None
+        try:
+            worker = self._checkout(executable)
+            return worker.run(script, timeout)
+        finally:
+            if worker is not None:
+                self._checkin(worker)
+            self._slots.release()
+
+    def _checkout(self, executable: str) -> ShellWorker:
+        while True:
+            try:
+                worker = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            if worker.alive:
+                return worker
+            self._discard(worker)
+        worker = ShellWorker(executable, self.env)
+        with self._lock:
+            self._workers.append(worker)
+        return worker
+
+    def _checkin(self, worker: ShellWorker):
+        if worker.alive and worker.scripts < self.max_scripts:
+            self._idle.put(worker)
+        else:
+            self._discard(worker)
+
+    def _discard(self, worker: ShellWorker):
+        worker.kill()
+        with self._lock:
+            if worker in self._workers:
+                self._workers.remove(worker)
+
+    def close(self):
+        """Stop all workers; the next script starts new ones"""
+        with self._lock:
+            workers, self._workers = self._workers, []
+        for worker in workers:
+            worker.kill()
+        while True:
+            try:
+                self._idle.get_nowait()
+            except queue.Empty:
+                break
@@ -0,0 +1,205 @@
+#!/usr/bin/env python3
+"""
+Host/cluster snapshots for kube-bench-python
+Records every input a scan reads (processes, files, audit commands, API objects) into one
+gzip-compressed JSON archive, and serves them back so a scan can be replayed offline
+"""
+
+import json
+import socket
+import threading
+import time
+from typing import Dict, List, Any, Optional, Iterator, Tuple
+from utils import Logger, load_json_file, save_json_file
+from kubeapi import APIError
+
+SNAPSHOT_VERSION = 1
+
+
+def _list_key(path: str, params: Optional[Dict[str, Any]] = None) -> str:
+    """Stable key of a list request: path plus its non-empty selectors"""
+    query = '&'.join(f"{key}={value}" for key, value in sorted((params or {}).items())
+                     if value is not None and key not in ('limit', 'continue'))
+    return f"{path}?{query}" if query else path
+
+
+class Snapshot:
+    """Inputs of one scan; recording while capturing, read-only when replaying"""
+
+    def __init__(self, data: Optional[Dict[str, Any]] = None, replay: bool = False):
+        self.replay = replay
+        self.logger = Logger(__name__)
+        self._lock = threading.Lock()
+        self.data = data or {
+            'version': SNAPSHOT_VERSION,
+            'hostname': socket.gethostname(),
+            'captured_at': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+            'targets': [],
+            'processes': [],
+            'files': {},
+            'commands': {},
+            'api': {'lists': {}, 'access': {}}
+        }
+
+    @classmethod
+    def load(cls, path: str) -> 'Snapshot':
+        """Open a snapshot archive for replay"""
+        data = load_json_file(path)
+        if data.get('version') != SNAPSHOT_VERSION:
+            raise ValueError(f"Unsupported snapshot version {data.get('version')} in {path}")
+        return cls(data, replay=True)
+
+    def save(self, path: str):
+        """Atomically write the snapshot archive (compressed if the name ends in .gz or .zst)"""
+        with self._lock:
+            # Host config files and cluster objects: readable by the owner only
+            save_json_file(path, self.data, mode=0o600)
+
+    @property
+    def targets(self) -> List[str]:
+        return list(self.data.get('targets') or [])
+
+    @targets.setter
+    def targets(self, targets: List[str]):
+        self.data['targets'] = list(targets or [])
+
+    def summary(self) -> Dict[str, Any]:
+        """Counts of recorded inputs, for logs and the snapshot command"""
+        api = self.data.get('api') or {}
+        return {
+            'hostname': self.data.get('hostname'),
+            'captured_at': self.data.get('captured_at'),
+            'targets': self.targets,
+            'processes': len(self.data.get('processes') or []),
+            'files': len(self.data.get('files') or {}),
+            'commands': len(self.data.get('commands') or {}),
+            'api_lists': len(api.get('lists') or {}),
+            'api_objects': sum(len(items) for items in (api.get('lists') or {}).values())
+        }
+
+    # Process table
+
+    def record_processes(self, processes: List[Tuple[int, List[str]]]):
+        with self._lock:
+            self.data['processes'] = [[pid, argv] for pid, argv in processes]
+
+    def processes(self) -> List[Tuple[int, List[str]]]:
+        return [(pid, list(argv)) for pid, argv in self.data.get('processes') or []]
+
+    # Files: path -> content, or None if the path was checked and did not exist
+
+    def record_exists(self, path: str, exists: bool):
+        with self._lock:
+            files = self.data['files']
+            if path not in files or (exists and files[path] is None):
+                files[path] = '' if exists else None
+
+    def record_file(self, path: str, content: Optional[str]):
+        with self._lock:
+            self.data['files'][path] = content
+
+    def file_exists(self, path: str) -> bool:
+        return self.data['files'].get(path) is not None
+
+    def file_content(self, path: str) -> Optional[str]:
+        return self.data['files'].get(path)
+
+    # Audit commands: substituted command -> stdout/stderr/returncode
+
+    @staticmethod
+    def command_key(command: str, executable: Optional[str] = None) -> str:
+        return f"{executable}\0{command}" if executable else command
+
+    def record_command(self, command: str, executable: Optional[str], returncode: int,
+                       stdout: str, stderr: str = ''):
+        with self._lock:
+            self.data['commands'][self.command_key(command, executable)] = {
+                'returncode': returncode, 'stdout': stdout, 'stderr': stderr
+            }
+
+    def command(self, command: str, executable: Optional[str] = None) -> Dict[str, Any]:
+        """Recorded output of a command; missing commands look like 'command not found'"""
+        recorded = self.data['commands'].get(self.command_key(command, executable))
+        if recorded is None:
+            self.logger.warning(f"Command not in snapshot, treating as empty: {command[:80]}")
+            return {'returncode': 127, 'stdout': '', 'stderr': 'not captured in snapshot'}
+        return recorded
+
+    # Cluster objects
+
+    def record_list(self, path: str, params: Optional[Dict[str, Any]], items: List[Dict[str, Any]]):
+        with self._lock:
+            self.data['api']['lists'][_list_key(path, params)] = items
+
+    def list_items(self, path: str, params: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+        key = _list_key(path, params)
+        items = self.data['api']['lists'].get(key)
+        if items is None:
+            raise APIError(404, 'NotFound', f"{key} not captured in snapshot")
+        return items
+
+    def record_access(self, key: str, allowed: bool):
+        with self._lock:
+            self.data['api']['access'][key] = allowed
+
+    def access(self, key: str) -> bool:
+        allowed = self.data['api']['access'].get(key)
+        if allowed is None:
+            raise APIError(404, 'NotFound', f"access review {key} not captured in snapshot")
+        return allowed
+
+
+def _access_key(verb: str, resource: str, namespace: Optional[str], group: str, subresource: str,
+                as_user: Optional[str], as_groups: Optional[List[str]]) -> str:
+    return json.dumps([verb, resource, namespace, group, subresource, as_user, sorted(as_groups or [])])
+
+
+class RecordingAPIClient:
+    """Wrap a live KubeAPIClient, recording the lists and access reviews checks use"""
+
+    def __init__(self, client, snapshot: Snapshot):
+        self.client = client
+        self.snapshot = snapshot
+
+    def stream(self, path: str, params: Optional[Dict[str, Any]] = None, **kwargs) -> Iterator[Dict[str, Any]]:
+        items = []
+        for item in self.client.stream(path, params, **kwargs):
+            items.append(item)
+            yield item
+        self.snapshot.record_list(path, params, items)
+
+    def list(self, path: str, params: Optional[Dict[str, Any]] = None, **kwargs) -> List[Dict[str, Any]]:
+        return list(self.stream(path, params, **kwargs))
+
+    def can_i(self, verb: str, resource: str, namespace: Optional[str] = None, group: str = '',
+              subresource: str = '', as_user: Optional[str] = None, as_groups: Optional[List[str]] = None,
+              deadline: Optional[float] = None) -> bool:
+        allowed = self.client.can_i(verb, resource, namespace=namespace, group=group, subresource=subresource,
+                                    as_user=as_user, as_groups=as_groups, deadline=deadline)
+        self.snapshot.record_access(_access_key(verb, resource, namespace, group, subresource, as_user, as_groups),
+                                    allowed)
+        return allowed
+
+    def close(self):
+        self.client.close()
+
+
+class SnapshotAPIClient:
+    """Serve recorded lists and access reviews in place of the API server"""
+
+    def __init__(self, snapshot: Snapshot):
+        self.snapshot = snapshot
+
+    def stream(self, path: str, params: Optional[Dict[str, Any]] = None, **kwargs) -> Iterator[Dict[str, Any]]:
+        return iter(self.snapshot.list_items(path, params))
+
+    def list(self, path: str, params: Optional[Dict[str, Any]] = None, **kwargs) -> List[Dict[str, Any]]:
+        return list(self.snapshot.list_items(path, params))
+
+    def can_i(self, verb: str, resource: str, namespace: Optional[str] = None, group: str = '',
+              subresource: str = '', as_user: Optional[str] = None, as_groups: Optional[List[str]] = None,
+              deadline: Optional[float] = None) -> bool:
+        return self.snapshot.access(_access_key(verb, resource, namespace, group, subresource, as_user, as_groups))
+
+    def close(self):
+        pass
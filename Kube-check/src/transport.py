@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+"""
+Binary result transport for kube-bench-python
+msgpack stream of result groups for agent -> aggregator transfer: check text and remediation
+are referenced by benchmark version and check id, statuses are small integers
+"""
+
+import os
+import socket
+import time
+from typing import Dict, List, Any, Optional, Callable, Iterable, Iterator, Tuple, BinaryIO
+from utils import Logger, open_binary, compression_of
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+TRANSPORT_FORMAT = 'kube-bench-results'
+TRANSPORT_VERSION = 1
+TRANSPORT_SUFFIXES = ('.msgpack', '.mpk')
+
+STATUS_CODES = {'PASS': 0, 'FAIL': 1, 'WARN': 2, 'INFO': 3, 'TIMEOUT': 4}
+STATUS_NAMES = {code: name for name, code in STATUS_CODES.items()}
+TYPE_CODES = {'automated': 0, 'manual': 1, 'error': 2}
+TYPE_NAMES = {code: name for name, code in TYPE_CODES.items()}
+
+# Result fields with their own slot in a check record, or resolved from the check catalog
+_FIXED_FIELDS = ('id', 'passed', 'scored', 'type', 'execution_time', 'status', 'test_results',
+                 'text', 'remediation', 'auto_remediation')
+_TEST_FIELDS = ('flag', 'exists', 'value', 'passed', 'message')
+
+logger = Logger(__name__)
+
+
+def is_transport_file(path: str) -> bool:
+    """results.msgpack, optionally followed by a compression suffix (.gz/.zst)"""
+    if compression_of(path):
+        path = os.path.splitext(path)[0]
+    return os.path.splitext(path)[1].lower() in TRANSPORT_SUFFIXES
+
+
+def _require_msgpack():
+    if msgpack is None:
+        raise ValueError("The msgpack result format needs the 'msgpack' package (pip install msgpack)")
+
+
+class CheckCatalog:
+    """Static metadata of every check of one benchmark version, read from the check YAML files"""
+
+    def __init__(self, benchmark: str):
+        self.benchmark = benchmark
+        # check id -> {'text', 'remediation', 'auto_remediation'}
+        self.checks: Dict[str, Dict[str, Any]] = {}
+        # group id -> group text
+        self.groups: Dict[str, str] = {}
+
+    @classmethod
+    def load(cls, parser, check_files: Iterable[str]) -> 'CheckCatalog':
+        catalog = cls(parser.get_benchmark_info()['cis_version'])
+        for check_file in check_files:
+            if not os.path.exists(check_file):
+                continue
+            for group in (parser.load_checks(check_file) or {}).get('groups', []):
+                catalog.groups[str(group.get('id'))] = group.get('text', 'Unknown Group')
+                for check in group.get('checks', []):
+                    parsed = parser.parse_check(check)
+                    catalog.checks[parsed['id']] = {
+                        'text': parsed['text'],
+                        'remediation': parsed['remediation'],
+                        'auto_remediation': parsed['auto_remediation']
+                    }
+        return catalog
+
+    def check(self, check_id: str) -> Dict[str, Any]:
+        entry = self.checks.get(str(check_id))
+        if entry is None:
+            return {'text': f"Check {check_id} (not in the local {self.benchmark} benchmark files)",
+                    'remediation': None, 'auto_remediation': None}
+        return entry
+
+
+def _encode_check(result: Dict[str, Any], status: str) -> List[Any]:
+    """[id, status, passed, scored, type, execution_time, had remediation, test results, other fields]"""
+    check_type = result.get('type', 'automated')
+    # [flag, exists, value, passed, message, other fields (line_number, path, ...) or None]
+    tests = [[test.get(field) for field in _TEST_FIELDS] +
+             [{key: value for key, value in test.items() if key not in _TEST_FIELDS} or None]
+             for test in result.get('test_results') or []]
+    extra = {key: value for key, value in result.items() if key not in _FIXED_FIELDS}
+    return [
+        str(result.get('id', 'unknown')),
+        STATUS_CODES.get(status, STATUS_CODES['WARN']),
+        result.get('passed'),
+        result.get('scored', True),
+        TYPE_CODES.get(check_type, check_type),
+        result.get('execution_time', 0),
+        bool(result.get('remediation')),
+        tests,
+        extra or None
+    ]
+
+
+def _decode_check(record: List[Any], catalog: CheckCatalog) -> Dict[str, Any]:
+    check_id, status, passed, scored, check_type, execution_time, has_remediation, tests, extra = record
+    static = catalog.check(check_id)
+    result = {
+        'id': check_id,
+        'text': static['text'],
+        'passed': passed,
+        'scored': scored,
+        'test_results': [dict(zip(_TEST_FIELDS, test), **(test[-1] or {})) for test in tests],
+        'remediation': static['remediation'] if has_remediation else None,
+        'execution_time': execution_time,
+        'type': TYPE_NAMES.get(check_type, check_type)
+    }
+    if STATUS_NAMES.get(status) == 'TIMEOUT':
+        result['status'] = 'TIMEOUT'
+    if static['auto_remediation']:
+        result['auto_remediation'] = static['auto_remediation']
+    result.update(extra or {})
+    return result
+
+
+def write_results(stream: BinaryIO, groups: Iterable[Dict[str, Any]], benchmark: str,
+                  status_of: Callable[[Dict[str, Any]], str], hostname: Optional[str] = None) -> int:
+    """Header, then one msgpack object per result group; returns the number of groups"""
+    _require_msgpack()
+    packer = msgpack.Packer(use_bin_type=True)
+    stream.write(packer.pack({
+        'format': TRANSPORT_FORMAT,
+        'version': TRANSPORT_VERSION,
+        'benchmark': benchmark,
+        'hostname': hostname or socket.gethostname(),
+        'generated_at': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime())
+    }))
+    count = 0
+    for group in groups:
+        stream.write(packer.pack([
+            str(group.get('group_id', 'Unknown')),
+            group.get('component_type', 'unknown'),
+            group.get('group_execution_time', 0),
+            [_encode_check(check, status_of(check)) for check in group.get('checks', [])]
+        ]))
+        count += 1
+    return count
+
+
+def save_results(path: str, groups: Iterable[Dict[str, Any]], benchmark: str,
+                 status_of: Callable[[Dict[str, Any]], str], hostname: Optional[str] = None) -> int:
+    """Atomically write a msgpack result file (compressed if the name ends in .gz or .zst)"""
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    temp_file = f"{path}.tmp"
+    with open_binary(temp_file, 'wb', compression_of(path)) as f:
+        count = write_results(f, groups, benchmark, status_of, hostname)
+    os.replace(temp_file, path)
+    return count
+
+
+class ResultReader:
+    """Streaming decoder: header on open, then result groups one at a time"""
+
+    def __init__(self, stream: BinaryIO, catalog: CheckCatalog, source: str = '<stream>'):
+        _require_msgpack()
+        self.catalog = catalog
+        self.source = source
+        self._unpacker = msgpack.Unpacker(stream, raw=False, strict_map_key=False)
+        self.header = next(self._unpacker, None) or {}
+        if self.header.get('format') != TRANSPORT_FORMAT or self.header.get('version') != TRANSPORT_VERSION:
+            raise ValueError(f"{source} is not a version {TRANSPORT_VERSION} {TRANSPORT_FORMAT} stream")
+        if self.header.get('benchmark') != catalog.benchmark:
+            logger.warning(f"{source} was produced for {self.header.get('benchmark')}, "
+                           f"check text is taken from the local {catalog.benchmark} files")
+
+    @property
+    def hostname(self) -> str:
+        return self.header.get('hostname') or 'unknown'
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        for group_id, component_type, execution_time, checks in self._unpacker:
+            yield {
+                'group_id': group_id,
+                'group_text': self.catalog.groups.get(group_id, 'Unknown Group'),
+                'checks': [_decode_check(record, self.catalog) for record in checks],
+                'component_type': component_type,
+                'group_execution_time': execution_time
+            }
+
+
+def load_results(path: str, catalog: CheckCatalog) -> Tuple[str, List[Dict[str, Any]]]:
+    """Hostname and result groups of a (possibly compressed) msgpack result file"""
+    with open_binary(path, 'rb') as f:
+        reader = ResultReader(f, catalog, path)
+        return reader.hostname, list(reader)
@@ -4,15 +4,40 @@ Utility functions for kube-bench-python
 File-based approach - no Kubernetes API dependency
 """
 
+import gzip
+import io
+import json
 import os
 import sys
 import logging
 import subprocess
+import threading
 import time
+from functools import lru_cache
 from pathlib import Path
-from typing import Dict, List, Any, Optional
+from typing import Dict, List, Any, Optional, Tuple
+import yaml
 from colorama import Fore, Back, Style, init
 
+# Use the libyaml C loader and emitter when PyYAML was built with them
+try:
+    from yaml import CSafeLoader as FastSafeLoader, CSafeDumper as FastSafeDumper
+except ImportError:
+    from yaml import SafeLoader as FastSafeLoader, SafeDumper as FastSafeDumper
+
+# Optional fast JSON backend and zstd compression; the json module and gzip always work
+try:
+    import orjson
+except ImportError:
+    orjson = None
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# File name suffix -> compression of output and result files
+COMPRESSION_SUFFIXES = {'.gz': 'gzip', '.zst': 'zstd'}
+
 # Initialize colorama for cross-platform colored output
 init(autoreset=True)
 
@@ -96,6 +121,21 @@ def format_duration(seconds: float) -> str:
         remaining_seconds = seconds % 60
         return f"{minutes}m{remaining_seconds:.1f}s"
 
+def parse_duration(value: Any, default: Optional[float] = None) -> Optional[float]:
+    """Parse a duration like 300, '90s', '5m', '1h' or '1d' into seconds"""
+    if value is None or value == '':
+        return default
+    if isinstance(value, (int, float)):
+        return float(value)
+    text = str(value).strip().lower()
+    units = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+    try:
+        if text[-1] in units:
+            return float(text[:-1]) * units[text[-1]]
+        return float(text)
+    except (ValueError, IndexError):
+        return default
+
 def create_progress_bar(current: int, total: int, width: int = 50) -> str:
     """Create a simple progress bar"""
     if total == 0:
@@ -116,6 +156,185 @@ def safe_file_read(file_path: str, encoding: str = 'utf-8') -> Optional[str]:
     except (FileNotFoundError, PermissionError, UnicodeDecodeError):
         return None
 
+def compression_of(path: str) -> Optional[str]:
+    """'gzip' for .gz, 'zstd' for .zst, None for plain files"""
+    return COMPRESSION_SUFFIXES.get(os.path.splitext(path)[1].lower())
+
+def open_binary(path: str, mode: str = 'rb', compression: Optional[str] = 'auto'):
+    """Open a file for binary 'rb' or 'wb', compressed according to its suffix by default"""
+    if compression == 'auto':
+        compression = compression_of(path)
+    if compression == 'gzip':
+        # Level 6: most of the size reduction of 9 at a fraction of the time
+        return gzip.open(path, mode, compresslevel=6) if 'w' in mode else gzip.open(path, mode)
+    if compression == 'zstd':
+        if zstandard is None:
+            raise ValueError(f"{path}: zstd compression needs the 'zstandard' package (pip install zstandard)")
+        raw = open(path, mode)
+        if 'w' in mode:
+            return zstandard.ZstdCompressor().stream_writer(raw, closefd=True)
+        return zstandard.ZstdDecompressor().stream_reader(raw, closefd=True)
+    return open(path, mode)
+
+def open_text(path: str, mode: str = 'r', compression: Optional[str] = 'auto', newline: Optional[str] = None):
+    """Open a UTF-8 text file, compressed according to its suffix by default"""
+    if compression == 'auto':
+        compression = compression_of(path)
+    if not compression:
+        return open(path, mode, encoding='utf-8', newline=newline)
+    return io.TextIOWrapper(open_binary(path, mode + 'b', compression), encoding='utf-8', newline=newline)
+
+def dumps_json(data: Any, compact: bool = True) -> bytes:
+    """Compact JSON via orjson when installed; indented output keeps the json module's format"""
+    if compact:
+        if orjson is not None:
+            try:
+                return orjson.dumps(data, default=str, option=orjson.OPT_NON_STR_KEYS)
+            except TypeError:
+                # e.g. integers beyond 64 bits: let the json module handle them
+                pass
+        return json.dumps(data, separators=(',', ':'), default=str).encode('utf-8')
+    return json.dumps(data, indent=2, default=str).encode('utf-8')
+
+def loads_json(data: bytes) -> Any:
+    return orjson.loads(data) if orjson is not None else json.loads(data)
+
+def load_json_file(path: str) -> Any:
+    """Read a JSON file, decompressing .gz / .zst"""
+    with open_binary(path, 'rb') as f:
+        return loads_json(f.read())
+
+def save_json_file(path: str, data: Any, compact: bool = True, mode: Optional[int] = None):
+    """Atomically write a JSON file, compressed if the name ends in .gz or .zst
+
+    mode (e.g. 0o600) is set on the file before any data is written to it.
+    """
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    temp_file = f"{path}.tmp"
+    if mode is not None:
+        os.close(os.open(temp_file, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, mode))
+        os.chmod(temp_file, mode)
+    with open_binary(temp_file, 'wb', compression_of(path)) as f:
+        f.write(dumps_json(data, compact))
+    os.replace(temp_file, path)
+
+def yaml_load(stream: Any) -> Any:
+    """safe_load equivalent using the C loader when available"""
+    return yaml.load(stream, Loader=FastSafeLoader)
+
+@lru_cache(maxsize=64)
+def parse_yaml_text(text: str) -> Any:
+    """Parse YAML/JSON text once per distinct content (result must not be mutated)"""
+    return yaml_load(text)
+
+class DocumentCache:
+    """Shared file/YAML cache keyed by path, mtime and inode"""
+    
+    def __init__(self):
+        self._documents: Dict[str, Tuple[Tuple[int, int, int], Optional[str], Any, bool]] = {}
+        self._listings: Dict[str, Tuple[int, frozenset]] = {}
+        self._lock = threading.Lock()
+        # Snapshot being captured (records reads) or replayed (serves them instead of the filesystem)
+        self.snapshot = None
+    
+    def _list_dir(self, directory: str) -> Optional[frozenset]:
+        """Directory entries, re-listed only when the directory mtime changes"""
+        try:
+            dir_mtime = os.stat(directory).st_mtime_ns
+        except OSError:
+            return frozenset()
+        
+        with self._lock:
+            cached = self._listings.get(directory)
+            if cached and cached[0] == dir_mtime:
+                return cached[1]
+        
+        try:
+            names = frozenset(os.listdir(directory))
+        except PermissionError:
+            return None  # Not listable, caller falls back to per-path checks
+        except OSError:
+            names = frozenset()
+        
+        with self._lock:
+            self._listings[directory] = (dir_mtime, names)
+        return names
+    
+    def existing(self, paths: List[str]) -> List[str]:
+        """Filter candidate paths to those that exist, one listing per directory"""
+        if self.snapshot is not None and self.snapshot.replay:
+            return [path for path in paths if self.snapshot.file_exists(path)]
+        listings: Dict[str, Optional[frozenset]] = {}
+        found = []
+        for path in paths:
+            directory, name = os.path.split(path)
+            if directory not in listings:
+                listings[directory] = self._list_dir(directory or '.')
+            names = listings[directory]
+            if names is None:
+                if os.path.exists(path):
+                    found.append(path)
+            elif name in names:
+                found.append(path)
+        if self.snapshot is not None:
+            for path in paths:
+                self.snapshot.record_exists(path, path in found)
+        return found
+    
+    def _lookup(self, path: str, parse: bool, privileged=None) -> Tuple[Optional[str], Any]:
+        """Return (content, parsed) for path, re-reading only when the file changed
+
+        privileged: the caller's PrivilegedHelper, used for files the scanner itself may not read.
+        """
+        if self.snapshot is not None and self.snapshot.replay:
+            content = self.snapshot.file_content(path)
+            return content, yaml_load(content) if parse and content else None
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None, None
+        key = (st.st_mtime_ns, st.st_ino, st.st_size)
+        
+        with self._lock:
+            cached = self._documents.get(path)
+        if cached and cached[0] == key and (cached[3] or not parse) \
+                and (cached[1] is not None or privileged is None):
+            return cached[1], cached[2]
+        
+        content = safe_file_read(path)
+        if content is None and privileged is not None and not os.access(path, os.R_OK) \
+                and privileged.available():
+            try:
+                content = privileged.read_file(path)
+            except OSError:
+                content = None
+        if self.snapshot is not None:
+            self.snapshot.record_file(path, content)
+        data = None
+        if parse and content:
+            data = yaml_load(content)
+        
+        with self._lock:
+            self._documents[path] = (key, content, data, parse)
+        return content, data
+    
+    def read(self, path: str, privileged=None) -> Optional[str]:
+        """Read file content through the cache"""
+        return self._lookup(path, parse=False, privileged=privileged)[0]
+    
+    def load_yaml(self, path: str, privileged=None) -> Any:
+        """Read and parse a YAML file through the cache (result must not be mutated)"""
+        return self._lookup(path, parse=True, privileged=privileged)[1]
+    
+    def clear(self):
+        """Drop all cached documents and listings"""
+        with self._lock:
+            self._documents.clear()
+            self._listings.clear()
+
+# Shared by every component (master and etcd scans both read etcd.yaml)
+DOCUMENT_CACHE = DocumentCache()
+
 def parse_key_value_pairs(text: str) -> Dict[str, str]:
     """Parse key=value pairs from text"""
     pairs = {}
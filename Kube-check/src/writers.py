@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+Streaming report writers for kube-bench-python
+text, csv, yaml and table output written group by group instead of as one document
+"""
+
+import csv
+from typing import Dict, List, Any, Callable, Iterable, Iterator, Optional, TextIO
+import yaml
+from tabulate import tabulate
+from utils import FastSafeDumper
+
+CSV_FIELDS = ['section', 'group_id', 'group_text', 'id', 'text', 'status', 'scored', 'type',
+              'execution_time', 'remediation']
+TABLE_HEADERS = ['Status', 'Check', 'Description']
+
+
+def check_rows(groups: Iterable[Dict[str, Any]], status_of: Callable[[Dict[str, Any]], str],
+               include_passed: bool = True, include_manual: bool = True,
+               remediation_of: Optional[Callable[[str], str]] = None) -> Iterator[Dict[str, Any]]:
+    """One flat row per check, filtered like the text report"""
+    remediation_of = remediation_of or (lambda text: ' '.join(text.split()))
+    for group in groups:
+        for check in group.get('checks', []):
+            status = status_of(check)
+            if not include_passed and status == 'PASS':
+                continue
+            if not include_manual and status == 'WARN':
+                continue
+            yield {
+                'section': group.get('component_type', 'unknown'),
+                'group_id': group.get('group_id', 'Unknown'),
+                'group_text': group.get('group_text', 'Unknown Group'),
+                'id': check.get('id', 'unknown'),
+                'text': check.get('text', 'No description'),
+                'status': status,
+                'scored': check.get('scored', True),
+                'type': check.get('type', 'automated'),
+                'execution_time': check.get('execution_time', 0),
+                'remediation': remediation_of(check['remediation'])
+                if status in ('FAIL', 'WARN') and check.get('remediation') else ''
+            }
+
+
+def write_lines(stream: TextIO, lines: Iterable[str]) -> int:
+    """Newline-separated lines written as they are produced; returns the number of lines"""
+    count = 0
+    for line in lines:
+        if count:
+            stream.write('\n')
+        stream.write(line)
+        count += 1
+    return count
+
+
+def write_csv(stream: TextIO, rows: Iterable[Dict[str, Any]], show_remediation: bool = True) -> int:
+    """Header, then one record per row as it is produced; returns the number of rows"""
+    fields = CSV_FIELDS if show_remediation else [field for field in CSV_FIELDS if field != 'remediation']
+    writer = csv.DictWriter(stream, fieldnames=fields, extrasaction='ignore')
+    writer.writeheader()
+    count = 0
+    for row in rows:
+        writer.writerow(row)
+        count += 1
+    return count
+
+
+def write_yaml(stream: TextIO, groups: Iterable[Dict[str, Any]]) -> int:
+    """The result groups as one YAML sequence, emitted one group at a time"""
+    count = 0
+    for group in groups:
+        yaml.dump([group], stream, Dumper=FastSafeDumper, default_flow_style=False, sort_keys=False,
+                  allow_unicode=True)
+        count += 1
+    if not count:
+        stream.write('[]\n')
+    return count
+
+
+def write_table(stream: TextIO, rows: Iterable[Dict[str, Any]]) -> int:
+    """One table per group: column widths only need the rows of the current group"""
+    count = 0
+    current = None
+    table: List[List[Any]] = []
+    for row in rows:
+        key = (row['section'], row['group_id'])
+        if key != current:
+            _flush_table(stream, table)
+            current = key
+            stream.write(f"\n{row['group_id']} {row['group_text']}\n")
+        table.append([row['status'], row['id'], row['text']])
+        count += 1
+    _flush_table(stream, table)
+    return count
+
+
+def _flush_table(stream: TextIO, table: List[List[Any]]):
+    if table:
+        stream.write(tabulate(table, headers=TABLE_HEADERS, tablefmt='simple', maxcolwidths=[None, None, 80]))
+        stream.write('\n')
+        table.clear()
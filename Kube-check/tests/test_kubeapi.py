@@ -0,0 +1,245 @@
+#!/usr/bin/env python3
+"""
+KubeAPIClient against a local stub HTTPS API server
+Pagination, deadlines, keep-alive reuse, bearer token auth, SelfSubjectAccessReview impersonation
+and streamed multi-value audits that break off midway
+"""
+
+import json
+import os
+import shutil
+import ssl
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+from executor import CheckExecutor  # noqa: E402
+from kubeapi import APIError, DeadlineExceeded, KubeAPIClient, KubeConfig  # noqa: E402
+from snapshot import Snapshot  # noqa: E402
+from utils import DOCUMENT_CACHE  # noqa: E402
+
+TOKEN = 'stub-token'
+PODS = [{'metadata': {'name': f"pod-{index}", 'namespace': 'default'}} for index in range(5)]
+
+
+class StubAPIHandler(BaseHTTPRequestHandler):
+    """Serves pods in pages of ?limit and answers access reviews; records every request"""
+
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass
+
+    def _reply(self, status: int, body):
+        data = json.dumps(body).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _record(self, body=None):
+        self.server.requests.append({
+            'method': self.command,
+            'path': self.path,
+            'client': self.client_address,
+            'authorization': self.headers.get('Authorization'),
+            'impersonate_user': self.headers.get_all('Impersonate-User') or [],
+            'impersonate_groups': self.headers.get_all('Impersonate-Group') or [],
+            'body': body
+        })
+
+    def do_GET(self):
+        self._record()
+        if self.headers.get('Authorization') != f"Bearer {TOKEN}":
+            return self._reply(401, {'kind': 'Status', 'message': 'Unauthorized'})
+        parts = urlsplit(self.path)
+        if parts.path == '/api/v1/slow':
+            time.sleep(1)
+            return self._reply(200, {'kind': 'List', 'metadata': {}, 'items': []})
+        if parts.path != '/api/v1/pods':
+            return self._reply(404, {'kind': 'Status', 'message': 'not found'})
+        query = parse_qs(parts.query)
+        # Like a real API server, pages may hold fewer items than the limit asked for
+        limit = min(int(query.get('limit', ['500'])[0]), self.server.max_page)
+        if 'continue' in query and self.server.expire_continue:
+            # Continue tokens expire when the list is compacted in the middle of a read
+            self.server.expire_continue -= 1
+            return self._reply(410, {'kind': 'Status', 'reason': 'Expired', 'message': 'continue token expired'})
+        start = int(query.get('continue', ['0'])[0])
+        end = start + limit
+        metadata = {'continue': str(end)} if end < len(PODS) else {}
+        self._reply(200, {'kind': 'PodList', 'metadata': metadata, 'items': PODS[start:end]})
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))) or b'{}')
+        self._record(body)
+        groups = self.headers.get_all('Impersonate-Group') or []
+        attributes = body['spec']['resourceAttributes']
+        allowed = attributes['resource'] == 'secrets' and 'system:masters' in groups
+        self._reply(201, dict(body, status={'allowed': allowed}))
+
+
+class KubeAPIClientTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        if not shutil.which('openssl'):
+            raise unittest.SkipTest('openssl is needed for the stub server certificate')
+        cls.tmpdir = tempfile.mkdtemp(prefix='kube-bench-test-')
+        cert = os.path.join(cls.tmpdir, 'server.crt')
+        key = os.path.join(cls.tmpdir, 'server.key')
+        subprocess.run(['openssl', 'req', '-x509', '-newkey', 'rsa:2048', '-nodes', '-days', '1',
+                        '-subj', '/CN=127.0.0.1', '-addext', 'subjectAltName=IP:127.0.0.1',
+                        '-keyout', key, '-out', cert], check=True, capture_output=True)
+
+        cls.server = ThreadingHTTPServer(('127.0.0.1', 0), StubAPIHandler)
+        cls.server.requests = []
+        cls.server.expire_continue = 0
+        cls.server.max_page = len(PODS)
+        context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+        context.load_cert_chain(cert, key)
+        cls.server.socket = context.wrap_socket(cls.server.socket, server_side=True)
+        cls.thread = threading.Thread(target=cls.server.serve_forever, daemon=True)
+        cls.thread.start()
+
+        cls.kubeconfig = os.path.join(cls.tmpdir, 'kubeconfig')
+        with open(cls.kubeconfig, 'w', encoding='utf-8') as f:
+            json.dump({
+                'apiVersion': 'v1',
+                'kind': 'Config',
+                'current-context': 'stub',
+                'clusters': [{'name': 'stub', 'cluster': {
+                    'server': f"https://127.0.0.1:{cls.server.server_address[1]}",
+                    'certificate-authority': cert
+                }}],
+                'users': [{'name': 'stub', 'user': {'token': TOKEN}}],
+                'contexts': [{'name': 'stub', 'context': {'cluster': 'stub', 'user': 'stub'}}]
+            }, f)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+        shutil.rmtree(cls.tmpdir, ignore_errors=True)
+
+    def setUp(self):
+        self.server.requests.clear()
+        self.server.expire_continue = 0
+        self.server.max_page = len(PODS)
+        self.client = KubeAPIClient(self.kubeconfig)
+
+    def tearDown(self):
+        self.client.close()
+
+    def test_list_follows_continue_tokens(self):
+        names = [item['metadata']['name'] for item in self.client.list('/api/v1/pods', limit=2)]
+        self.assertEqual(names, [pod['metadata']['name'] for pod in PODS])
+        queries = [parse_qs(urlsplit(request['path']).query) for request in self.server.requests]
+        self.assertEqual([query.get('continue') for query in queries], [None, ['2'], ['4']])
+        self.assertTrue(all(query['limit'] == ['2'] for query in queries))
+
+    def test_connection_is_reused(self):
+        for _ in range(3):
+            self.client.get('/api/v1/pods')
+        self.assertEqual(len({request['client'] for request in self.server.requests}), 1)
+
+    def test_bearer_token_is_sent(self):
+        self.client.get('/api/v1/pods')
+        self.assertEqual(self.server.requests[0]['authorization'], f"Bearer {TOKEN}")
+
+    def test_token_file_is_not_recorded_into_snapshots(self):
+        token_file = os.path.join(self.tmpdir, 'token')
+        with open(token_file, 'w', encoding='utf-8') as f:
+            f.write(TOKEN + '\n')
+        base = KubeConfig.load(self.kubeconfig)
+        client = KubeAPIClient(config=KubeConfig(base.server, base.ssl_context, token_file=token_file))
+        DOCUMENT_CACHE.snapshot = snapshot = Snapshot()
+        try:
+            client.get('/api/v1/pods')
+        finally:
+            DOCUMENT_CACHE.snapshot = None
+            client.close()
+        self.assertEqual(self.server.requests[0]['authorization'], f"Bearer {TOKEN}")
+        self.assertNotIn(token_file, snapshot.data['files'])
+
+    def test_deadline_cuts_off_a_slow_list(self):
+        started = time.monotonic()
+        with self.assertRaises(DeadlineExceeded):
+            list(self.client.list('/api/v1/slow', deadline=started + 0.2))
+        self.assertLess(time.monotonic() - started, 0.9)
+
+    def test_deadline_is_checked_between_pages(self):
+        items = self.client.list('/api/v1/pods', limit=2, deadline=time.monotonic() + 0.3)
+        self.assertEqual(len([next(items), next(items)]), 2)
+        time.sleep(0.4)
+        with self.assertRaises(DeadlineExceeded):
+            next(items)
+        self.assertEqual(len(self.server.requests), 1)
+
+    def _pod_check(self) -> dict:
+        return {
+            'id': '9.9.9',
+            'text': 'Every pod is listed',
+            'audit': 'for n in 1 2 3; do echo "pod_name: shell-$n listed: true"; done',
+            'audit_api': [{'list': {'resource': 'pods', 'format': 'pod_name: {metadata.name} listed: true'}}],
+            'use_multiple_values': True,
+            'tests': {'test_items': [{'flag': 'listed', 'compare': {'op': 'eq', 'value': 'true'}}]}
+        }
+
+    def _executor(self) -> CheckExecutor:
+        executor = CheckExecutor({'kubernetes': {'kubeconfig': self.kubeconfig, 'shard_workers': 1}})
+        self.addCleanup(executor.cleanup)
+        return executor
+
+    def test_expired_continue_token_lists_again_from_the_start(self):
+        self.server.max_page = 2
+        self.server.expire_continue = 1
+        result = self._executor().execute_check(self._pod_check(), 'policies')
+        self.assertTrue(result['passed'])
+        self.assertEqual(result['lines_processed'], len(PODS))
+
+    def test_list_failing_midway_reruns_the_shell_audit(self):
+        self.server.max_page = 2
+        self.server.expire_continue = 2
+        result = self._executor().execute_check(self._pod_check(), 'policies')
+        self.assertTrue(result['passed'])
+        self.assertEqual(result['lines_processed'], 3)
+
+    def test_streamed_audit_past_its_timeout_is_reported_as_timeout(self):
+        check = dict(self._pod_check(), timeout=0.3)
+        check['audit_api'] = [{'list': {'resource': 'slow', 'format': 'listed: true'}}]
+        result = self._executor().execute_check(check, 'policies')
+        self.assertEqual(result['status'], 'TIMEOUT')
+        self.assertIsNone(result['passed'])
+
+    def test_errors_raise_api_error(self):
+        with self.assertRaises(APIError) as raised:
+            self.client.get('/api/v1/nodes')
+        self.assertEqual(raised.exception.status, 404)
+
+    def test_can_i_sends_one_impersonate_group_header_per_group(self):
+        allowed = self.client.can_i('get', 'secrets', namespace='default', as_user='alice',
+                                    as_groups=['system:authenticated', 'system:masters'])
+        self.assertTrue(allowed)
+        request = self.server.requests[0]
+        self.assertEqual(request['path'], '/apis/authorization.k8s.io/v1/selfsubjectaccessreviews')
+        self.assertEqual(request['impersonate_user'], ['alice'])
+        self.assertEqual(request['impersonate_groups'], ['system:authenticated', 'system:masters'])
+        self.assertEqual(request['body']['spec']['resourceAttributes'],
+                         {'verb': 'get', 'resource': 'secrets', 'group': '', 'subresource': '',
+                          'namespace': 'default'})
+
+    def test_can_i_denied(self):
+        self.assertFalse(self.client.can_i('create', 'pods', as_groups=['system:authenticated']))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+"""
+PodSecurityIndex against the 5.2.x shell audits of config/policies.yaml
+The shell audits run against a fake kubectl serving the same pods, and both outputs are compared line by line
+"""
+
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import textwrap
+import unittest
+
+import yaml
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, os.path.join(ROOT, 'src'))
+
+from podsecurity import PodSecurityIndex  # noqa: E402
+
+PODS = [
+    {'metadata': {'name': 'web', 'namespace': 'team-a'},
+     'spec': {'hostPID': True,
+              'containers': [
+                  {'name': 'app'},
+                  {'name': 'sidecar', 'securityContext': {
+                      'privileged': True, 'allowPrivilegeEscalation': True,
+                      'capabilities': {'add': ['NET_ADMIN', 'SYS_TIME']}}}]}},
+    {'metadata': {'name': 'db', 'namespace': 'team-b'},
+     'spec': {'hostNetwork': True, 'hostIPC': True,
+              'containers': [
+                  {'name': 'db', 'securityContext': {
+                      'privileged': False, 'allowPrivilegeEscalation': False, 'capabilities': {'add': []}}}]}},
+    {'metadata': {'name': 'proxy', 'namespace': 'kube-system'},
+     'spec': {'containers': [{'name': 'proxy', 'securityContext': {'capabilities': {'drop': ['ALL']}}}]}},
+]
+
+# A pod with hostPID, hostIPC and hostNetwork explicitly false
+EXPLICIT_FALSE_PODS = [
+    {'metadata': {'name': 'api', 'namespace': 'team-c'},
+     'spec': {'hostPID': False, 'hostIPC': False, 'hostNetwork': False, 'containers': [{'name': 'api'}]}},
+]
+
+QUERIES = {
+    '5.2.2': 'privileged',
+    '5.2.3': 'host_pid',
+    '5.2.4': 'host_ipc',
+    '5.2.5': 'host_network',
+    '5.2.6': 'allow_privilege_escalation',
+    '5.2.9': 'capabilities_added'
+}
+
+# Answers the three kubectl calls the 5.2.x audits make, from the pods in $FAKE_PODS
+FAKE_KUBECTL = textwrap.dedent('''\
+    import json, os, sys
+    args = sys.argv[1:]
+    with open(os.environ['FAKE_PODS'], encoding='utf-8') as f:
+        pods = json.load(f)
+    if args[:2] == ['get', 'pods']:
+        for pod in pods:
+            print(pod['metadata']['name'], pod['metadata']['namespace'])
+        sys.exit(0)
+    name, namespace = args[2], args[args.index('--namespace') + 1]
+    pod = next(p for p in pods if p['metadata']['name'] == name and p['metadata']['namespace'] == namespace)
+    output = args[args.index('-o') + 1]
+    if output == 'json':
+        print(json.dumps(pod))
+    else:
+        value = pod['spec'].get(output[len('jsonpath={.spec.'):-1])
+        if value is not None:
+            sys.stdout.write(json.dumps(value))
+''')
+
+
+def load_audits():
+    with open(os.path.join(ROOT, 'config', 'policies.yaml'), 'r', encoding='utf-8') as f:
+        policies = yaml.safe_load(f)
+    checks = {str(check['id']): check for group in policies['groups'] for check in group.get('checks') or []}
+    return {check_id: checks[check_id] for check_id in QUERIES}
+
+
+class PodSecurityIndexTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        if not (shutil.which('bash') and shutil.which('jq')):
+            raise unittest.SkipTest('bash and jq are needed to run the shell audits')
+        cls.checks = load_audits()
+        cls.tmpdir = tempfile.mkdtemp(prefix='kube-bench-test-')
+        kubectl = os.path.join(cls.tmpdir, 'kubectl')
+        with open(kubectl, 'w', encoding='utf-8') as f:
+            f.write(f"#!{sys.executable}\n{FAKE_KUBECTL}")
+        os.chmod(kubectl, 0o755)
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.tmpdir, ignore_errors=True)
+
+    def shell_lines(self, check_id, pods):
+        pods_file = os.path.join(self.tmpdir, 'pods.json')
+        with open(pods_file, 'w', encoding='utf-8') as f:
+            json.dump(pods, f)
+        env = dict(os.environ, PATH=f"{self.tmpdir}{os.pathsep}{os.environ.get('PATH', '')}", FAKE_PODS=pods_file)
+        result = subprocess.run(['bash', '-c', self.checks[check_id]['audit']], env=env, check=True,
+                                capture_output=True, text=True, timeout=60)
+        return result.stdout.splitlines()
+
+    @staticmethod
+    def index_lines(query, pods, exempt_namespaces=()):
+        return [line for _, line in PodSecurityIndex(pods).run(query, exempt_namespaces)]
+
+    def test_policy_checks_use_the_queries(self):
+        for check_id, query in QUERIES.items():
+            self.assertEqual(self.checks[check_id]['audit_api'], [{'pod_security': {'query': query}}])
+
+    def test_queries_match_the_shell_audits(self):
+        for check_id, query in QUERIES.items():
+            with self.subTest(check=check_id):
+                self.assertEqual(self.index_lines(query, PODS), self.shell_lines(check_id, PODS))
+
+    def test_compliance_per_container(self):
+        def compliance(query):
+            return [line.rsplit('is_compliant: ', 1)[1] for line in self.index_lines(query, PODS)]
+        self.assertEqual(compliance('privileged'), ['true', 'false', 'true', 'true'])
+        self.assertEqual(compliance('allow_privilege_escalation'), ['true', 'false', 'true', 'true'])
+        self.assertEqual(compliance('capabilities_added'), ['true', 'false', 'true', 'true'])
+        self.assertEqual(compliance('host_pid'), ['false', 'true', 'true'])
+        self.assertEqual(compliance('host_ipc'), ['true', 'false', 'true'])
+        self.assertEqual(compliance('host_network'), ['true', 'false', 'true'])
+
+    def test_explicit_false_host_namespaces_are_compliant(self):
+        # The shell audits flag any value jsonpath prints, even false; only an explicit true is non-compliant here
+        for check_id, key in (('5.2.3', 'is_pod_hostpid'), ('5.2.4', 'is_pod_hostipc'),
+                              ('5.2.5', 'is_pod_hostnetwork')):
+            with self.subTest(check=check_id):
+                self.assertEqual(self.shell_lines(check_id, EXPLICIT_FALSE_PODS),
+                                 [f"***pod_name: api pod_namespace: team-c {key}: false is_compliant: false"])
+                self.assertEqual(self.index_lines(QUERIES[check_id], EXPLICIT_FALSE_PODS),
+                                 [f"***pod_name: api pod_namespace: team-c {key}: false is_compliant: true"])
+
+    def test_exempt_namespaces_are_skipped(self):
+        lines = self.index_lines('host_network', PODS, ['kube-system'])
+        self.assertEqual([line.split()[1] for line in lines], ['web', 'db'])
+        index = PodSecurityIndex(PODS, exempt_namespaces=['team-a', 'team-b'])
+        self.assertEqual([line.split()[1] for _, line in index.run('host_network')], ['proxy'])
+
+    def test_unknown_query(self):
+        with self.assertRaises(ValueError):
+            list(PodSecurityIndex(PODS).run('root'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,44 @@
+#!/usr/bin/env python3
+"""
+Privileged helper approvals
+Default allow-list, and fix scripts only once remediation is configured and enabled
+"""
+
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+from privhelper import DEFAULT_ALLOW, PrivilegedHelper, handle  # noqa: E402
+
+
+class PrivilegedHelperTest(unittest.TestCase):
+
+    def test_find_is_not_approved_by_default(self):
+        self.assertNotIn('find', DEFAULT_ALLOW)
+        response = handle({'op': 'run', 'argv': ['find', '/', '-delete']}, DEFAULT_ALLOW, False)
+        self.assertEqual(response, {'ok': False, 'error': 'command not approved: find'})
+        self.assertIsNone(PrivilegedHelper({'privileged_helper': {'enabled': False}}).run(['find', '/'], 1))
+
+    def test_scripts_are_refused_without_scripts(self):
+        response = handle({'op': 'script', 'script': 'true'}, DEFAULT_ALLOW, False)
+        self.assertEqual(response, {'ok': False, 'error': 'scripts are not approved'})
+
+    def test_scans_never_enable_scripts(self):
+        helper = PrivilegedHelper({})
+        self.assertFalse(helper.remediation)
+        self.assertFalse(helper.scripts)
+        self.assertFalse(helper.enable_scripts())
+        self.assertFalse(helper.scripts)
+
+    def test_remediation_enables_scripts_only_on_request(self):
+        helper = PrivilegedHelper({'privileged_helper': {'remediation': True}})
+        self.addCleanup(helper.close)
+        self.assertFalse(helper.scripts)
+        self.assertTrue(helper.enable_scripts())
+        self.assertTrue(helper.scripts)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+"""
+RBACIndex against hand-built roles and bindings
+Grant scopes, rule matching, implied groups and the 5.1.1 / 5.1.3 output lines of the shell audits
+"""
+
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+from rbac import RBACIndex  # noqa: E402
+
+
+def _meta(name, namespace=None):
+    metadata = {'name': name}
+    if namespace:
+        metadata['namespace'] = namespace
+    return {'metadata': metadata}
+
+
+def role(name, namespace, rules):
+    return dict(_meta(name, namespace), rules=rules)
+
+
+def cluster_role(name, rules):
+    return dict(_meta(name), rules=rules)
+
+
+def binding(name, role_kind, role_name, subjects, namespace=None):
+    return dict(_meta(name, namespace), roleRef={'kind': role_kind, 'name': role_name}, subjects=subjects)
+
+
+def user(name):
+    return {'kind': 'User', 'name': name}
+
+
+def group(name):
+    return {'kind': 'Group', 'name': name}
+
+
+READ_SECRETS = [{'apiGroups': [''], 'resources': ['secrets'], 'verbs': ['get', 'list', 'watch']}]
+
+
+class RBACIndexTest(unittest.TestCase):
+
+    def index(self, roles=(), cluster_roles=(), role_bindings=(), cluster_role_bindings=()):
+        return RBACIndex(roles, cluster_roles, role_bindings, cluster_role_bindings)
+
+    def test_cluster_role_binding_grants_every_namespace(self):
+        index = self.index(cluster_roles=[cluster_role('secret-reader', READ_SECRETS)],
+                           cluster_role_bindings=[binding('read', 'ClusterRole', 'secret-reader', [user('alice')])])
+        self.assertTrue(index.can_i('get', 'secrets', as_user='alice'))
+        self.assertTrue(index.can_i('list', 'secrets', namespace='team-a', as_user='alice'))
+        self.assertFalse(index.can_i('delete', 'secrets', as_user='alice'))
+        self.assertFalse(index.can_i('get', 'secrets', as_user='bob'))
+
+    def test_role_binding_grants_only_its_namespace(self):
+        index = self.index(roles=[role('secret-reader', 'team-a', READ_SECRETS)],
+                           role_bindings=[binding('read', 'Role', 'secret-reader', [user('alice')], 'team-a')])
+        self.assertTrue(index.can_i('get', 'secrets', namespace='team-a', as_user='alice'))
+        self.assertFalse(index.can_i('get', 'secrets', namespace='team-b', as_user='alice'))
+        # --all-namespaces asks cluster-wide, which namespaced grants never answer
+        self.assertFalse(index.can_i('get', 'secrets', as_user='alice'))
+
+    def test_role_binding_to_a_cluster_role_is_namespaced(self):
+        index = self.index(cluster_roles=[cluster_role('secret-reader', READ_SECRETS)],
+                           role_bindings=[binding('read', 'ClusterRole', 'secret-reader', [user('alice')], 'team-a')])
+        self.assertTrue(index.can_i('watch', 'secrets', namespace='team-a', as_user='alice'))
+        self.assertFalse(index.can_i('watch', 'secrets', namespace='team-b', as_user='alice'))
+        self.assertFalse(index.can_i('watch', 'secrets', as_user='alice'))
+
+    def test_role_binding_does_not_use_a_role_of_another_namespace(self):
+        index = self.index(roles=[role('secret-reader', 'team-b', READ_SECRETS)],
+                           role_bindings=[binding('read', 'Role', 'secret-reader', [user('alice')], 'team-a')])
+        self.assertFalse(index.can_i('get', 'secrets', namespace='team-a', as_user='alice'))
+
+    def test_rules_limited_to_resource_names_do_not_grant_the_resource(self):
+        rules = [{'apiGroups': [''], 'resources': ['secrets'], 'resourceNames': ['token'], 'verbs': ['get']}]
+        index = self.index(cluster_roles=[cluster_role('one-secret', rules)],
+                           cluster_role_bindings=[binding('one', 'ClusterRole', 'one-secret', [user('alice')])])
+        self.assertFalse(index.can_i('get', 'secrets', as_user='alice'))
+
+    def test_non_resource_url_rules_do_not_grant_resources(self):
+        rules = [{'nonResourceURLs': ['*'], 'verbs': ['*']}]
+        index = self.index(cluster_roles=[cluster_role('urls', rules)],
+                           cluster_role_bindings=[binding('urls', 'ClusterRole', 'urls', [user('alice')])])
+        self.assertFalse(index.can_i('get', 'secrets', as_user='alice'))
+        self.assertFalse(index.can_i('create', 'pods', as_user='alice'))
+
+    def test_wildcards_in_rules_match(self):
+        rules = [{'apiGroups': ['*'], 'resources': ['*'], 'verbs': ['*']}]
+        index = self.index(cluster_roles=[cluster_role('admin', rules)],
+                           cluster_role_bindings=[binding('admin', 'ClusterRole', 'admin', [user('alice')])])
+        self.assertTrue(index.can_i('create', 'pods', as_user='alice'))
+        self.assertTrue(index.can_i('create', 'deployments', group='apps', as_user='alice'))
+        self.assertTrue(index.can_i('get', 'pods', subresource='log', as_user='alice'))
+
+    def test_subresources_need_their_own_rule(self):
+        rules = [{'apiGroups': [''], 'resources': ['pods'], 'verbs': ['get']}]
+        index = self.index(cluster_roles=[cluster_role('pods', rules)],
+                           cluster_role_bindings=[binding('pods', 'ClusterRole', 'pods', [user('alice')])])
+        self.assertTrue(index.can_i('get', 'pods', as_user='alice'))
+        self.assertFalse(index.can_i('get', 'pods', subresource='exec', as_user='alice'))
+
+    def test_impersonated_users_are_in_system_authenticated(self):
+        # kubectl auth can-i --as=system:authenticated impersonates a user of that name
+        index = self.index(cluster_roles=[cluster_role('secret-reader', READ_SECRETS)],
+                           cluster_role_bindings=[binding('read', 'ClusterRole', 'secret-reader',
+                                                          [group('system:authenticated')])])
+        self.assertTrue(index.can_i('get', 'secrets', as_user='system:authenticated'))
+        self.assertTrue(index.can_i('get', 'secrets', as_user='alice'))
+        self.assertFalse(index.can_i('get', 'secrets', as_user='system:anonymous'))
+
+    def test_service_accounts_get_their_groups(self):
+        self.assertEqual(RBACIndex.subject_groups('system:serviceaccount:team-a:builder'),
+                         ['system:authenticated', 'system:serviceaccounts', 'system:serviceaccounts:team-a'])
+        index = self.index(cluster_roles=[cluster_role('secret-reader', READ_SECRETS)],
+                           cluster_role_bindings=[binding('read', 'ClusterRole', 'secret-reader',
+                                                          [group('system:serviceaccounts:team-a')])])
+        self.assertTrue(index.can_i('get', 'secrets', as_user='system:serviceaccount:team-a:builder'))
+        self.assertFalse(index.can_i('get', 'secrets', as_user='system:serviceaccount:team-b:builder'))
+
+    def test_service_account_subjects_default_to_the_binding_namespace(self):
+        subject = {'kind': 'ServiceAccount', 'name': 'builder'}
+        index = self.index(roles=[role('secret-reader', 'team-a', READ_SECRETS)],
+                           role_bindings=[binding('read', 'Role', 'secret-reader', [subject], 'team-a')])
+        self.assertTrue(index.can_i('get', 'secrets', namespace='team-a',
+                                    as_user='system:serviceaccount:team-a:builder'))
+
+    def test_has_wildcard_matches_the_shell_grep(self):
+        # The shell audit greps the compact rules JSON for the exact text ["*"]
+        self.assertTrue(RBACIndex.has_wildcard([{'verbs': ['*'], 'resources': ['pods']}]))
+        self.assertTrue(RBACIndex.has_wildcard([{'nonResourceURLs': ['*'], 'verbs': ['get']}]))
+        self.assertFalse(RBACIndex.has_wildcard([{'verbs': ['*', 'get'], 'resources': ['pods']}]))
+        self.assertFalse(RBACIndex.has_wildcard([{'verbs': ['get'], 'resources': ['pods/*']}]))
+        self.assertFalse(RBACIndex.has_wildcard([]))
+
+    def test_cluster_admin_lines_match_the_shell_audit(self):
+        index = self.index(cluster_role_bindings=[
+            binding('cluster-admin', 'ClusterRole', 'cluster-admin', [group('system:masters')]),
+            binding('ops-admin', 'ClusterRole', 'cluster-admin', [user('alice'), user('bob')]),
+            binding('orphan', 'ClusterRole', 'view', [])
+        ])
+        self.assertEqual(list(index.cluster_admin_entries()), [
+            (None, '**role_name: cluster-admin role_binding: cluster-admin subject: system:masters '
+                   'is_compliant: true'),
+            (None, '**role_name: ops-admin role_binding: cluster-admin subject: alice,bob is_compliant: false'),
+            (None, '**role_name: orphan role_binding: view subject: <none> is_compliant: true')
+        ])
+
+    def test_wildcard_lines_match_the_shell_audit(self):
+        index = self.index(roles=[role('reader', 'team-a', READ_SECRETS)],
+                           cluster_roles=[cluster_role('admin', [{'apiGroups': ['*'], 'resources': ['*'],
+                                                                  'verbs': ['*']}])])
+        self.assertEqual(list(index.wildcard_entries()), [
+            ('team-a', '**role_name: reader role_namespace: team-a '
+                       'role_rules: [{"apiGroups":[""],"resources":["secrets"],"verbs":["get","list","watch"]}] '
+                       'role_is_compliant: true'),
+            (None, '**clusterrole_name: admin '
+                   'clusterrole_rules: [{"apiGroups":["*"],"resources":["*"],"verbs":["*"]}] '
+                   'clusterrole_is_compliant: false')
+        ])
+
+    def test_roles_without_rules_print_null_like_jq(self):
+        index = self.index(cluster_roles=[{'metadata': {'name': 'empty'}}])
+        self.assertEqual(list(index.wildcard_entries()),
+                         [(None, '**clusterrole_name: empty clusterrole_rules: null clusterrole_is_compliant: true')])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+ShardedEvaluator against the in-process tally
+Shard workers must count flags, number lines and retain results exactly like one AuditEvaluator
+"""
+
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+from evaluator import AuditEvaluator  # noqa: E402
+from executor import CheckExecutor  # noqa: E402
+from shards import MAX_RETAINED_RESULTS, ShardedEvaluator  # noqa: E402
+
+CHECK = {
+    'id': '5.2.2',
+    'tests': {'test_items': [{'flag': 'is_compliant', 'compare': {'op': 'eq', 'value': 'true'}},
+                             {'flag': 'is_container_privileged', 'set': True}]}
+}
+
+
+def pod_entries(namespaces=8, pods=300):
+    """(namespace, line) like the 5.2.2 audit, every seventh container privileged"""
+    for n in range(namespaces):
+        namespace = f"team-{n}"
+        for p in range(pods):
+            privileged = (n * pods + p) % 7 == 0
+            yield namespace, (f"***pod_name: pod-{p} container_name: app pod_namespace: {namespace} "
+                              f"is_container_privileged: {'true' if privileged else 'false'} "
+                              f"is_compliant: {'false' if privileged else 'true'}")
+
+
+def summary(tally):
+    return {
+        'flag_counts': tally.flag_counts,
+        'results_count': tally.results_count,
+        'passed_count': tally.passed_count,
+        'line_count': tally.line_count,
+        'truncated': tally.truncated,
+        'results': [(result['line_number'], result['flag'], result['passed'], result['line_content'])
+                    for result in tally.results]
+    }
+
+
+class ShardedEvaluatorTest(unittest.TestCase):
+
+    def setUp(self):
+        self.sharder = ShardedEvaluator({'kubernetes': {'shard_workers': 2, 'shard_size': 250}})
+        self.addCleanup(self.sharder.close)
+        self.evaluator = AuditEvaluator()
+
+    def in_process(self, entries):
+        return self.evaluator.tally_lines(CHECK, (line for _, line in entries), 'policies')
+
+    def test_sharded_tally_equals_in_process_tally(self):
+        entries = list(pod_entries())
+        sharded = self.sharder.tally(self.evaluator, CHECK, 'policies', iter(entries))
+        self.assertIsNotNone(self.sharder._pool, 'the output should have been split across the pool')
+        expected = self.in_process(entries)
+        self.assertEqual(summary(sharded), summary(expected))
+        self.assertTrue(expected.truncated)
+        # Every failing result is kept, passing ones only up to the limit
+        self.assertEqual(len(expected.results), MAX_RETAINED_RESULTS + expected.results_count - expected.passed_count)
+
+    def test_single_shard_is_tallied_in_process(self):
+        entries = list(pod_entries(namespaces=1, pods=100))
+        sharded = self.sharder.tally(self.evaluator, CHECK, 'policies', iter(entries))
+        self.assertIsNone(self.sharder._pool)
+        self.assertEqual(summary(sharded), summary(self.in_process(entries)))
+
+    def test_shards_are_cut_at_namespace_boundaries(self):
+        shards = list(self.sharder.shards(pod_entries(namespaces=3, pods=200)))
+        self.assertEqual([len(shard) for shard in shards], [400, 200])
+
+    def test_check_executor_is_a_complete_evaluator(self):
+        executor = CheckExecutor({'kubernetes': {'shard_workers': 1}})
+        self.addCleanup(executor.cleanup)
+        self.assertIsInstance(executor, AuditEvaluator)
+        entries = list(pod_entries(namespaces=1, pods=50))
+        self.assertEqual(summary(executor.tally_lines(CHECK, (line for _, line in entries), 'policies')),
+                         summary(self.in_process(entries)))
+
+
+if __name__ == '__main__':
+    unittest.main()